@@ -0,0 +1,13 @@
+{% macro hhmmss_to_time(field) %}
+    CASE
+        WHEN CAST({{ field }} AS INTEGER) // 10000 < 24
+            AND (CAST({{ field }} AS INTEGER) // 100) % 100 < 60
+            AND CAST({{ field }} AS INTEGER) % 100 < 60
+        THEN make_time(
+            CAST({{ field }} AS INTEGER) // 10000,
+            (CAST({{ field }} AS INTEGER) // 100) % 100,
+            CAST({{ field }} AS INTEGER) % 100
+        )
+        ELSE NULL
+    END
+{% endmacro %}
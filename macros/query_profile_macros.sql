@@ -0,0 +1,16 @@
+{% macro start_query_profile() %}
+    {#- Writes a DuckDB JSON query profile per model into var('query_profile_dir').
+        The last profiled statement is the model's final write, so its cardinality is the
+        rows the model wrote. Views run no query when built and are not profiled. -#}
+    {%- set profile_dir = var('query_profile_dir', none) -%}
+    {%- if profile_dir and config.get('materialized') != 'view' -%}
+        SET enable_profiling = 'json';
+        SET profiling_output = '{{ profile_dir }}/{{ this.identifier }}.json';
+    {%- endif -%}
+{% endmacro %}
+
+{% macro stop_query_profile() %}
+    {%- if var('query_profile_dir', none) and config.get('materialized') != 'view' -%}
+        PRAGMA disable_profiling;
+    {%- endif -%}
+{% endmacro %}
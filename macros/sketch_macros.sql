@@ -0,0 +1,9 @@
+{% macro ddsketch_bucket_index(field, relative_accuracy) %}
+    {#- Log-spaced bucket of a DDSketch. Every value in bucket i lies within relative_accuracy
+        of the bucket's representative value. Values at or below zero share bucket -32768. -#}
+    CASE
+        WHEN {{ field }} > 0
+        THEN CAST(ceil(ln({{ field }}) / ln((1 + {{ relative_accuracy }}) / (1 - {{ relative_accuracy }}))) AS SMALLINT)
+        ELSE CAST(-32768 AS SMALLINT)
+    END
+{% endmacro %}
@@ -0,0 +1,39 @@
+{{ config(materialized='table') }}
+
+-- City dimension: one row per city with an integer surrogate key, translation and economic metadata
+WITH processed_cities AS (
+    SELECT DISTINCT SHIP_TO_CITY_CD
+    FROM {{ ref('processed_dataset') }}
+    WHERE SHIP_TO_CITY_CD IS NOT NULL
+),
+-- Archived orders keep their natural codes, so their cities stay in the dimension
+archived_cities AS (
+    SELECT DISTINCT SHIP_TO_CITY_CD
+    FROM {{ source('gold', 'curated_fact_orders_archive') }}
+    WHERE SHIP_TO_CITY_CD IS NOT NULL
+),
+translations_city_df AS (
+    SELECT * FROM {{ source('silver', 'translations_city_mapping') }}
+),
+all_cities AS (
+    SELECT SHIP_TO_CITY_CD FROM processed_cities
+    UNION
+    SELECT SHIP_TO_CITY_CD FROM archived_cities
+    UNION
+    SELECT SHIP_TO_CITY_CD FROM translations_city_df
+)
+
+SELECT
+    CAST(ROW_NUMBER() OVER (ORDER BY a.SHIP_TO_CITY_CD) AS INTEGER) AS CITY_KEY,
+    a.SHIP_TO_CITY_CD,
+    tc.SHIP_TO_CITY_CD_ENG,
+    tc.PROVINCE,
+    TRY_CAST(REPLACE(tc.PER_CAPITA_USD, ',', '') AS DOUBLE) AS PER_CAPITA_USD,
+    TRY_CAST(tc.TOTAL_GDP_USD AS DOUBLE) AS TOTAL_GDP_USD,
+    tc.SHIP_TO_CITY_CD IS NOT NULL AS IS_TRANSLATED
+FROM 
+    all_cities a
+LEFT JOIN 
+    translations_city_df tc 
+ON 
+    a.SHIP_TO_CITY_CD = tc.SHIP_TO_CITY_CD
@@ -0,0 +1,36 @@
+{{ config(materialized='table') }}
+
+-- District dimension: one row per district name with an integer surrogate key and translation
+WITH processed_districts AS (
+    SELECT DISTINCT SHIP_TO_DISTRICT_NAME
+    FROM {{ ref('processed_dataset') }}
+    WHERE SHIP_TO_DISTRICT_NAME IS NOT NULL
+),
+-- Archived orders keep their natural codes, so their districts stay in the dimension
+archived_districts AS (
+    SELECT DISTINCT SHIP_TO_DISTRICT_NAME
+    FROM {{ source('gold', 'curated_fact_orders_archive') }}
+    WHERE SHIP_TO_DISTRICT_NAME IS NOT NULL
+),
+translations_district_df AS (
+    SELECT * FROM {{ source('silver', 'translations_district_mapping') }}
+),
+all_districts AS (
+    SELECT SHIP_TO_DISTRICT_NAME FROM processed_districts
+    UNION
+    SELECT SHIP_TO_DISTRICT_NAME FROM archived_districts
+    UNION
+    SELECT SHIP_TO_DISTRICT_NAME FROM translations_district_df
+)
+
+SELECT
+    CAST(ROW_NUMBER() OVER (ORDER BY a.SHIP_TO_DISTRICT_NAME) AS INTEGER) AS DISTRICT_KEY,
+    a.SHIP_TO_DISTRICT_NAME,
+    td.SHIP_TO_DISTRICT_NAME_ENG,
+    td.SHIP_TO_DISTRICT_NAME IS NOT NULL AS IS_TRANSLATED
+FROM 
+    all_districts a
+LEFT JOIN 
+    translations_district_df td 
+ON 
+    a.SHIP_TO_DISTRICT_NAME = td.SHIP_TO_DISTRICT_NAME
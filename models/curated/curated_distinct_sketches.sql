@@ -0,0 +1,51 @@
+{{ config(materialized='table') }}
+
+{% set precision = var('hll_precision', 10) %}
+{% set register_count = 2 ** precision %}
+
+-- HyperLogLog registers of the distinct cities and districts per partition and province.
+-- Registers merge with MAX, so any date range is estimated without rescanning orders.
+-- Values are hashed by their natural code, as the surrogate keys are rebuilt every run.
+WITH orders AS (
+    SELECT
+        f.PARTITION_DATE,
+        f.PARTITION_WINDOW,
+        c.PROVINCE,
+        c.SHIP_TO_CITY_CD,
+        CASE WHEN d.IS_TRANSLATED THEN d.SHIP_TO_DISTRICT_NAME END AS SHIP_TO_DISTRICT_NAME
+    FROM
+        {{ ref('curated_fact_orders') }} f
+    JOIN
+        {{ ref('curated_dim_city') }} c ON f.CITY_KEY = c.CITY_KEY AND c.IS_TRANSLATED
+    LEFT JOIN
+        {{ ref('curated_dim_district') }} d ON f.DISTRICT_KEY = d.DISTRICT_KEY
+),
+hashed AS (
+    SELECT PARTITION_DATE, PARTITION_WINDOW, PROVINCE, 'city' AS DIMENSION, hash(SHIP_TO_CITY_CD) AS h
+    FROM orders
+    UNION ALL
+    SELECT PARTITION_DATE, PARTITION_WINDOW, PROVINCE, 'district' AS DIMENSION, hash(SHIP_TO_DISTRICT_NAME) AS h
+    FROM orders
+    WHERE SHIP_TO_DISTRICT_NAME IS NOT NULL
+)
+
+SELECT
+    PARTITION_DATE,
+    PARTITION_WINDOW,
+    PROVINCE,
+    DIMENSION,
+    CAST(h & {{ register_count - 1 }} AS SMALLINT) AS REGISTER_INDEX,
+    -- Position of the leftmost 1-bit in the remaining {{ 64 - precision }} hash bits
+    CAST(MAX(
+        CASE
+            WHEN h >> {{ precision }} = 0 THEN {{ 64 - precision + 1 }}
+            ELSE {{ 64 - precision }} - CAST(floor(log2(CAST(h >> {{ precision }} AS DOUBLE))) AS INTEGER)
+        END
+    ) AS TINYINT) AS REGISTER_VALUE,
+    CAST({{ register_count }} AS SMALLINT) AS REGISTER_COUNT
+FROM
+    hashed
+GROUP BY
+    PARTITION_DATE, PARTITION_WINDOW, PROVINCE, DIMENSION, h & {{ register_count - 1 }}
+ORDER BY
+    PARTITION_DATE, PARTITION_WINDOW, PROVINCE, DIMENSION, REGISTER_INDEX
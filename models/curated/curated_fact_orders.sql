@@ -0,0 +1,49 @@
+{{ config(materialized='view') }}
+
+-- Gold fact over both storage tiers: the partitions in curated_fact_orders_hot, plus the
+-- archived partitions read from Parquet. Archived rows carry natural codes, so the current
+-- surrogate keys are looked up here. Filters on PARTITION_DATE skip archived files.
+WITH hot AS (
+    SELECT * FROM {{ ref('curated_fact_orders_hot') }}
+),
+hot_partitions AS (
+    SELECT DISTINCT PARTITION_DATE, PARTITION_WINDOW FROM hot
+),
+archived AS (
+    SELECT
+        a.ORDER_ID,
+        a.ORDER_TIME_PST,
+        c.CITY_KEY,
+        d.DISTRICT_KEY,
+        a.RMB_DOLLARS,
+        a.ORDER_QTY,
+        a.PARTITION_DATE,
+        a.PARTITION_WINDOW,
+        a.ORDER_TS,
+        a.ORDER_DATE_KEY,
+        a.ORDER_HOUR,
+        a.ORDER_HOUR_TS,
+        a.ORDER_15MIN_TS,
+        a.ORDER_MINUTE_TS
+    FROM
+        {{ source('gold', 'curated_fact_orders_archive') }} a
+    LEFT JOIN
+        {{ ref('curated_dim_city') }} c
+    ON
+        a.SHIP_TO_CITY_CD = c.SHIP_TO_CITY_CD
+    LEFT JOIN
+        {{ ref('curated_dim_district') }} d
+    ON
+        a.SHIP_TO_DISTRICT_NAME = d.SHIP_TO_DISTRICT_NAME
+    -- A partition loaded again since it was archived is read from the hot table
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM hot_partitions h
+        WHERE h.PARTITION_DATE = a.PARTITION_DATE
+            AND h.PARTITION_WINDOW = a.PARTITION_WINDOW
+    )
+)
+
+SELECT * FROM hot
+UNION ALL
+SELECT * FROM archived
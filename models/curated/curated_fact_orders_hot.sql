@@ -0,0 +1,68 @@
+{{ config(materialized='table') }}
+
+-- Orders of the partitions still in the warehouse. Older partitions are archived to Parquet
+-- by the curated_fact_orders_archive asset, curated_fact_orders reads both tiers.
+
+-- Load necessary data from Silver Layer and the gold dimensions
+WITH processed_df AS (
+    SELECT * FROM {{ ref('processed_dataset') }}
+),
+currency_code_df AS (
+    SELECT * FROM {{ source('silver', 'currency_code_mapping') }}
+),
+dim_city_df AS (
+    SELECT CITY_KEY, SHIP_TO_CITY_CD FROM {{ ref('curated_dim_city') }}
+),
+dim_district_df AS (
+    SELECT DISTRICT_KEY, SHIP_TO_DISTRICT_NAME FROM {{ ref('curated_dim_district') }}
+),
+
+-- Swap the city and district strings for their surrogate keys
+merged_data AS (
+    SELECT 
+        p.ORDER_ID,
+        p.ORDER_TIME_PST,
+        dc.CITY_KEY,
+        dd.DISTRICT_KEY,
+        p.RPTG_AMT,
+        p.ORDER_QTY,
+        cc.MULTIPLIER,
+        p.PARTITION_DATE,
+        p.PARTITION_WINDOW,
+        p.PARTITION_DATE + {{ hhmmss_to_time('p.ORDER_TIME_PST') }} AS ORDER_TS
+    FROM 
+        processed_df p
+    LEFT JOIN 
+        dim_city_df dc 
+    ON 
+        p.SHIP_TO_CITY_CD = dc.SHIP_TO_CITY_CD
+    LEFT JOIN 
+        dim_district_df dd 
+    ON 
+        p.SHIP_TO_DISTRICT_NAME = dd.SHIP_TO_DISTRICT_NAME
+    LEFT JOIN 
+        currency_code_df cc 
+    ON 
+        p.CURRENCY_CD = cc.CURRENCY_CD
+)
+
+SELECT
+    ORDER_ID,
+    CAST(ORDER_TIME_PST AS INTEGER) AS ORDER_TIME_PST,
+    CITY_KEY,
+    DISTRICT_KEY,
+    CAST(RPTG_AMT * MULTIPLIER AS DECIMAL(18,2)) AS RMB_DOLLARS,
+    CAST(ORDER_QTY AS INTEGER) AS ORDER_QTY,
+    PARTITION_DATE,
+    PARTITION_WINDOW,
+    -- Time buckets are computed once here so downstream queries group on stored columns
+    ORDER_TS,
+    CAST(strftime(PARTITION_DATE, '%Y%m%d') AS INTEGER) AS ORDER_DATE_KEY,
+    CAST(hour(ORDER_TS) AS INTEGER) AS ORDER_HOUR,
+    date_trunc('hour', ORDER_TS) AS ORDER_HOUR_TS,
+    time_bucket(INTERVAL '15 minutes', ORDER_TS) AS ORDER_15MIN_TS,
+    date_trunc('minute', ORDER_TS) AS ORDER_MINUTE_TS,
+FROM 
+    merged_data
+ORDER BY
+    PARTITION_DATE, PARTITION_WINDOW, ORDER_TS
@@ -0,0 +1,24 @@
+{{ config(materialized='table') }}
+
+{% set sample_percent = var('approx_sample_percent', 10) %}
+
+-- Sample of the gold orders for the dashboard's approximate mode, so its sums read a table
+-- of about {{ sample_percent }}% of the orders instead of testing every order, archive
+-- included, on each query. An order is in the sample when its ORDER_ID hash falls in the
+-- sampled range, which selects each order independently, like a Bernoulli sample, and
+-- keeps the same orders across rebuilds. SAMPLE_FRACTION is the inclusion probability the
+-- estimates scale each sampled order by.
+SELECT
+    ORDER_ID,
+    CITY_KEY,
+    RMB_DOLLARS,
+    ORDER_HOUR,
+    PARTITION_DATE,
+    PARTITION_WINDOW,
+    CAST({{ sample_percent / 100 }} AS DOUBLE) AS SAMPLE_FRACTION
+FROM
+    {{ ref('curated_fact_orders') }}
+WHERE
+    hash(ORDER_ID) % 1000000 < {{ (sample_percent * 10000) | int }}
+ORDER BY
+    PARTITION_DATE, PARTITION_WINDOW
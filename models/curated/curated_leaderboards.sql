@@ -0,0 +1,127 @@
+{{ config(materialized='table') }}
+
+{% set leaderboard_size = var('leaderboard_size', 10) %}
+
+-- Dashboard leaderboards merged across the per-partition leaders. Exact, since a global top
+-- order is in its partition's top {{ leaderboard_size }} and city totals are kept whole per partition.
+-- Each board holds at most {{ leaderboard_size }} rows ranked by LEADERBOARD_RANK.
+WITH leaders AS (
+    SELECT * FROM {{ ref('curated_partition_leaders') }}
+),
+dim_city_df AS (
+    SELECT * FROM {{ ref('curated_dim_city') }}
+),
+dim_district_df AS (
+    SELECT * FROM {{ ref('curated_dim_district') }}
+),
+city_totals AS (
+    SELECT
+        SHIP_TO_CITY_CD,
+        SUM(SCORE) AS SCORE,
+        SUM(ORDER_COUNT) AS ORDER_COUNT
+    FROM
+        leaders
+    WHERE
+        BOARD = 'city'
+    GROUP BY
+        SHIP_TO_CITY_CD
+),
+boards AS (
+    SELECT
+        'transaction' AS BOARD,
+        ROW_NUMBER() OVER (ORDER BY SCORE DESC) AS LEADERBOARD_RANK,
+        SHIP_TO_CITY_CD,
+        SHIP_TO_DISTRICT_NAME,
+        ORDER_ID,
+        ORDER_TIME_PST,
+        ORDER_QTY,
+        ORDER_TS,
+        SCORE
+    FROM
+        leaders
+    WHERE
+        BOARD = 'transaction'
+    QUALIFY
+        LEADERBOARD_RANK <= {{ leaderboard_size }}
+
+    UNION ALL BY NAME
+
+    SELECT
+        'city_spending' AS BOARD,
+        ROW_NUMBER() OVER (ORDER BY SCORE DESC) AS LEADERBOARD_RANK,
+        SHIP_TO_CITY_CD,
+        SCORE
+    FROM
+        city_totals
+    QUALIFY
+        LEADERBOARD_RANK <= {{ leaderboard_size }}
+
+    UNION ALL BY NAME
+
+    SELECT
+        'city_order_count' AS BOARD,
+        ROW_NUMBER() OVER (ORDER BY ORDER_COUNT DESC) AS LEADERBOARD_RANK,
+        SHIP_TO_CITY_CD,
+        ORDER_COUNT AS SCORE
+    FROM
+        city_totals
+    QUALIFY
+        LEADERBOARD_RANK <= {{ leaderboard_size }}
+
+    UNION ALL BY NAME
+
+    -- Province is looked up at merge time, so translation updates apply without reloading partitions
+    SELECT
+        'province_spending' AS BOARD,
+        ROW_NUMBER() OVER (ORDER BY SUM(t.SCORE) DESC) AS LEADERBOARD_RANK,
+        c.PROVINCE,
+        SUM(t.SCORE) AS SCORE
+    FROM
+        city_totals t
+    JOIN
+        dim_city_df c ON t.SHIP_TO_CITY_CD = c.SHIP_TO_CITY_CD AND c.IS_TRANSLATED
+    GROUP BY
+        c.PROVINCE
+    QUALIFY
+        LEADERBOARD_RANK <= {{ leaderboard_size }}
+
+    UNION ALL BY NAME
+
+    SELECT
+        'city_hour_spending' AS BOARD,
+        ROW_NUMBER() OVER (ORDER BY SUM(SCORE) DESC) AS LEADERBOARD_RANK,
+        SHIP_TO_CITY_CD,
+        ORDER_HOUR,
+        SUM(SCORE) AS SCORE
+    FROM
+        leaders
+    WHERE
+        BOARD = 'city_hour'
+    GROUP BY
+        SHIP_TO_CITY_CD, ORDER_HOUR
+    QUALIFY
+        LEADERBOARD_RANK <= {{ leaderboard_size }}
+)
+
+SELECT
+    b.BOARD,
+    CAST(b.LEADERBOARD_RANK AS INTEGER) AS LEADERBOARD_RANK,
+    b.PROVINCE,
+    b.SHIP_TO_CITY_CD,
+    c.SHIP_TO_CITY_CD_ENG,
+    b.SHIP_TO_DISTRICT_NAME,
+    d.SHIP_TO_DISTRICT_NAME_ENG,
+    b.ORDER_HOUR,
+    b.ORDER_ID,
+    b.ORDER_TIME_PST,
+    b.ORDER_QTY,
+    b.ORDER_TS,
+    b.SCORE
+FROM
+    boards b
+LEFT JOIN
+    dim_city_df c ON b.SHIP_TO_CITY_CD = c.SHIP_TO_CITY_CD
+LEFT JOIN
+    dim_district_df d ON b.SHIP_TO_DISTRICT_NAME = d.SHIP_TO_DISTRICT_NAME
+ORDER BY
+    b.BOARD, b.LEADERBOARD_RANK
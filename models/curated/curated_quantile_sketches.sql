@@ -0,0 +1,43 @@
+{{ config(materialized='table') }}
+
+{% set relative_accuracy = var('quantile_relative_accuracy', 0.01) %}
+
+-- DDSketch bucket counts of order value and basket size per partition, city and district.
+-- Sketches merge by summing BUCKET_COUNT per bucket, so percentiles for any date range or
+-- region come from these counts alone. Keyed by natural codes, as surrogate keys are rebuilt every run.
+WITH orders AS (
+    SELECT
+        PARTITION_DATE,
+        PARTITION_WINDOW,
+        SHIP_TO_CITY_CD,
+        SHIP_TO_DISTRICT_NAME,
+        RMB_DOLLARS,
+        ORDER_QTY
+    FROM
+        {{ ref('curated_dataset') }}
+),
+metrics AS (
+    SELECT PARTITION_DATE, PARTITION_WINDOW, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME, 'RMB_DOLLARS' AS METRIC, RMB_DOLLARS AS VALUE
+    FROM orders
+    WHERE RMB_DOLLARS IS NOT NULL
+    UNION ALL
+    SELECT PARTITION_DATE, PARTITION_WINDOW, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME, 'ORDER_QTY' AS METRIC, ORDER_QTY AS VALUE
+    FROM orders
+    WHERE ORDER_QTY IS NOT NULL
+)
+
+SELECT
+    PARTITION_DATE,
+    PARTITION_WINDOW,
+    SHIP_TO_CITY_CD,
+    SHIP_TO_DISTRICT_NAME,
+    METRIC,
+    {{ ddsketch_bucket_index('VALUE', relative_accuracy) }} AS BUCKET_INDEX,
+    CAST(COUNT(*) AS INTEGER) AS BUCKET_COUNT,
+    CAST({{ relative_accuracy }} AS DOUBLE) AS RELATIVE_ACCURACY
+FROM
+    metrics
+GROUP BY
+    ALL
+ORDER BY
+    PARTITION_DATE, PARTITION_WINDOW, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME, METRIC, BUCKET_INDEX
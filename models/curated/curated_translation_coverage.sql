@@ -0,0 +1,39 @@
+{{ config(materialized='table') }}
+
+-- Share of the cities and districts seen in bronze that have a translation, so the dashboard
+-- reads the coverage from gold instead of the bronze and silver files
+WITH unique_cities AS (
+    SELECT DISTINCT SHIP_TO_CITY_CD
+    FROM (
+        SELECT SHIP_TO_CITY_CD FROM {{ source('bronze', 'raw_dataset_2') }}
+        UNION ALL
+        SELECT SHIP_TO_CITY_CD FROM {{ source('bronze', 'raw_mapping') }}
+    )
+),
+unique_districts AS (
+    SELECT DISTINCT SHIP_TO_DISTRICT_NAME
+    FROM (
+        SELECT SHIP_TO_DISTRICT_NAME FROM {{ source('bronze', 'raw_dataset_2') }}
+        UNION ALL
+        SELECT SHIP_TO_DISTRICT_NAME FROM {{ source('bronze', 'raw_mapping') }}
+    )
+),
+coverage AS (
+    SELECT
+        'city' AS DIMENSION,
+        (SELECT COUNT(*) FROM {{ source('silver', 'translations_city_mapping') }}) AS TRANSLATED_COUNT,
+        (SELECT COUNT(*) FROM unique_cities) AS UNIQUE_COUNT
+    UNION ALL
+    SELECT
+        'district' AS DIMENSION,
+        (SELECT COUNT(*) FROM {{ source('silver', 'translations_district_mapping') }}) AS TRANSLATED_COUNT,
+        (SELECT COUNT(*) FROM unique_districts) AS UNIQUE_COUNT
+)
+
+SELECT
+    DIMENSION,
+    TRANSLATED_COUNT,
+    UNIQUE_COUNT,
+    (TRANSLATED_COUNT::FLOAT / UNIQUE_COUNT::FLOAT) * 100 AS PERCENTAGE
+FROM
+    coverage
@@ -0,0 +1,4 @@
+{{ config(materialized='table') }}
+
+-- Gold copy of the city translations and their scraped metadata, for the dashboard
+SELECT * FROM {{ source('silver', 'translations_city_mapping') }}
@@ -1,5 +1,5 @@
 WITH mapping_source AS (
-    SELECT * FROM {{ source('main', 'raw_mapping') }}
+    SELECT * FROM {{ source('bronze', 'raw_mapping') }}
 ),
 fused_dataset_1 AS (
     SELECT 
@@ -9,7 +9,9 @@ fused_dataset_1 AS (
         mapping_source.SHIP_TO_DISTRICT_NAME, 
         qd1.RPTG_AMT, 
         qd1.CURRENCY_CD, 
-        qd1.ORDER_QTY
+        qd1.ORDER_QTY,
+        qd1.PARTITION_DATE,
+        qd1.PARTITION_WINDOW
     FROM 
         {{ ref('qualified_dataset_1') }} qd1
     LEFT JOIN
@@ -25,7 +27,9 @@ fused_dataset_combined AS (
         CURRENCY_CD, 
         ORDER_QTY, 
         SHIP_TO_CITY_CD, 
-        SHIP_TO_DISTRICT_NAME 
+        SHIP_TO_DISTRICT_NAME,
+        PARTITION_DATE,
+        PARTITION_WINDOW
     FROM 
         fused_dataset_1
     UNION ALL
@@ -36,7 +40,9 @@ fused_dataset_combined AS (
         CURRENCY_CD, 
         ORDER_QTY, 
         SHIP_TO_CITY_CD, 
-        SHIP_TO_DISTRICT_NAME 
+        SHIP_TO_DISTRICT_NAME,
+        PARTITION_DATE,
+        PARTITION_WINDOW
     FROM 
         {{ ref('qualified_dataset_2') }}
 )
@@ -7,7 +7,7 @@
 ] %}
 
 {{ validation_errors(
-    source('main', 'raw_dataset_1'),
-    source('main', 'raw_mapping'),
+    source('bronze', 'raw_dataset_1'),
+    source('bronze', 'raw_mapping'),
     validations
 ) }}
@@ -1,9 +1,9 @@
 WITH source AS (
     -- Use source instead of seed:
-    SELECT * FROM {{ source('main', 'raw_dataset_1') }}
+    SELECT * FROM {{ source('bronze', 'raw_dataset_1') }}
 ),
 mapping_source AS (
-    SELECT * FROM {{ source('main', 'raw_mapping') }}
+    SELECT * FROM {{ source('bronze', 'raw_mapping') }}
 ),
 valid_raw_dataset_excel AS (
     SELECT
@@ -12,7 +12,9 @@ valid_raw_dataset_excel AS (
         {{ validate_field('CITY_DISTRICT_ID', "CITY_DISTRICT_ID IN (SELECT CITY_DISTRICT_ID FROM mapping_source)") }} AS CITY_DISTRICT_ID,
         {{ validate_field('RPTG_AMT', "RPTG_AMT >= 0") }} AS RPTG_AMT,
         {{ validate_field('CURRENCY_CD', "CURRENCY_CD IN ('USD', 'RMB')") }} AS CURRENCY_CD,
-        {{ validate_field('ORDER_QTY', "CAST(ORDER_QTY AS INTEGER) > 0") }} AS ORDER_QTY
+        {{ validate_field('ORDER_QTY', "CAST(ORDER_QTY AS INTEGER) > 0") }} AS ORDER_QTY,
+        PARTITION_DATE,
+        PARTITION_WINDOW
     FROM
         source
 )
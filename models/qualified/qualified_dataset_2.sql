@@ -1,6 +1,6 @@
 WITH source AS (
     -- Use source instead of seed:
-    SELECT * FROM {{ source('main', 'raw_dataset_2') }}
+    SELECT * FROM {{ source('bronze', 'raw_dataset_2') }}
 ),
 valid_raw_dataset_json AS (
     SELECT
@@ -10,7 +10,9 @@ valid_raw_dataset_json AS (
         SHIP_TO_CITY_CD,
         {{ validate_field('RPTG_AMT', "RPTG_AMT >= 0") }} AS RPTG_AMT,
         {{ validate_field('CURRENCY_CD', "CURRENCY_CD IN ('USD', 'RMB')") }} AS CURRENCY_CD,
-        {{ validate_field('ORDER_QTY', "CAST(ORDER_QTY AS INTEGER) > 0") }} AS ORDER_QTY
+        {{ validate_field('ORDER_QTY', "CAST(ORDER_QTY AS INTEGER) > 0") }} AS ORDER_QTY,
+        PARTITION_DATE,
+        PARTITION_WINDOW
     FROM
         source
 )
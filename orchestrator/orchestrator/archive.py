@@ -0,0 +1,226 @@
+"""
+Hot/cold tiering of the order facts.
+
+Partitions older than ARCHIVE_RETENTION_DAYS are moved out of the warehouse into ZSTD
+compressed Parquet under data/output/archive/PARTITION_DATE=<date>/PARTITION_WINDOW=<window>/,
+and deleted from curated_fact_orders_hot and the bronze order tables. The dbt view
+curated_fact_orders unions the hot table with CURATED_FACT_ORDERS_ARCHIVE, a view over the
+Parquet files, so DuckDB skips the files of partitions a date filter excludes.
+
+Archived rows keep the natural city and district codes rather than the surrogate keys,
+which are rebuilt every run. A partition that is loaded again after it was archived is read
+from the hot table until it is archived again, so a reload replaces the archived copy.
+"""
+
+import os
+import shutil
+
+from .constants import ARCHIVE_DIR, BRONZE_DUCKDB_FILE_PATH
+
+ARCHIVE_VIEW_NAME = "CURATED_FACT_ORDERS_ARCHIVE"
+
+# Columns of the archived orders. The partition columns are encoded in the file paths.
+ARCHIVE_COLUMNS = {
+    "ORDER_ID": "VARCHAR",
+    "ORDER_TIME_PST": "INTEGER",
+    "SHIP_TO_CITY_CD": "VARCHAR",
+    "SHIP_TO_DISTRICT_NAME": "VARCHAR",
+    "RMB_DOLLARS": "DECIMAL(18,2)",
+    "ORDER_QTY": "INTEGER",
+    "ORDER_TS": "TIMESTAMP",
+    "ORDER_DATE_KEY": "INTEGER",
+    "ORDER_HOUR": "INTEGER",
+    "ORDER_HOUR_TS": "TIMESTAMP",
+    "ORDER_15MIN_TS": "TIMESTAMP",
+    "ORDER_MINUTE_TS": "TIMESTAMP",
+}
+PARTITION_COLUMNS = {"PARTITION_DATE": "DATE", "PARTITION_WINDOW": "VARCHAR"}
+
+# Bronze tables the archived partitions are deleted from, so dbt does not rebuild them. The
+# bronze file is attached to the gold connection under its file stem.
+BRONZE_DATABASE = BRONZE_DUCKDB_FILE_PATH.stem
+BRONZE_ORDER_TABLES = ["RAW_DATASET_1", "RAW_DATASET_2"]
+
+
+def in_archived_partitions(alias):
+    return f"""
+        EXISTS (
+            SELECT 1 FROM archived_partitions p
+            WHERE p.PARTITION_DATE = {alias}.PARTITION_DATE
+                AND p.PARTITION_WINDOW = {alias}.PARTITION_WINDOW
+        )
+    """
+
+
+def partition_path(partition_date, partition_window):
+    return ARCHIVE_DIR.joinpath(
+        f"PARTITION_DATE={partition_date.isoformat()}",
+        f"PARTITION_WINDOW={partition_window}",
+    )
+
+
+def table_exists(con, table_name):
+    (count,) = con.execute(
+        """
+        SELECT COUNT(*) FROM duckdb_tables()
+        WHERE database_name = current_database() AND lower(table_name) = lower(?)
+        """,
+        [table_name],
+    ).fetchone()
+    return count > 0
+
+
+def cold_partitions(con, retention_days):
+    """
+    Lists the hot partitions older than the retention period. Age is counted back from the
+    newest partition in the warehouse, so a replay of old inputs archives the same partitions.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The DuckDB connection.
+        retention_days (int): Days of partitions kept in the warehouse.
+
+    Returns:
+        list: (PARTITION_DATE, PARTITION_WINDOW) tuples, oldest first.
+    """
+    if not table_exists(con, "curated_fact_orders_hot"):
+        return []
+    return con.execute(
+        """
+        WITH partitions AS (
+            SELECT DISTINCT PARTITION_DATE, PARTITION_WINDOW
+            FROM curated_fact_orders_hot
+            WHERE PARTITION_DATE IS NOT NULL
+        )
+        SELECT PARTITION_DATE, PARTITION_WINDOW
+        FROM partitions
+        WHERE PARTITION_DATE < (SELECT MAX(PARTITION_DATE) FROM partitions) - CAST(? AS INTEGER)
+        ORDER BY PARTITION_DATE, PARTITION_WINDOW
+        """,
+        [retention_days],
+    ).fetchall()
+
+
+def archive_partitions(con, partitions):
+    """
+    Writes partitions of curated_fact_orders_hot to Parquet and deletes them from the
+    warehouse. The files are written to a staging directory and swapped in per partition
+    before any rows are deleted, so a failed run leaves every order in at least one tier.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The DuckDB connection.
+        partitions (list): (PARTITION_DATE, PARTITION_WINDOW) tuples to archive.
+
+    Returns:
+        dict: Archived rows and Parquet bytes.
+    """
+    staging_dir = ARCHIVE_DIR.joinpath(".staging")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    staging_dir.mkdir(parents=True)
+
+    con.execute(
+        "CREATE OR REPLACE TEMP TABLE archived_partitions "
+        "(PARTITION_DATE DATE, PARTITION_WINDOW VARCHAR)"
+    )
+    con.executemany("INSERT INTO archived_partitions VALUES (?, ?)", partitions)
+    (rows,) = con.execute(
+        f"SELECT COUNT(*) FROM curated_fact_orders_hot f WHERE {in_archived_partitions('f')}"
+    ).fetchone()
+
+    # Within a partition the rows are written in order time, so row group statistics on
+    # ORDER_TS stay narrow
+    con.execute(
+        f"""
+        COPY (
+            SELECT
+                f.ORDER_ID,
+                f.ORDER_TIME_PST,
+                c.SHIP_TO_CITY_CD,
+                d.SHIP_TO_DISTRICT_NAME,
+                f.RMB_DOLLARS,
+                f.ORDER_QTY,
+                f.ORDER_TS,
+                f.ORDER_DATE_KEY,
+                f.ORDER_HOUR,
+                f.ORDER_HOUR_TS,
+                f.ORDER_15MIN_TS,
+                f.ORDER_MINUTE_TS,
+                f.PARTITION_DATE,
+                f.PARTITION_WINDOW
+            FROM curated_fact_orders_hot f
+            LEFT JOIN curated_dim_city c ON f.CITY_KEY = c.CITY_KEY
+            LEFT JOIN curated_dim_district d ON f.DISTRICT_KEY = d.DISTRICT_KEY
+            WHERE {in_archived_partitions('f')}
+            ORDER BY f.PARTITION_DATE, f.PARTITION_WINDOW, f.ORDER_TS
+        ) TO '{staging_dir.as_posix()}'
+        (FORMAT PARQUET, PARTITION_BY (PARTITION_DATE, PARTITION_WINDOW), COMPRESSION ZSTD)
+        """
+    )
+
+    # A partition archived before is replaced as a whole, not added to
+    archive_bytes = 0
+    for partition_date, partition_window in partitions:
+        staged_path = staging_dir.joinpath(
+            partition_path(partition_date, partition_window).relative_to(ARCHIVE_DIR)
+        )
+        target_path = partition_path(partition_date, partition_window)
+        shutil.rmtree(target_path, ignore_errors=True)
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(staged_path, target_path)
+        archive_bytes += sum(
+            file_path.stat().st_size for file_path in target_path.glob("*.parquet")
+        )
+    shutil.rmtree(staging_dir)
+
+    # A transaction only writes to one database file. Should the bronze delete fail, the next
+    # dbt run puts the partitions back in the hot table, which takes precedence over the archive.
+    con.execute(
+        f"DELETE FROM curated_fact_orders_hot t WHERE {in_archived_partitions('t')}"
+    )
+    con.execute("BEGIN TRANSACTION")
+    for table_name in BRONZE_ORDER_TABLES:
+        con.execute(
+            f"DELETE FROM {BRONZE_DATABASE}.main.{table_name} t "
+            f"WHERE {in_archived_partitions('t')}"
+        )
+    con.execute("COMMIT")
+    return {"rows": rows, "archive_bytes": archive_bytes}
+
+
+def archive_query():
+    """
+    Builds the query over the archived Parquet files. DuckDB fails on a glob without
+    matches, so while nothing is archived it is an empty result of the same shape.
+
+    Returns:
+        str: A SELECT of the archive columns and the partition columns.
+    """
+    columns = {**ARCHIVE_COLUMNS, **PARTITION_COLUMNS}
+    if any(ARCHIVE_DIR.glob("PARTITION_DATE=*/PARTITION_WINDOW=*/*.parquet")):
+        hive_types = ", ".join(
+            f"'{name}': {data_type}" for name, data_type in PARTITION_COLUMNS.items()
+        )
+        source = f"""
+            read_parquet(
+                '{ARCHIVE_DIR.as_posix()}/*/*/*.parquet',
+                hive_partitioning = true,
+                hive_types = {{{hive_types}}}
+            )
+        """
+        select_list = ", ".join(columns)
+    else:
+        source = "(SELECT 1) WHERE false"
+        select_list = ", ".join(
+            f"CAST(NULL AS {data_type}) AS {name}"
+            for name, data_type in columns.items()
+        )
+    return f"SELECT {select_list} FROM {source}"
+
+
+def create_archive_view(con):
+    """
+    Points CURATED_FACT_ORDERS_ARCHIVE at the archived Parquet files.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The DuckDB connection.
+    """
+    con.execute(f"CREATE OR REPLACE VIEW {ARCHIVE_VIEW_NAME} AS {archive_query()}")
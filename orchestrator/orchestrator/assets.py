@@ -1,20 +1,160 @@
 import os
-import duckdb
 import re
+import sys
 import json
-import pandas as pd
-from dagster import AssetExecutionContext, asset
-from dagster_dbt import DbtCliResource, dbt_assets, get_asset_key_for_model
+import importlib
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import List
+from dagster import AssetExecutionContext, Config, MetadataValue, Output, asset
+from dagster_dbt import (
+    DagsterDbtCliRuntimeError,
+    DbtCliResource,
+    dbt_assets,
+    get_asset_key_for_model,
+)
 
 from .constants import (
     dbt_manifest_path,
     DUCKDB_FILE_PATH,
-    INPUT_EXCEL_PATH,
-    INPUT_JSON_PATH,
+    WAREHOUSE_LAYERS,
+    INPUT_DIR,
+    INPUT_EXCEL_FILE_NAME,
+    INPUT_JSON_FILE_NAME,
+    DEFAULT_INPUT_PARTITION,
     CITY_TRANSLATIONS_FILE_PATH,
     DISTRICTS_TRANSLATIONS_FILE_PATH,
     CITY_CLUSTER_RESULTS_FILE_PATH,
+    DBT_QUERY_PROFILE_DIR,
+    VISUALIZATION_DIR,
+    CHART_DATA_DIR,
+    CHART_DATA_KEEP_VERSIONS,
+    PROVINCE_SHARDS_ENABLED,
+    PROVINCE_SHARDS_DIR,
+    PROVINCE_SHARDS_KEEP_VERSIONS,
+    MAINTENANCE_MIN_FREE_BLOCK_RATIO,
+    ARCHIVE_RETENTION_DAYS,
+)
+from .archive import archive_partitions, cold_partitions, create_archive_view
+from .maintenance import (
+    compact_warehouse,
+    database_size,
+    record_storage_history,
+    storage_markdown,
+    table_storage_stats,
 )
+from .order_ids import check_order_ids, record_order_ids
+from .shards import write_province_shards
+from .performance import (
+    dbt_model_metadata,
+    dbt_model_performance,
+    record_dbt_run_history,
+    track_performance,
+)
+
+
+# pandas and duckdb are only imported by the assets that use them, which keeps loading the
+# code location (webserver, daemon and every run worker) fast.
+
+
+# Assets whose loads add orders, configured with InputPartitionsConfig
+ORDER_INPUT_ASSETS = ["raw_dataset_1", "raw_dataset_2"]
+
+
+class InputPartitionsConfig(Config):
+    """
+    Input partitions to load, addressed as "<YYYYMMDD>/<window>" under data/input.
+    The file-arrival sensor fills this in with newly landed windows only.
+    """
+
+    partitions: List[str] = [DEFAULT_INPUT_PARTITION]
+
+
+class WarehouseMaintenanceConfig(Config):
+    """
+    Compaction normally waits until MAINTENANCE_MIN_FREE_BLOCK_RATIO of the file is free.
+    force_compaction rewrites the warehouse regardless.
+    """
+
+    force_compaction: bool = False
+
+
+def connect_warehouse(layer="gold", read_only=False, attach=(), attach_read_only=True):
+    """
+    Opens a connection to one layer of the DuckDB warehouse. Other layers are attached
+    under their file stem, the names the dbt models use.
+
+    Args:
+        layer (str): The layer to open, a key of WAREHOUSE_LAYERS.
+        read_only (bool): Whether to open the layer read-only.
+        attach (Iterable): Layers to attach.
+        attach_read_only (bool): Whether to attach them read-only. A read-only attach
+            shares the file with other readers, a read-write attach locks it.
+
+    Returns:
+        duckdb.DuckDBPyConnection: The DuckDB connection.
+    """
+    import duckdb
+
+    con = duckdb.connect(os.fspath(WAREHOUSE_LAYERS[layer]), read_only=read_only)
+    for attached_layer in attach:
+        path = WAREHOUSE_LAYERS[attached_layer]
+        if attach_read_only and not path.exists():
+            # DuckDB only creates a missing file on a read-write attach
+            duckdb.connect(os.fspath(path)).close()
+        options = " (READ_ONLY)" if attach_read_only else ""
+        con.execute(f"ATTACH '{path.as_posix()}' AS {path.stem}{options}")
+    return con
+
+
+def get_warehouse_version():
+    """
+    Identifies the current warehouse contents, the same way the dashboard does.
+
+    Returns:
+        str: The warehouse file's mtime and size.
+    """
+    stat = os.stat(DUCKDB_FILE_PATH)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def publish_version(output_dir, latest, keep_versions):
+    """
+    Points latest.json of a versioned output directory at a new version folder, then
+    removes the oldest versions. latest.json is replaced in one rename, so readers never
+    see a partial version, and the previous versions stay for readers still using them.
+
+    Args:
+        output_dir (Path): The directory holding the version folders and latest.json.
+        latest (dict): The contents of latest.json.
+        keep_versions (int): Version folders to keep.
+    """
+    latest_path = output_dir.joinpath("latest.json")
+    staged_path = output_dir.joinpath(f"latest.json.{os.getpid()}")
+    staged_path.write_text(json.dumps(latest, indent=2))
+    os.replace(staged_path, latest_path)
+
+    # Version folders sort by creation time
+    versions = sorted(path for path in output_dir.iterdir() if path.is_dir())
+    for stale_dir in versions[:-keep_versions]:
+        shutil.rmtree(stale_dir, ignore_errors=True)
+
+
+def load_dashboard_queries():
+    """
+    Imports the dashboard's query set from visualization/queries.py.
+    queries.py imports the dashboard's constants module by its bare name, so the
+    visualization directory is put on sys.path for the import.
+
+    Returns:
+        dict: Query name to SQL.
+    """
+    sys.path.insert(0, os.fspath(VISUALIZATION_DIR))
+    try:
+        return importlib.import_module("queries").DASHBOARD_QUERIES
+    finally:
+        sys.path.remove(os.fspath(VISUALIZATION_DIR))
 
 
 def extract_per_capita(per_capita_str):
@@ -52,7 +192,57 @@ def extract_total_gdp(total_gdp_str):
     return None
 
 
-def execute_upsert_query(con, table_name, df, create_table_query, upsert_query):
+def get_partition_from_path(file_path):
+    """
+    Derives the input partition of a source file.
+    Source files are laid out as data/input/<YYYYMMDD>/<window>/<file>.
+
+    Args:
+        file_path (Path): The path to the source file.
+
+    Returns:
+        tuple: Partition date (datetime.date) and window name (str).
+    """
+    file_path = Path(file_path)
+    partition_date = datetime.strptime(file_path.parent.parent.name, "%Y%m%d").date()
+    return partition_date, file_path.parent.name
+
+
+def read_input_partitions(partitions, file_name, reader, dedupe_key, performance):
+    """
+    Reads a source file from each input partition into a single DataFrame.
+    Each row is stamped with the partition it came from. When a key appears in
+    more than one partition, the latest partition wins so the upsert stays valid.
+
+    Args:
+        partitions (list): Partition keys formatted as "<YYYYMMDD>/<window>".
+        file_name (str): The source file name inside each partition folder.
+        reader (callable): Reads a file path into a DataFrame.
+        dedupe_key (str): The primary key column of the target table.
+        performance (AssetPerformance): Counts the bytes and rows read.
+
+    Returns:
+        pd.DataFrame: The combined DataFrame.
+    """
+    import pandas as pd
+
+    frames = []
+    for partition in sorted(partitions):
+        file_path = INPUT_DIR.joinpath(partition, file_name)
+        df = reader(file_path)
+        performance.add_input_file(file_path)
+        performance.rows_in += df.shape[0]
+        df["PARTITION_DATE"], df["PARTITION_WINDOW"] = get_partition_from_path(
+            file_path
+        )
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+    return df.drop_duplicates(subset=[dedupe_key], keep="last")
+
+
+def execute_upsert_query(
+    con, table_name, df, create_table_query, upsert_query, new_rows=None
+):
     """
     Executes the upsert query for a given DataFrame and table.
     Important for idempotent pipelines otherwise we would have duplicates.
@@ -63,12 +253,48 @@ def execute_upsert_query(con, table_name, df, create_table_query, upsert_query):
         df (pd.DataFrame): The DataFrame to upsert.
         create_table_query (str): The SQL query to create the table.
         upsert_query (str): The SQL query to upsert data into the table.
+        new_rows (pd.Series): True for rows known not to be in the table. They are
+            appended with a plain INSERT and only the other rows go through the upsert.
+
+    Returns:
+        int: The number of rows inserted or updated.
     """
     con.execute(create_table_query)
-    con.register(f"df_{table_name}", df)
-    con.execute(upsert_query)
     print(f"DataFrame loaded into {table_name}:")
     print(df.head())
+    inserted = 0
+    if new_rows is not None:
+        con.register(f"df_{table_name}_new", df[new_rows])
+        (inserted,) = con.execute(
+            f"INSERT INTO {table_name} SELECT * FROM df_{table_name}_new"
+        ).fetchone()
+        df = df[~new_rows]
+    con.register(f"df_{table_name}", df)
+    (upserted,) = con.execute(upsert_query).fetchone()
+    return inserted + upserted
+
+
+def order_id_metadata(order_id_check):
+    """
+    Summarizes the ORDER_ID filter check of a bronze load as Dagster output metadata.
+
+    Args:
+        order_id_check (OrderIdCheck): The result of check_order_ids.
+
+    Returns:
+        dict: Row counts of the classification and the confirmed duplicates.
+    """
+    duplicates = order_id_check.duplicates
+    metadata = {
+        "new_order_ids": int(order_id_check.new_rows.sum()),
+        "possible_duplicate_order_ids": order_id_check.possible_duplicates,
+        "cross_window_duplicates": len(duplicates),
+    }
+    if not duplicates.empty:
+        metadata["duplicates_preview"] = MetadataValue.md(
+            duplicates.head(20).to_markdown(index=False)
+        )
+    return metadata
 
 
 def load_json_data(file_path):
@@ -85,129 +311,322 @@ def load_json_data(file_path):
         return json.load(file)
 
 
+def loaded_input_partitions(context):
+    """
+    Lists the input partitions the run's order loads are configured with, for the dbt
+    models that only refresh the partitions a load touched.
+
+    Args:
+        context (AssetExecutionContext): The execution context.
+
+    Returns:
+        list: Partition keys, or None when the run config has no order loads, such as a
+            dbt-only run, in which case those models check every partition.
+    """
+    ops = context.run.run_config.get("ops", {})
+    partitions = set()
+    for asset_name in ORDER_INPUT_ASSETS:
+        if asset_name in ops:
+            config = ops[asset_name].get("config", {})
+            partitions.update(config.get("partitions", [DEFAULT_INPUT_PARTITION]))
+    return sorted(partitions) or None
+
+
 @dbt_assets(manifest=dbt_manifest_path)
 def dbt_assets(context: AssetExecutionContext, dbt: DbtCliResource):
     """
     Runs dbt build command and streams the output.
+    Each model materialization is annotated with its timings, rows written and DuckDB
+    query profile, and the run is appended to DBT_MODEL_RUN_HISTORY.
 
     Args:
         context (AssetExecutionContext): The execution context.
         dbt (DbtCliResource): The dbt CLI resource.
     """
-    yield from dbt.cli(["build"], context=context).stream()
+    profile_dir = DBT_QUERY_PROFILE_DIR.joinpath(context.run_id)
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    dbt_vars = {"query_profile_dir": profile_dir.as_posix()}
+    loaded_partitions = loaded_input_partitions(context)
+    if loaded_partitions is not None:
+        dbt_vars["loaded_partitions"] = loaded_partitions
+    invocation = dbt.cli(["build", "--vars", json.dumps(dbt_vars)], context=context)
+
+    # dbt holds the DuckDB write lock until it exits, so buffer the events before reading
+    # the warehouse. A failed build still reports the models that did succeed.
+    events, error = [], None
+    try:
+        for event in invocation.stream():
+            events.append(event)
+    except DagsterDbtCliRuntimeError as e:
+        error = e
+
+    records = {}
+    if invocation.target_path.joinpath("run_results.json").exists():
+        run_results = invocation.get_artifact("run_results.json")
+        records = dbt_model_performance(run_results, profile_dir)
+        # Silver models are counted through the attached silver file
+        with connect_warehouse(attach=["silver"]) as con:
+            record_dbt_run_history(
+                con, context.run_id, run_results["metadata"]["invocation_id"], records
+            )
+
+    for event in events:
+        if isinstance(event, Output):
+            record = records.get(event.metadata["unique_id"].value)
+            if record:
+                event = event.with_metadata(
+                    {**event.metadata, **dbt_model_metadata(record, profile_dir)}
+                )
+        yield event
+    if error:
+        raise error
+
+
+@asset(
+    compute_kind="python",
+    description="Archive Cold Order Partitions to Parquet",
+)
+def curated_fact_orders_archive(context: AssetExecutionContext) -> None:
+    """
+    Moves order partitions older than ARCHIVE_RETENTION_DAYS from the warehouse to
+    Hive-partitioned Parquet and points CURATED_FACT_ORDERS_ARCHIVE at the files.
+    Runs before the bronze loads, so a partition reloaded in the same run is not deleted.
 
+    Args:
+        context (AssetExecutionContext): The execution context.
+    """
+    with track_performance(context) as performance:
+        # The archived partitions are deleted from the bronze order tables as well
+        with connect_warehouse(attach=["bronze"], attach_read_only=False) as con:
+            partitions = cold_partitions(con, ARCHIVE_RETENTION_DAYS)
+            archived = {"rows": 0, "archive_bytes": 0}
+            if partitions:
+                archived = archive_partitions(con, partitions)
+            create_archive_view(con)
+        performance.rows_in = archived["rows"]
+        performance.rows_upserted = archived["rows"]
+
+    context.add_output_metadata(
+        {
+            "partitions": ", ".join(
+                f"{partition_date:%Y%m%d}/{partition_window}"
+                for partition_date, partition_window in partitions
+            ),
+            "archive_mb": round(archived["archive_bytes"] / 1024**2, 2),
+        }
+    )
 
-@asset(compute_kind="python", description="Extract and Load raw Excel dataset 1")
-def raw_dataset_1(context: AssetExecutionContext) -> None:
+
+@asset(
+    compute_kind="python",
+    description="Extract and Load raw Excel dataset 1",
+    deps=[curated_fact_orders_archive],
+)
+def raw_dataset_1(
+    context: AssetExecutionContext, config: InputPartitionsConfig
+) -> None:
     """
     Extracts and loads raw dataset 1 from an Excel file into DuckDB.
     Given source data contains both "DATA" and "CITY_DISTRICT_MAPPING" sheets.
     Args:
         context (AssetExecutionContext): The execution context.
+        config (InputPartitionsConfig): The input partitions to load.
     """
-    # Load data from the Excel file into a DataFrame
-    df = pd.read_excel(INPUT_EXCEL_PATH, sheet_name="DATA")
-    df.rename(columns={"ORDER_TIME  (PST)": "ORDER_TIME_PST"}, inplace=True)
-
-    # Connect to DuckDB and set the pandas analyze sample parameter
-    with duckdb.connect(os.fspath(DUCKDB_FILE_PATH)) as con:
-        con.execute(
-            "SET GLOBAL pandas_analyze_sample=100000000"
-        )  # We need to tell duckdb to automatically convert some cols as VARCHAR first otherwise it will fail loading.
-
-        # SQL query to create the table if it does not exist
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS RAW_DATASET_1 (
-            ORDER_ID VARCHAR PRIMARY KEY,
-            ORDER_TIME_PST VARCHAR,
-            CITY_DISTRICT_ID INT,
-            RPTG_AMT DECIMAL(18,2),
-            CURRENCY_CD VARCHAR,
-            ORDER_QTY VARCHAR
-        );
-        """
-
-        # SQL query to upsert data into the table
-        upsert_query = """
-        INSERT INTO RAW_DATASET_1
-        SELECT * FROM df_raw_dataset_1
-        ON CONFLICT(ORDER_ID) DO UPDATE SET
-            ORDER_TIME_PST = EXCLUDED.ORDER_TIME_PST,
-            CITY_DISTRICT_ID = EXCLUDED.CITY_DISTRICT_ID,
-            RPTG_AMT = EXCLUDED.RPTG_AMT,
-            CURRENCY_CD = EXCLUDED.CURRENCY_CD,
-            ORDER_QTY = EXCLUDED.ORDER_QTY;
-        """
-
-        # Execute the upsert query
-        execute_upsert_query(con, "raw_dataset_1", df, create_table_query, upsert_query)
-
-    # Log metadata about the table we just wrote. It will show up in the UI.
-    context.add_output_metadata({"num_rows": df.shape[0]})
-
-
-@asset(compute_kind="python", description="Extract and Load raw JSON dataset 2")
-def raw_dataset_2(context: AssetExecutionContext) -> None:
+    import pandas as pd
+
+    with track_performance(context) as performance:
+        # Load data from the Excel file of each partition into a DataFrame
+        df = read_input_partitions(
+            config.partitions,
+            INPUT_EXCEL_FILE_NAME,
+            lambda file_path: pd.read_excel(file_path, sheet_name="DATA").rename(
+                columns={"ORDER_TIME  (PST)": "ORDER_TIME_PST"}
+            ),
+            "ORDER_ID",
+            performance,
+        )
+
+        # Connect to DuckDB and set the pandas analyze sample parameter
+        with connect_warehouse("bronze") as con:
+            con.execute(
+                "SET GLOBAL pandas_analyze_sample=100000000"
+            )  # We need to tell duckdb to automatically convert some cols as VARCHAR first otherwise it will fail loading.
+
+            # SQL query to create the table if it does not exist
+            create_table_query = """
+            CREATE TABLE IF NOT EXISTS RAW_DATASET_1 (
+                ORDER_ID VARCHAR PRIMARY KEY,
+                ORDER_TIME_PST VARCHAR,
+                CITY_DISTRICT_ID INT,
+                RPTG_AMT DECIMAL(18,2),
+                CURRENCY_CD VARCHAR,
+                ORDER_QTY VARCHAR,
+                PARTITION_DATE DATE,
+                PARTITION_WINDOW VARCHAR
+            );
+            ALTER TABLE RAW_DATASET_1 ADD COLUMN IF NOT EXISTS PARTITION_DATE DATE;
+            ALTER TABLE RAW_DATASET_1 ADD COLUMN IF NOT EXISTS PARTITION_WINDOW VARCHAR;
+            """
+
+            # SQL query to upsert data into the table
+            upsert_query = """
+            INSERT INTO RAW_DATASET_1
+            SELECT * FROM df_raw_dataset_1
+            ON CONFLICT(ORDER_ID) DO UPDATE SET
+                ORDER_TIME_PST = EXCLUDED.ORDER_TIME_PST,
+                CITY_DISTRICT_ID = EXCLUDED.CITY_DISTRICT_ID,
+                RPTG_AMT = EXCLUDED.RPTG_AMT,
+                CURRENCY_CD = EXCLUDED.CURRENCY_CD,
+                ORDER_QTY = EXCLUDED.ORDER_QTY,
+                PARTITION_DATE = EXCLUDED.PARTITION_DATE,
+                PARTITION_WINDOW = EXCLUDED.PARTITION_WINDOW;
+            """
+
+            # Execute the upsert query
+            # The ORDER_ID filters and the load are updated together
+            con.execute("BEGIN TRANSACTION")
+            order_id_check = check_order_ids(con, "RAW_DATASET_1", df)
+            performance.rows_upserted = execute_upsert_query(
+                con,
+                "raw_dataset_1",
+                df,
+                create_table_query,
+                upsert_query,
+                new_rows=order_id_check.new_rows,
+            )
+            record_order_ids(con, context.run_id, "RAW_DATASET_1", order_id_check)
+            con.execute("COMMIT")
+        # Keys repeated across partitions are only written once
+        performance.rows_rejected = performance.rows_in - performance.rows_upserted
+
+        # Log metadata about the table we just wrote. It will show up in the UI.
+        context.add_output_metadata(
+            {
+                "num_rows": df.shape[0],
+                "partitions": ", ".join(config.partitions),
+                **order_id_metadata(order_id_check),
+            }
+        )
+
+
+@asset(
+    compute_kind="python",
+    description="Extract and Load raw JSON dataset 2",
+    deps=[curated_fact_orders_archive],
+)
+def raw_dataset_2(
+    context: AssetExecutionContext, config: InputPartitionsConfig
+) -> None:
     """
     Extracts and loads raw dataset 2 from a JSON file into DuckDB.
     Args:
         context (AssetExecutionContext): The execution context.
+        config (InputPartitionsConfig): The input partitions to load.
     """
-    df = pd.read_json(INPUT_JSON_PATH)
-    with duckdb.connect(os.fspath(DUCKDB_FILE_PATH)) as con:
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS RAW_DATASET_2 (
-            ORDER_ID VARCHAR PRIMARY KEY,
-            ORDER_TIME_PST BIGINT,
-            SHIP_TO_DISTRICT_NAME VARCHAR,
-            SHIP_TO_CITY_CD VARCHAR,
-            RPTG_AMT DECIMAL(18,2),
-            CURRENCY_CD VARCHAR,
-            ORDER_QTY INT
-        );
-        """
-        upsert_query = """
-        INSERT INTO RAW_DATASET_2
-        SELECT * FROM df_raw_dataset_2
-        ON CONFLICT(ORDER_ID) DO UPDATE SET
-            ORDER_TIME_PST = EXCLUDED.ORDER_TIME_PST,
-            SHIP_TO_CITY_CD = EXCLUDED.SHIP_TO_CITY_CD,
-            SHIP_TO_DISTRICT_NAME = EXCLUDED.SHIP_TO_DISTRICT_NAME,
-            RPTG_AMT = EXCLUDED.RPTG_AMT,
-            CURRENCY_CD = EXCLUDED.CURRENCY_CD,
-            ORDER_QTY = EXCLUDED.ORDER_QTY;
-        """
-        execute_upsert_query(con, "raw_dataset_2", df, create_table_query, upsert_query)
-    context.add_output_metadata({"num_rows": df.shape[0]})
+    import pandas as pd
+
+    with track_performance(context) as performance:
+        df = read_input_partitions(
+            config.partitions,
+            INPUT_JSON_FILE_NAME,
+            pd.read_json,
+            "ORDER_ID",
+            performance,
+        )
+        with connect_warehouse("bronze") as con:
+            create_table_query = """
+            CREATE TABLE IF NOT EXISTS RAW_DATASET_2 (
+                ORDER_ID VARCHAR PRIMARY KEY,
+                ORDER_TIME_PST BIGINT,
+                SHIP_TO_DISTRICT_NAME VARCHAR,
+                SHIP_TO_CITY_CD VARCHAR,
+                RPTG_AMT DECIMAL(18,2),
+                CURRENCY_CD VARCHAR,
+                ORDER_QTY INT,
+                PARTITION_DATE DATE,
+                PARTITION_WINDOW VARCHAR
+            );
+            ALTER TABLE RAW_DATASET_2 ADD COLUMN IF NOT EXISTS PARTITION_DATE DATE;
+            ALTER TABLE RAW_DATASET_2 ADD COLUMN IF NOT EXISTS PARTITION_WINDOW VARCHAR;
+            """
+            upsert_query = """
+            INSERT INTO RAW_DATASET_2
+            SELECT * FROM df_raw_dataset_2
+            ON CONFLICT(ORDER_ID) DO UPDATE SET
+                ORDER_TIME_PST = EXCLUDED.ORDER_TIME_PST,
+                SHIP_TO_CITY_CD = EXCLUDED.SHIP_TO_CITY_CD,
+                SHIP_TO_DISTRICT_NAME = EXCLUDED.SHIP_TO_DISTRICT_NAME,
+                RPTG_AMT = EXCLUDED.RPTG_AMT,
+                CURRENCY_CD = EXCLUDED.CURRENCY_CD,
+                ORDER_QTY = EXCLUDED.ORDER_QTY,
+                PARTITION_DATE = EXCLUDED.PARTITION_DATE,
+                PARTITION_WINDOW = EXCLUDED.PARTITION_WINDOW;
+            """
+            # The ORDER_ID filters and the load are updated together
+            con.execute("BEGIN TRANSACTION")
+            order_id_check = check_order_ids(con, "RAW_DATASET_2", df)
+            performance.rows_upserted = execute_upsert_query(
+                con,
+                "raw_dataset_2",
+                df,
+                create_table_query,
+                upsert_query,
+                new_rows=order_id_check.new_rows,
+            )
+            record_order_ids(con, context.run_id, "RAW_DATASET_2", order_id_check)
+            con.execute("COMMIT")
+        # Keys repeated across partitions are only written once
+        performance.rows_rejected = performance.rows_in - performance.rows_upserted
+        context.add_output_metadata(
+            {
+                "num_rows": df.shape[0],
+                "partitions": ", ".join(config.partitions),
+                **order_id_metadata(order_id_check),
+            }
+        )
 
 
 @asset(compute_kind="python", description="Extract and Load City-District Mapping")
-def raw_mapping(context: AssetExecutionContext) -> None:
+def raw_mapping(context: AssetExecutionContext, config: InputPartitionsConfig) -> None:
     """
     Extracts and loads raw mapping from an Excel file into DuckDB.
     Given source data contains both "DATA" and "CITY_DISTRICT_MAPPING" sheets.
 
     Args:
         context (AssetExecutionContext): The execution context.
+        config (InputPartitionsConfig): The input partitions to load.
     """
-    df = pd.read_excel(INPUT_EXCEL_PATH, sheet_name="CITY_DISTRICT_MAP")
-    with duckdb.connect(os.fspath(DUCKDB_FILE_PATH)) as con:
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS RAW_MAPPING (
-            CITY_DISTRICT_ID INT PRIMARY KEY,
-            SHIP_TO_CITY_CD VARCHAR,
-            SHIP_TO_DISTRICT_NAME VARCHAR
-        );
-        """
-        upsert_query = """
-        INSERT INTO RAW_MAPPING
-        SELECT * FROM df_raw_mapping
-        ON CONFLICT(CITY_DISTRICT_ID) DO UPDATE SET
-            SHIP_TO_CITY_CD = EXCLUDED.SHIP_TO_CITY_CD,
-            SHIP_TO_DISTRICT_NAME = EXCLUDED.SHIP_TO_DISTRICT_NAME;
-        """
-        execute_upsert_query(con, "raw_mapping", df, create_table_query, upsert_query)
-    context.add_output_metadata({"num_rows": df.shape[0]})
+    import pandas as pd
+
+    with track_performance(context) as performance:
+        df = read_input_partitions(
+            config.partitions,
+            INPUT_EXCEL_FILE_NAME,
+            lambda file_path: pd.read_excel(file_path, sheet_name="CITY_DISTRICT_MAP"),
+            "CITY_DISTRICT_ID",
+            performance,
+        )
+        with connect_warehouse("bronze") as con:
+            create_table_query = """
+            CREATE TABLE IF NOT EXISTS RAW_MAPPING (
+                CITY_DISTRICT_ID INT PRIMARY KEY,
+                SHIP_TO_CITY_CD VARCHAR,
+                SHIP_TO_DISTRICT_NAME VARCHAR
+            );
+            """
+            upsert_query = """
+            INSERT INTO RAW_MAPPING
+            SELECT CITY_DISTRICT_ID, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME FROM df_raw_mapping
+            ON CONFLICT(CITY_DISTRICT_ID) DO UPDATE SET
+                SHIP_TO_CITY_CD = EXCLUDED.SHIP_TO_CITY_CD,
+                SHIP_TO_DISTRICT_NAME = EXCLUDED.SHIP_TO_DISTRICT_NAME;
+            """
+            performance.rows_upserted = execute_upsert_query(
+                con, "raw_mapping", df, create_table_query, upsert_query
+            )
+        # Keys repeated across partitions are only written once
+        performance.rows_rejected = performance.rows_in - performance.rows_upserted
+        context.add_output_metadata({"num_rows": df.shape[0]})
 
 
 @asset(
@@ -223,62 +642,66 @@ def translations_city_mapping(context: AssetExecutionContext) -> None:
     Args:
         context (AssetExecutionContext): The execution context.
     """
-    json_data = load_json_data(CITY_TRANSLATIONS_FILE_PATH)
-    with duckdb.connect(os.fspath(DUCKDB_FILE_PATH)) as con:
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS TRANSLATIONS_CITY_MAPPING (
-                SHIP_TO_CITY_CD VARCHAR PRIMARY KEY,
-                SHIP_TO_CITY_CD_ENG VARCHAR,
-                METADATA JSON,
-                PROVINCE VARCHAR,
-                PER_CAPITA_USD VARCHAR,
-                TOTAL_GDP_USD VARCHAR
-            );
-            """
-        )
-        for item in json_data:
-            metadata = json.dumps(item["metadata"])
-            if item["SHIP_TO_CITY_CD_ENG"] in [
-                "Shanghai",
-                "Beijing",
-                "Tianjin",
-                "Chongqing",  # 4 municipalities
-            ]:
-                province = item["SHIP_TO_CITY_CD_ENG"]
-            else:
-                province = item["metadata"].get("Province", "").replace(
-                    '"', ""
-                ) or item["metadata"].get("Autonomous region", "").replace('"', "")
-                if not province:
-                    province = None
-
-            per_capita_str = item["metadata"].get("Per capita", "")
-            per_capita_usd = extract_per_capita(per_capita_str)
-
-            total_gdp_str = item["metadata"].get("Total", "")
-            total_gdp_usd = extract_total_gdp(total_gdp_str)
-
+    with track_performance(context) as performance:
+        json_data = load_json_data(CITY_TRANSLATIONS_FILE_PATH)
+        performance.add_input_file(CITY_TRANSLATIONS_FILE_PATH)
+        performance.rows_in = len(json_data)
+        with connect_warehouse("silver") as con:
             con.execute(
                 """
-                INSERT INTO TRANSLATIONS_CITY_MAPPING (SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG, metadata, PROVINCE, PER_CAPITA_USD, TOTAL_GDP_USD)
-                VALUES (?, ?, ?, ?, ?, ?)
-                ON CONFLICT(SHIP_TO_CITY_CD) DO UPDATE SET
-                    SHIP_TO_CITY_CD_ENG = EXCLUDED.SHIP_TO_CITY_CD_ENG,
-                    metadata = EXCLUDED.metadata,
-                    PROVINCE = EXCLUDED.PROVINCE,
-                    PER_CAPITA_USD = EXCLUDED.PER_CAPITA_USD,
-                    TOTAL_GDP_USD = EXCLUDED.TOTAL_GDP_USD
-                """,
-                (
-                    item["SHIP_TO_CITY_CD"],
-                    item["SHIP_TO_CITY_CD_ENG"],
-                    metadata,
-                    province,
-                    per_capita_usd,
-                    total_gdp_usd,
-                ),
+                CREATE TABLE IF NOT EXISTS TRANSLATIONS_CITY_MAPPING (
+                    SHIP_TO_CITY_CD VARCHAR PRIMARY KEY,
+                    SHIP_TO_CITY_CD_ENG VARCHAR,
+                    METADATA JSON,
+                    PROVINCE VARCHAR,
+                    PER_CAPITA_USD VARCHAR,
+                    TOTAL_GDP_USD VARCHAR
+                );
+                """
             )
+            for item in json_data:
+                metadata = json.dumps(item["metadata"])
+                if item["SHIP_TO_CITY_CD_ENG"] in [
+                    "Shanghai",
+                    "Beijing",
+                    "Tianjin",
+                    "Chongqing",  # 4 municipalities
+                ]:
+                    province = item["SHIP_TO_CITY_CD_ENG"]
+                else:
+                    province = item["metadata"].get("Province", "").replace(
+                        '"', ""
+                    ) or item["metadata"].get("Autonomous region", "").replace('"', "")
+                    if not province:
+                        province = None
+
+                per_capita_str = item["metadata"].get("Per capita", "")
+                per_capita_usd = extract_per_capita(per_capita_str)
+
+                total_gdp_str = item["metadata"].get("Total", "")
+                total_gdp_usd = extract_total_gdp(total_gdp_str)
+
+                (upserted,) = con.execute(
+                    """
+                    INSERT INTO TRANSLATIONS_CITY_MAPPING (SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG, metadata, PROVINCE, PER_CAPITA_USD, TOTAL_GDP_USD)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(SHIP_TO_CITY_CD) DO UPDATE SET
+                        SHIP_TO_CITY_CD_ENG = EXCLUDED.SHIP_TO_CITY_CD_ENG,
+                        metadata = EXCLUDED.metadata,
+                        PROVINCE = EXCLUDED.PROVINCE,
+                        PER_CAPITA_USD = EXCLUDED.PER_CAPITA_USD,
+                        TOTAL_GDP_USD = EXCLUDED.TOTAL_GDP_USD
+                    """,
+                    (
+                        item["SHIP_TO_CITY_CD"],
+                        item["SHIP_TO_CITY_CD_ENG"],
+                        metadata,
+                        province,
+                        per_capita_usd,
+                        total_gdp_usd,
+                    ),
+                ).fetchone()
+                performance.rows_upserted += upserted
 
 
 @asset(
@@ -295,32 +718,36 @@ def translations_district_mapping(context: AssetExecutionContext) -> None:
     Args:
         context (AssetExecutionContext): The execution context.
     """
-    json_data = load_json_data(DISTRICTS_TRANSLATIONS_FILE_PATH)
-    with duckdb.connect(os.fspath(DUCKDB_FILE_PATH)) as con:
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS TRANSLATIONS_DISTRICT_MAPPING (
-                SHIP_TO_DISTRICT_NAME VARCHAR PRIMARY KEY,
-                SHIP_TO_DISTRICT_NAME_ENG VARCHAR,
-                METADATA JSON
-            );
-            """
-        )
-        for item in json_data:
+    with track_performance(context) as performance:
+        json_data = load_json_data(DISTRICTS_TRANSLATIONS_FILE_PATH)
+        performance.add_input_file(DISTRICTS_TRANSLATIONS_FILE_PATH)
+        performance.rows_in = len(json_data)
+        with connect_warehouse("silver") as con:
             con.execute(
                 """
-                INSERT INTO TRANSLATIONS_DISTRICT_MAPPING (SHIP_TO_DISTRICT_NAME, SHIP_TO_DISTRICT_NAME_ENG, metadata)
-                VALUES (?, ?, ?)
-                ON CONFLICT(SHIP_TO_DISTRICT_NAME) DO UPDATE SET
-                    SHIP_TO_DISTRICT_NAME_ENG = EXCLUDED.SHIP_TO_DISTRICT_NAME_ENG,
-                    metadata = EXCLUDED.metadata
-                """,
-                (
-                    item["SHIP_TO_DISTRICT_NAME"],
-                    item["SHIP_TO_DISTRICT_NAME_ENG"],
-                    json.dumps(item["metadata"]),
-                ),
+                CREATE TABLE IF NOT EXISTS TRANSLATIONS_DISTRICT_MAPPING (
+                    SHIP_TO_DISTRICT_NAME VARCHAR PRIMARY KEY,
+                    SHIP_TO_DISTRICT_NAME_ENG VARCHAR,
+                    METADATA JSON
+                );
+                """
             )
+            for item in json_data:
+                (upserted,) = con.execute(
+                    """
+                    INSERT INTO TRANSLATIONS_DISTRICT_MAPPING (SHIP_TO_DISTRICT_NAME, SHIP_TO_DISTRICT_NAME_ENG, metadata)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(SHIP_TO_DISTRICT_NAME) DO UPDATE SET
+                        SHIP_TO_DISTRICT_NAME_ENG = EXCLUDED.SHIP_TO_DISTRICT_NAME_ENG,
+                        metadata = EXCLUDED.metadata
+                    """,
+                    (
+                        item["SHIP_TO_DISTRICT_NAME"],
+                        item["SHIP_TO_DISTRICT_NAME_ENG"],
+                        json.dumps(item["metadata"]),
+                    ),
+                ).fetchone()
+                performance.rows_upserted += upserted
 
 
 @asset(
@@ -335,27 +762,29 @@ def currency_code_mapping(context: AssetExecutionContext) -> None:
     Args:
         context (AssetExecutionContext): The execution context.
     """
-    with duckdb.connect(os.fspath(DUCKDB_FILE_PATH)) as con:
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS CURRENCY_CODE_MAPPING (
-                CURRENCY_CD VARCHAR PRIMARY KEY,
-                MULTIPLIER FLOAT,
-                DATE_RECORDED DATE
-            );
-            """
-        )
-        con.execute(
-            """
-            INSERT INTO CURRENCY_CODE_MAPPING (CURRENCY_CD, MULTIPLIER, DATE_RECORDED)
-            VALUES 
-                ('RMB', 1, CURRENT_DATE),
-                ('USD', 7.28, CURRENT_DATE)
-            ON CONFLICT (CURRENCY_CD) DO UPDATE SET
-                MULTIPLIER = EXCLUDED.MULTIPLIER,
-                DATE_RECORDED = EXCLUDED.DATE_RECORDED;
-            """
-        )
+    with track_performance(context) as performance:
+        with connect_warehouse("silver") as con:
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS CURRENCY_CODE_MAPPING (
+                    CURRENCY_CD VARCHAR PRIMARY KEY,
+                    MULTIPLIER FLOAT,
+                    DATE_RECORDED DATE
+                );
+                """
+            )
+            (performance.rows_upserted,) = con.execute(
+                """
+                INSERT INTO CURRENCY_CODE_MAPPING (CURRENCY_CD, MULTIPLIER, DATE_RECORDED)
+                VALUES 
+                    ('RMB', 1, CURRENT_DATE),
+                    ('USD', 7.28, CURRENT_DATE)
+                ON CONFLICT (CURRENCY_CD) DO UPDATE SET
+                    MULTIPLIER = EXCLUDED.MULTIPLIER,
+                    DATE_RECORDED = EXCLUDED.DATE_RECORDED;
+                """
+            ).fetchone()
+            performance.rows_in = performance.rows_upserted
 
 
 @asset(
@@ -372,21 +801,220 @@ def curated_city_cluster_results(context: AssetExecutionContext) -> None:
     Args:
         context (AssetExecutionContext): The execution context.
     """
-    with duckdb.connect(os.fspath(DUCKDB_FILE_PATH)) as con:
-        con.execute("DROP TABLE IF EXISTS CURATED_CITY_CLUSTER_RESULTS")
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS CURATED_CITY_CLUSTER_RESULTS (
-                SHIP_TO_CITY_CD VARCHAR,
-                RMB_DOLLARS DOUBLE,
-                SHIP_TO_CITY_CD_ENG VARCHAR,
-                PROVINCE VARCHAR,
-                PER_CAPITA_USD VARCHAR,
-                normalized_sales DOUBLE,
-                cluster INTEGER
-            );
-            """
-        )
-        con.execute(
-            f"COPY CURATED_CITY_CLUSTER_RESULTS FROM '{CITY_CLUSTER_RESULTS_FILE_PATH}' (HEADER, DELIMITER ',');"
+    with track_performance(context) as performance:
+        performance.add_input_file(CITY_CLUSTER_RESULTS_FILE_PATH)
+        with connect_warehouse() as con:
+            con.execute("DROP TABLE IF EXISTS CURATED_CITY_CLUSTER_RESULTS")
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS CURATED_CITY_CLUSTER_RESULTS (
+                    SHIP_TO_CITY_CD VARCHAR,
+                    RMB_DOLLARS DOUBLE,
+                    SHIP_TO_CITY_CD_ENG VARCHAR,
+                    PROVINCE VARCHAR,
+                    PER_CAPITA_USD VARCHAR,
+                    normalized_sales DOUBLE,
+                    cluster INTEGER
+                );
+                """
+            )
+            (performance.rows_in,) = con.execute(
+                f"COPY CURATED_CITY_CLUSTER_RESULTS FROM '{CITY_CLUSTER_RESULTS_FILE_PATH}' (HEADER, DELIMITER ',');"
+            ).fetchone()
+            performance.rows_upserted = performance.rows_in
+
+
+@asset(
+    compute_kind="python", description="Checkpoint, Compact and Measure the Warehouse"
+)
+def warehouse_maintenance(
+    context: AssetExecutionContext, config: WarehouseMaintenanceConfig
+) -> None:
+    """
+    Checkpoints each layer of the warehouse and compacts its file once enough of it is free
+    blocks, rewriting every table in its sort order. Per-table row counts, row groups, stored
+    size and compression ratio are taken before and after and appended to
+    WAREHOUSE_STORAGE_HISTORY in the gold file. Bronze and silver tables are recorded with
+    their layer's file stem as a prefix.
+
+    Args:
+        context (AssetExecutionContext): The execution context.
+        config (WarehouseMaintenanceConfig): Whether to force compaction.
+    """
+    with track_performance(context) as performance:
+        measured_at = datetime.now()
+        before, after, layer_metadata = {}, {}, {}
+        sorted_tables, compacted_layers = [], []
+        for index, (layer, path) in enumerate(WAREHOUSE_LAYERS.items()):
+            if not path.exists():
+                continue
+            # Views read the layers below their own, which are attached for the rebuild
+            attach = list(WAREHOUSE_LAYERS)[:index]
+            prefix = "" if layer == "gold" else f"{path.stem}."
+            con = connect_warehouse(layer, attach=attach)
+            try:
+                con.execute("FORCE CHECKPOINT")
+                size_before = database_size(con, path)
+                layer_before = table_storage_stats(con, size_before["block_size"])
+                free_block_ratio = size_before["free_blocks"] / max(
+                    size_before["total_blocks"], 1
+                )
+                compacted = (
+                    config.force_compaction
+                    or free_block_ratio >= MAINTENANCE_MIN_FREE_BLOCK_RATIO
+                )
+                if compacted:
+                    sorted_tables += [
+                        f"{prefix}{name}" for name in compact_warehouse(con, path)
+                    ]
+                    compacted_layers.append(layer)
+                    con = connect_warehouse(layer, attach=attach)
+
+                size_after = database_size(con, path)
+                layer_after = table_storage_stats(con, size_after["block_size"])
+            finally:
+                con.close()
+
+            before.update(
+                {f"{prefix}{name}": stats for name, stats in layer_before.items()}
+            )
+            after.update(
+                {f"{prefix}{name}": stats for name, stats in layer_after.items()}
+            )
+            performance.input_bytes += size_before["file_bytes"]
+            performance.rows_in += sum(
+                table["row_count"] for table in layer_before.values()
+            )
+            if compacted:
+                performance.rows_upserted += sum(
+                    table["row_count"] for table in layer_before.values()
+                )
+            layer_metadata.update(
+                {
+                    f"{layer}_file_mb_before": round(
+                        size_before["file_bytes"] / 1024**2, 2
+                    ),
+                    f"{layer}_file_mb_after": round(
+                        size_after["file_bytes"] / 1024**2, 2
+                    ),
+                    f"{layer}_free_blocks_before": size_before["free_blocks"],
+                    f"{layer}_free_blocks_after": size_after["free_blocks"],
+                    f"{layer}_free_block_ratio": round(free_block_ratio, 3),
+                }
+            )
+
+        with connect_warehouse() as con:
+            record_storage_history(con, context.run_id, measured_at, "before", before)
+            record_storage_history(con, context.run_id, datetime.now(), "after", after)
+            con.execute("CHECKPOINT")
+
+    context.add_output_metadata(
+        {
+            "compacted_layers": ", ".join(compacted_layers),
+            **layer_metadata,
+            "sorted_tables": ", ".join(sorted_tables),
+            "storage": MetadataValue.md(storage_markdown(before, after)),
+        }
+    )
+
+
+@asset(
+    compute_kind="python",
+    description="Precompute Dashboard Chart Data",
+    deps=[dbt_assets, curated_city_cluster_results, warehouse_maintenance],
+)
+def dashboard_chart_data(context: AssetExecutionContext) -> None:
+    """
+    Runs every dashboard query once and writes each result to a Parquet file.
+    A version is written to its own folder and latest.json is switched to it last, so the
+    dashboard never reads a partial version. latest.json also records the warehouse version
+    the charts were computed from, and the dashboard only serves them while it matches.
+
+    Args:
+        context (AssetExecutionContext): The execution context.
+    """
+    with track_performance(context) as performance:
+        queries = load_dashboard_queries()
+        version = f"{datetime.now():%Y%m%dT%H%M%S}-{context.run_id[:8]}"
+        version_dir = CHART_DATA_DIR.joinpath(version)
+        version_dir.mkdir(parents=True)
+
+        charts = {}
+        with connect_warehouse(read_only=True) as con:
+            for name, query in queries.items():
+                file_name = f"{name}.parquet"
+                (rows,) = con.execute(
+                    f"""
+                    COPY (
+                        {query.strip().rstrip(";")}
+                    ) TO '{version_dir.joinpath(file_name).as_posix()}' (FORMAT PARQUET, COMPRESSION ZSTD)
+                    """
+                ).fetchone()
+                charts[name] = {"file": file_name, "rows": rows}
+                performance.rows_upserted += rows
+        performance.rows_in = performance.rows_upserted
+
+        latest = {
+            "version": version,
+            "warehouse_version": get_warehouse_version(),
+            "created_at": datetime.now().isoformat(),
+            "charts": charts,
+        }
+        publish_version(CHART_DATA_DIR, latest, CHART_DATA_KEEP_VERSIONS)
+
+    context.add_output_metadata(
+        {"version": version, "charts": len(charts), "chart_data_dir": str(version_dir)}
+    )
+
+
+@asset(
+    compute_kind="python",
+    description="Shard the Gold Order Facts by Province",
+    deps=[dbt_assets, curated_city_cluster_results, warehouse_maintenance],
+)
+def curated_province_shards(context: AssetExecutionContext) -> None:
+    """
+    Writes the gold order facts to one Parquet shard per province when PROVINCE_SHARDS is
+    enabled. The dashboard fans its order aggregates out across the shards and reads only
+    a province's own shard for a province-filtered query. Like the chart data, latest.json
+    records the warehouse version the shards were written from, and the dashboard only
+    reads them while it matches.
+
+    Args:
+        context (AssetExecutionContext): The execution context.
+    """
+    with track_performance(context) as performance:
+        if not PROVINCE_SHARDS_ENABLED:
+            # Shards of an earlier run would go stale, so they are no longer served
+            PROVINCE_SHARDS_DIR.joinpath("latest.json").unlink(missing_ok=True)
+            context.add_output_metadata({"enabled": False})
+            return
+
+        version = f"{datetime.now():%Y%m%dT%H%M%S}-{context.run_id[:8]}"
+        version_dir = PROVINCE_SHARDS_DIR.joinpath(version)
+        PROVINCE_SHARDS_DIR.mkdir(parents=True, exist_ok=True)
+        with connect_warehouse(read_only=True) as con:
+            shards = write_province_shards(con, version_dir)
+        performance.rows_in = sum(shard["rows"] for shard in shards)
+        performance.rows_upserted = performance.rows_in
+
+        publish_version(
+            PROVINCE_SHARDS_DIR,
+            {
+                "version": version,
+                "warehouse_version": get_warehouse_version(),
+                "created_at": datetime.now().isoformat(),
+                "shards": shards,
+            },
+            PROVINCE_SHARDS_KEEP_VERSIONS,
         )
+
+    context.add_output_metadata(
+        {
+            "enabled": True,
+            "version": version,
+            "shards": len(shards),
+            "largest_shard_rows": shards[0]["rows"] if shards else 0,
+            "shard_dir": str(version_dir),
+        }
+    )
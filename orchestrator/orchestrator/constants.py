@@ -1,29 +1,53 @@
+import hashlib
 import os
+import shutil
 from pathlib import Path
 
 from dagster_dbt import DbtCliResource
+from dbt.version import __version__ as dbt_version
 
 dbt_project_dir = Path(__file__).joinpath("..", "..", "..").resolve()
 dbt = DbtCliResource(project_dir=os.fspath(dbt_project_dir))
 
+# The warehouse is one DuckDB file per medallion layer. A connection opens one layer and
+# ATTACHes the others under their file stem, the same aliases the dbt profile uses. Gold is
+# the file the dashboard reads, so a bronze load never holds a lock its readers wait on.
 DUCKDB_FILE_PATH = (
     Path(__file__)
     .joinpath("..", "..", "..", "data", "output", "datawarehouse.duckdb")
     .resolve()
 )
+BRONZE_DUCKDB_FILE_PATH = DUCKDB_FILE_PATH.with_name("bronze.duckdb")
+SILVER_DUCKDB_FILE_PATH = DUCKDB_FILE_PATH.with_name("silver.duckdb")
+WAREHOUSE_LAYERS = {
+    "bronze": BRONZE_DUCKDB_FILE_PATH,
+    "silver": SILVER_DUCKDB_FILE_PATH,
+    "gold": DUCKDB_FILE_PATH,
+}
 
-INPUT_EXCEL_PATH = (
-    Path(__file__)
-    .joinpath("..", "..", "..", "data", "input", "20240723", "window1", "dataset1.xlsx")
-    .resolve()
-)
+# Source files land in data/input/<YYYYMMDD>/<window>/ and are addressed by "<YYYYMMDD>/<window>"
+INPUT_DIR = Path(__file__).joinpath("..", "..", "..", "data", "input").resolve()
+INPUT_EXCEL_FILE_NAME = "dataset1.xlsx"
+INPUT_JSON_FILE_NAME = "dataset2.json"
+DEFAULT_INPUT_PARTITION = "20240723/window1"
 
-INPUT_JSON_PATH = (
-    Path(__file__)
-    .joinpath("..", "..", "..", "data", "input", "20240723", "window1", "dataset2.json")
-    .resolve()
+# File-arrival sensor settings. DuckDB allows a single writer, so runs are capped at one by default.
+INPUT_SENSOR_INTERVAL_SECONDS = int(os.getenv("INPUT_SENSOR_INTERVAL_SECONDS", "30"))
+INPUT_SETTLE_SECONDS = int(os.getenv("INPUT_SETTLE_SECONDS", "60"))
+INPUT_MAX_CONCURRENT_RUNS = int(os.getenv("INPUT_MAX_CONCURRENT_RUNS", "1"))
+INPUT_MAX_PARTITIONS_PER_RUN = int(os.getenv("INPUT_MAX_PARTITIONS_PER_RUN", "24"))
+# Runs the sensor launches for a window before leaving it to a manual re-run
+INPUT_MAX_RUN_ATTEMPTS = int(os.getenv("INPUT_MAX_RUN_ATTEMPTS", "3"))
+# A requested run that still does not exist after this long counts as a failed attempt, e.g.
+# when its run key was already used or its launch failed
+INPUT_RUN_LAUNCH_TIMEOUT_SECONDS = int(
+    os.getenv("INPUT_RUN_LAUNCH_TIMEOUT_SECONDS", "600")
 )
 
+# tracemalloc makes pandas parsing several times slower, so traced peak memory is opt-in.
+# Peak RSS is always reported.
+ASSET_TRACE_MEMORY = os.getenv("ASSET_TRACE_MEMORY", "0") == "1"
+
 CITY_TRANSLATIONS_FILE_PATH = (
     Path(__file__)
     .joinpath("..", "..", "..", "data", "static", "mappings", "city_translations.json")
@@ -44,16 +68,122 @@ CITY_CLUSTER_RESULTS_FILE_PATH = (
     .resolve()
 )
 
-# If DAGSTER_DBT_PARSE_PROJECT_ON_LOAD is set, a manifest will be created at run time.
-# Otherwise, we expect a manifest to be present in the project's target directory.
-if os.getenv("DAGSTER_DBT_PARSE_PROJECT_ON_LOAD"):
-    dbt_manifest_path = (
-        dbt.cli(
-            ["--quiet", "parse"],
-            target_path=Path("target"),
+# The dashboard's query set is read from visualization/queries.py. Its results are written to
+# data/output/chart_data/<version>/ and latest.json points the dashboard at the newest version.
+VISUALIZATION_DIR = Path(__file__).joinpath("..", "..", "..", "visualization").resolve()
+CHART_DATA_DIR = (
+    Path(__file__).joinpath("..", "..", "..", "data", "output", "chart_data").resolve()
+)
+# Older versions are kept so a dashboard reading the previous latest.json can finish
+CHART_DATA_KEEP_VERSIONS = 2
+
+# Optional province sharding of the gold facts, for the dashboard's fan-out queries. Each
+# run's shards are written to data/output/province_shards/<version>/ and latest.json points
+# the dashboard at the newest version.
+PROVINCE_SHARDS_ENABLED = os.getenv("PROVINCE_SHARDS", "0") == "1"
+PROVINCE_SHARDS_DIR = (
+    Path(__file__)
+    .joinpath("..", "..", "..", "data", "output", "province_shards")
+    .resolve()
+)
+PROVINCE_SHARDS_KEEP_VERSIONS = 2
+
+# Order partitions older than this many days, counted back from the newest partition, are
+# moved from the warehouse to Parquet under data/output/archive/
+ARCHIVE_DIR = (
+    Path(__file__).joinpath("..", "..", "..", "data", "output", "archive").resolve()
+)
+ARCHIVE_RETENTION_DAYS = int(os.getenv("ARCHIVE_RETENTION_DAYS", "30"))
+
+# Bloom filters over the loaded ORDER_IDs. The first layer of a filter holds this many keys at
+# this false positive rate, later layers twice as many at half the rate.
+ORDER_ID_FILTER_CAPACITY = int(os.getenv("ORDER_ID_FILTER_CAPACITY", "1000000"))
+ORDER_ID_FILTER_ERROR_RATE = float(os.getenv("ORDER_ID_FILTER_ERROR_RATE", "0.01"))
+
+# Warehouse maintenance runs on this schedule. The file is only compacted once at least this
+# share of its blocks is free, or when the run config forces it.
+MAINTENANCE_CRON_SCHEDULE = os.getenv("MAINTENANCE_CRON_SCHEDULE", "0 3 * * 0")
+MAINTENANCE_MIN_FREE_BLOCK_RATIO = float(
+    os.getenv("MAINTENANCE_MIN_FREE_BLOCK_RATIO", "0.2")
+)
+# Order tables are rewritten in sort order on compaction. Sorting by partition keeps the
+# zonemaps of each row group narrow, so partition filters skip row groups. Other tables keep
+# their order.
+WAREHOUSE_SORT_KEYS = {
+    "RAW_DATASET_1": "PARTITION_DATE, PARTITION_WINDOW, ORDER_ID",
+    "RAW_DATASET_2": "PARTITION_DATE, PARTITION_WINDOW, ORDER_ID",
+    "curated_fact_orders_hot": "PARTITION_DATE, PARTITION_WINDOW, ORDER_TS",
+    "curated_partition_leaders": "PARTITION_DATE, PARTITION_WINDOW, BOARD",
+    "curated_distinct_sketches": "PARTITION_DATE, PARTITION_WINDOW",
+    "curated_fact_orders_sample": "PARTITION_DATE, PARTITION_WINDOW",
+    "curated_quantile_sketches": "PARTITION_DATE, PARTITION_WINDOW",
+    "DBT_MODEL_RUN_HISTORY": "STARTED_AT",
+    "WAREHOUSE_STORAGE_HISTORY": "MEASURED_AT",
+    "ORDER_ID_DUPLICATES": "DETECTED_AT",
+}
+
+# DuckDB query profiles of each dbt run are written to target/query_profiles/<run_id>/<model>.json
+DBT_QUERY_PROFILE_DIR = dbt_project_dir.joinpath("target", "query_profiles")
+
+# dbt sources that determine the manifest. Parsed manifests are cached under
+# target/manifest_cache/<hash>/ so a code-location reload only re-parses after they change.
+DBT_MANIFEST_SOURCES = ["models", "macros", "dbt_project.yml", "profiles.yml"]
+DBT_MANIFEST_CACHE_DIR = dbt_project_dir.joinpath("target", "manifest_cache")
+
+
+def dbt_sources_hash():
+    """
+    Hashes the dbt sources the manifest is parsed from, plus the installed dbt version.
+
+    Returns:
+        str: Hex digest identifying the manifest the sources would produce.
+    """
+    digest = hashlib.sha256(dbt_version.encode())
+    for source in DBT_MANIFEST_SOURCES:
+        source_path = dbt_project_dir.joinpath(source)
+        files = (
+            sorted(source_path.rglob("*")) if source_path.is_dir() else [source_path]
         )
-        .wait()
-        .target_path.joinpath("manifest.json")
-    )
-else:
-    dbt_manifest_path = dbt_project_dir.joinpath("target", "manifest.json")
+        for file_path in files:
+            if file_path.is_file():
+                digest.update(
+                    file_path.relative_to(dbt_project_dir).as_posix().encode()
+                )
+                digest.update(file_path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def get_dbt_manifest_path():
+    """
+    Returns a manifest matching the current dbt sources, parsing the project only on a cache miss.
+    Parsing needs DAGSTER_DBT_PARSE_PROJECT_ON_LOAD. Without it, the project's
+    target/manifest.json is used when the cache has no match.
+
+    Returns:
+        Path: The manifest.json path.
+    """
+    cache_path = DBT_MANIFEST_CACHE_DIR.joinpath(dbt_sources_hash())
+    manifest_path = cache_path.joinpath("manifest.json")
+    if manifest_path.exists():
+        return manifest_path
+    if not os.getenv("DAGSTER_DBT_PARSE_PROJECT_ON_LOAD"):
+        return dbt_project_dir.joinpath("target", "manifest.json")
+
+    # Parse into a private directory and rename it into place, as the webserver and the
+    # daemon can load the code location at the same time. Partial parsing can drop nodes
+    # when models are renamed, and this only runs after the sources changed, so parse fully.
+    parse_path = DBT_MANIFEST_CACHE_DIR.joinpath(f"{cache_path.name}.{os.getpid()}")
+    dbt.cli(["--quiet", "parse", "--no-partial-parse"], target_path=parse_path).wait()
+    try:
+        parse_path.rename(cache_path)
+    except OSError:  # Another process cached the same sources first
+        shutil.rmtree(parse_path, ignore_errors=True)
+
+    # Keep only the manifest of the current sources
+    for stale_path in DBT_MANIFEST_CACHE_DIR.iterdir():
+        if len(stale_path.name) == len(cache_path.name) and stale_path != cache_path:
+            shutil.rmtree(stale_path, ignore_errors=True)
+    return manifest_path
+
+
+dbt_manifest_path = get_dbt_manifest_path()
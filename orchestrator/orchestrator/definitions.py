@@ -4,6 +4,7 @@ from dagster import Definitions, in_process_executor
 from dagster_dbt import DbtCliResource
 
 from .assets import (
+    curated_fact_orders_archive,
     raw_dataset_1,
     raw_dataset_2,
     raw_mapping,
@@ -12,12 +13,18 @@ from .assets import (
     translations_district_mapping,
     currency_code_mapping,
     curated_city_cluster_results,
+    warehouse_maintenance,
+    dashboard_chart_data,
+    curated_province_shards,
 )
 from .constants import dbt_project_dir
+from .jobs import incremental_input_job, warehouse_maintenance_job
 from .schedules import schedules
+from .sensors import sensors
 
 defs = Definitions(
     assets=[
+        curated_fact_orders_archive,
         raw_dataset_1,
         raw_dataset_2,
         raw_mapping,
@@ -26,8 +33,13 @@ defs = Definitions(
         translations_district_mapping,
         currency_code_mapping,
         curated_city_cluster_results,
+        warehouse_maintenance,
+        dashboard_chart_data,
+        curated_province_shards,
     ],
+    jobs=[incremental_input_job, warehouse_maintenance_job],
     schedules=schedules,
+    sensors=sensors,
     resources={
         "dbt": DbtCliResource(project_dir=os.fspath(dbt_project_dir)),
     },
@@ -0,0 +1,46 @@
+"""
+Jobs that write to the warehouse. DuckDB allows a single writer, so the file-arrival sensor
+and the maintenance schedule each hold off while a run of the other job is active.
+"""
+
+from dagster import AssetSelection, DagsterRunStatus, RunsFilter, define_asset_job
+
+ACTIVE_RUN_STATUSES = [
+    DagsterRunStatus.QUEUED,
+    DagsterRunStatus.NOT_STARTED,
+    DagsterRunStatus.STARTING,
+    DagsterRunStatus.STARTED,
+]
+
+MAINTENANCE_ASSETS = AssetSelection.keys("warehouse_maintenance")
+
+incremental_input_job = define_asset_job(
+    name="incremental_input_job",
+    selection=AssetSelection.all() - MAINTENANCE_ASSETS,
+    description="Loads newly landed input windows from bronze through to gold.",
+)
+
+# The chart data and the province shards are refreshed after maintenance, as the dashboard
+# only serves them while they match the warehouse file
+warehouse_maintenance_job = define_asset_job(
+    name="warehouse_maintenance_job",
+    selection=MAINTENANCE_ASSETS
+    | AssetSelection.keys("dashboard_chart_data", "curated_province_shards"),
+    description="Checkpoints, compacts and measures the warehouse.",
+)
+
+
+def count_active_runs(instance, job):
+    """
+    Counts the runs of a job that are queued or in progress.
+
+    Args:
+        instance (DagsterInstance): The Dagster instance.
+        job (UnresolvedAssetJobDefinition): The job.
+
+    Returns:
+        int: The number of active runs.
+    """
+    return instance.get_runs_count(
+        filters=RunsFilter(job_name=job.name, statuses=ACTIVE_RUN_STATUSES)
+    )
@@ -0,0 +1,352 @@
+"""
+Warehouse maintenance: storage statistics and compaction of the DuckDB files.
+
+ON CONFLICT upserts leave updated segments behind, and tables that are dropped and
+recreated every run (dbt tables, CURATED_CITY_CLUSTER_RESULTS) leave free blocks that
+DuckDB reuses but never returns to the filesystem. Compaction rebuilds a layer's file into
+a fresh file, writing each table in its sort order, and swaps it into place. The rebuild
+copies the CREATE statements from the catalog, so primary keys the upserts rely on,
+indexes and the dbt views are kept. Each layer is its own file and is compacted on its own.
+
+Per-table storage statistics of every layer are taken before and after and appended to
+WAREHOUSE_STORAGE_HISTORY in the gold file, so file growth and compression can be tracked
+over time.
+"""
+
+import os
+
+from .constants import WAREHOUSE_SORT_KEYS
+
+# Bytes per value of fixed-width types, for the uncompressed size estimate. Other types
+# are measured as the length of their text form.
+FIXED_TYPE_BYTES = {
+    "BOOLEAN": 1,
+    "TINYINT": 1,
+    "SMALLINT": 2,
+    "INTEGER": 4,
+    "FLOAT": 4,
+    "DATE": 4,
+    "BIGINT": 8,
+    "UBIGINT": 8,
+    "DOUBLE": 8,
+    "TIMESTAMP": 8,
+    "TIMESTAMP WITH TIME ZONE": 8,
+    "HUGEINT": 16,
+}
+
+# Rows per full DuckDB row group
+ROW_GROUP_SIZE = 122880
+
+
+def quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def column_bytes_sql(column_name, data_type):
+    """
+    Builds an expression estimating the uncompressed bytes of a column.
+
+    Args:
+        column_name (str): The column.
+        data_type (str): Its DuckDB type, as listed by duckdb_columns().
+
+    Returns:
+        str: A SQL aggregate expression.
+    """
+    column = quote(column_name)
+    if data_type in FIXED_TYPE_BYTES:
+        return f"COUNT(*) * {FIXED_TYPE_BYTES[data_type]}"
+    if data_type.startswith("DECIMAL"):
+        width = int(data_type[len("DECIMAL(") :].split(",")[0])
+        return f"COUNT(*) * {8 if width <= 18 else 16}"
+    if data_type == "VARCHAR":
+        return f"COALESCE(SUM(strlen({column})), 0)"
+    return f"COALESCE(SUM(strlen(CAST({column} AS VARCHAR))), 0)"
+
+
+def database_size(con, path):
+    """
+    Reads the block usage of a warehouse file.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): A connection to the file.
+        path (Path): The file.
+
+    Returns:
+        dict: block_size, total_blocks, used_blocks, free_blocks and file_bytes.
+    """
+    (block_size, total_blocks, used_blocks, free_blocks) = con.execute(
+        """
+        SELECT block_size, total_blocks, used_blocks, free_blocks
+        FROM pragma_database_size()
+        WHERE database_name = current_database()
+        """
+    ).fetchone()
+    return {
+        "block_size": block_size,
+        "total_blocks": total_blocks,
+        "used_blocks": used_blocks,
+        "free_blocks": free_blocks,
+        "file_bytes": os.path.getsize(path),
+    }
+
+
+def table_storage_stats(con, block_size):
+    """
+    Measures the stored size of every table in the warehouse.
+    Stored bytes are estimated from segment offsets: a segment runs up to the next segment
+    in its block, or to the end of the block. Uncompressed bytes are estimated from type
+    widths and string lengths.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The DuckDB connection.
+        block_size (int): The warehouse block size.
+
+    Returns:
+        dict: Per-table statistics, keyed by table name.
+    """
+    tables = [
+        name
+        for (name,) in con.execute(
+            """
+            SELECT table_name FROM duckdb_tables()
+            WHERE database_name = current_database() AND schema_name = 'main'
+            ORDER BY table_name
+            """
+        ).fetchall()
+    ]
+    if not tables:
+        return {}
+
+    segments = " UNION ALL ".join(
+        f"SELECT '{name}' AS table_name, * FROM pragma_storage_info('{name}')"
+        for name in tables
+    )
+    storage = con.execute(
+        f"""
+        WITH segments AS ({segments}),
+        sized AS (
+            SELECT
+                table_name,
+                row_group_id,
+                has_updates,
+                block_id,
+                COALESCE(
+                    LEAD(block_offset) OVER (PARTITION BY block_id ORDER BY block_offset),
+                    {block_size}
+                ) - block_offset AS segment_bytes
+            FROM segments
+            WHERE persistent AND block_id >= 0
+        )
+        SELECT
+            table_name,
+            COUNT(DISTINCT row_group_id),
+            SUM(segment_bytes),
+            COUNT(*) FILTER (WHERE has_updates)
+        FROM sized
+        GROUP BY table_name
+        """
+    ).fetchall()
+    storage = {name: values for name, *values in storage}
+
+    stats = {}
+    for name in tables:
+        columns = con.execute(
+            """
+            SELECT column_name, data_type FROM duckdb_columns()
+            WHERE database_name = current_database() AND table_name = ?
+            ORDER BY column_index
+            """,
+            [name],
+        ).fetchall()
+        row_count, uncompressed_bytes = con.execute(
+            f"""
+            SELECT COUNT(*), {" + ".join(column_bytes_sql(*column) for column in columns)}
+            FROM {quote(name)}
+            """
+        ).fetchone()
+        row_groups, storage_bytes, updated_segments = storage.get(name, (0, 0, 0))
+        stats[name] = {
+            "row_count": row_count,
+            "row_groups": row_groups,
+            # How full the row groups are, 1.0 when every row group but the last is full
+            "row_group_fill": (
+                round(row_count / (row_groups * ROW_GROUP_SIZE), 3)
+                if row_groups
+                else None
+            ),
+            "updated_segments": updated_segments,
+            "storage_bytes": storage_bytes,
+            "uncompressed_bytes": uncompressed_bytes,
+            "compression_ratio": (
+                round(uncompressed_bytes / storage_bytes, 2) if storage_bytes else None
+            ),
+        }
+    return stats
+
+
+def compact_warehouse(con, path):
+    """
+    Rebuilds a warehouse file into a fresh file with every table written in its sort order,
+    then swaps it into place. The connection is closed, reconnect afterwards.
+    Readers that still have the old file open keep reading it until they reconnect.
+    Views reading other layers need those layers attached, so they can be recreated.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): A read-write connection, the only one to the file.
+        path (Path): The file.
+
+    Returns:
+        list: The tables that were sorted.
+    """
+    compact_path = path.with_name(f"{path.name}.compact")
+    for stale_path in (
+        compact_path,
+        compact_path.with_name(f"{compact_path.name}.wal"),
+    ):
+        if stale_path.exists():
+            stale_path.unlink()
+
+    source = con.execute("SELECT current_database()").fetchone()[0]
+    tables = con.execute(
+        """
+        SELECT table_name, sql FROM duckdb_tables()
+        WHERE database_name = current_database() AND schema_name = 'main'
+        ORDER BY table_oid
+        """
+    ).fetchall()
+    views = con.execute(
+        """
+        SELECT view_name, sql FROM duckdb_views()
+        WHERE database_name = current_database() AND schema_name = 'main' AND NOT internal
+        ORDER BY view_oid
+        """
+    ).fetchall()
+    indexes = con.execute(
+        """
+        SELECT sql FROM duckdb_indexes()
+        WHERE database_name = current_database() AND sql IS NOT NULL
+        """
+    ).fetchall()
+
+    con.execute(f"ATTACH '{compact_path.as_posix()}' AS compacted")
+    con.execute("USE compacted")
+    sorted_tables = []
+    for name, create_sql in tables:
+        con.execute(create_sql)
+        sort_key = WAREHOUSE_SORT_KEYS.get(name)
+        order_by = f"ORDER BY {sort_key}" if sort_key else ""
+        con.execute(
+            f"INSERT INTO compacted.main.{quote(name)} "
+            f"SELECT * FROM {quote(source)}.main.{quote(name)} {order_by}"
+        )
+        if sort_key:
+            sorted_tables.append(name)
+        (source_rows,) = con.execute(
+            f"SELECT COUNT(*) FROM {quote(source)}.main.{quote(name)}"
+        ).fetchone()
+        (compacted_rows,) = con.execute(
+            f"SELECT COUNT(*) FROM compacted.main.{quote(name)}"
+        ).fetchone()
+        if source_rows != compacted_rows:
+            raise RuntimeError(
+                f"Compaction copied {compacted_rows} of {source_rows} rows of {name}"
+            )
+
+    # Views are bound when created, so one depending on a later view is retried after it
+    pending = views
+    while pending:
+        failed = []
+        for name, create_sql in pending:
+            try:
+                con.execute(create_sql)
+            except Exception:
+                failed.append((name, create_sql))
+        if len(failed) == len(pending):
+            raise RuntimeError(
+                f"Could not recreate views {', '.join(name for name, _ in failed)}"
+            )
+        pending = failed
+    for (create_sql,) in indexes:
+        con.execute(create_sql)
+
+    con.execute(f"USE {quote(source)}")
+    con.execute("DETACH compacted")
+    con.close()
+    os.replace(compact_path, path)
+    return sorted_tables
+
+
+def record_storage_history(con, run_id, measured_at, phase, stats):
+    """
+    Appends per-table storage statistics to WAREHOUSE_STORAGE_HISTORY.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The DuckDB connection.
+        run_id (str): The Dagster run id.
+        measured_at (datetime): When the statistics were taken.
+        phase (str): "before" or "after" maintenance.
+        stats (dict): Statistics from table_storage_stats.
+    """
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS WAREHOUSE_STORAGE_HISTORY (
+            RUN_ID VARCHAR,
+            MEASURED_AT TIMESTAMP,
+            PHASE VARCHAR,
+            TABLE_NAME VARCHAR,
+            ROW_COUNT BIGINT,
+            ROW_GROUPS BIGINT,
+            ROW_GROUP_FILL DOUBLE,
+            UPDATED_SEGMENTS BIGINT,
+            STORAGE_BYTES BIGINT,
+            UNCOMPRESSED_BYTES BIGINT,
+            COMPRESSION_RATIO DOUBLE
+        );
+        """
+    )
+    con.executemany(
+        "INSERT INTO WAREHOUSE_STORAGE_HISTORY VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                run_id,
+                measured_at,
+                phase,
+                name,
+                table["row_count"],
+                table["row_groups"],
+                table["row_group_fill"],
+                table["updated_segments"],
+                table["storage_bytes"],
+                table["uncompressed_bytes"],
+                table["compression_ratio"],
+            )
+            for name, table in stats.items()
+        ],
+    )
+
+
+def storage_markdown(before, after):
+    """
+    Renders per-table storage before and after maintenance as a markdown table.
+
+    Args:
+        before (dict): Statistics from table_storage_stats before maintenance.
+        after (dict): Statistics from table_storage_stats after maintenance.
+
+    Returns:
+        str: The markdown table.
+    """
+    lines = [
+        "| Table | Rows | Row groups | Stored KB before | Stored KB after | Compression |",
+        "| --- | ---: | ---: | ---: | ---: | ---: |",
+    ]
+    for name, table in after.items():
+        previous = before.get(name, {})
+        lines.append(
+            f"| {name} | {table['row_count']} | {table['row_groups']} | "
+            f"{previous.get('storage_bytes', 0) / 1024:.0f} | "
+            f"{table['storage_bytes'] / 1024:.0f} | "
+            f"{'-' if table['compression_ratio'] is None else table['compression_ratio']}x |"
+        )
+    return "\n".join(lines)
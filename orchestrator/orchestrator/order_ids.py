@@ -0,0 +1,391 @@
+"""
+Persistent Bloom filters over the ORDER_IDs loaded into each bronze order table.
+
+Before a load, the incoming ORDER_IDs are checked against the filter of their own table and
+the filter of the other order table. A key the filters have not seen is definitely new and
+is appended without the ON CONFLICT upsert. Only the possible duplicates are looked up in
+the warehouse. Confirmed duplicates loaded from another window, or from the other dataset,
+are appended to ORDER_ID_DUPLICATES. A load without duplicates does not read the order
+tables at all.
+
+A filter is a list of layers stored in ORDER_ID_FILTERS. When a layer is full, a layer with
+twice the capacity and half the false positive rate is added, so the false positive rate
+stays below twice ORDER_ID_FILTER_ERROR_RATE as history grows. The filters keep the keys of
+archived partitions, which are deleted from the bronze tables. Only the bronze assets update
+the filters, so after loading the tables another way, drop ORDER_ID_FILTERS to rebuild them
+from the tables.
+"""
+
+import math
+from dataclasses import dataclass, field
+
+from .archive import archive_query
+from .constants import ORDER_ID_FILTER_CAPACITY, ORDER_ID_FILTER_ERROR_RATE
+
+ORDER_TABLES = ["RAW_DATASET_1", "RAW_DATASET_2"]
+
+# Keys hashed at a time, bounding the (keys, hash_count) position arrays
+HASH_CHUNK_SIZE = 1_000_000
+
+
+def relation_exists(con, name):
+    (count,) = con.execute(
+        """
+        SELECT COUNT(*) FROM (
+            SELECT table_name AS name FROM duckdb_tables()
+            WHERE database_name = current_database()
+            UNION ALL
+            SELECT view_name AS name FROM duckdb_views()
+            WHERE database_name = current_database()
+        )
+        WHERE lower(name) = lower(?)
+        """,
+        [name],
+    ).fetchone()
+    return count > 0
+
+
+def hash_order_ids(order_ids):
+    """
+    Hashes ORDER_IDs to 64 bits, the same way on every run.
+
+    Args:
+        order_ids (Iterable): The ORDER_IDs.
+
+    Returns:
+        np.ndarray: uint64 hashes.
+    """
+    import numpy as np
+    import pandas as pd
+
+    return pd.util.hash_array(np.asarray(order_ids, dtype=object).astype(str))
+
+
+@dataclass
+class FilterLayer:
+    """
+    One fixed-size Bloom filter.
+
+    Args:
+        capacity (int): Keys the layer holds at its false positive rate.
+        hash_count (int): Bit positions per key.
+        items (int): Keys added.
+        bits (np.ndarray): One bool per bit.
+    """
+
+    capacity: int
+    hash_count: int
+    items: int
+    bits: object
+
+    @classmethod
+    def empty(cls, capacity, error_rate):
+        import numpy as np
+
+        # Optimal size for the capacity and error rate, rounded up to whole bytes
+        size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2 / 8) * 8
+        hash_count = max(1, round(size / capacity * math.log(2)))
+        return cls(capacity, hash_count, 0, np.zeros(size, dtype=bool))
+
+    def positions(self, hashes):
+        import numpy as np
+
+        # Double hashing: position i is h1 + i * h2, h2 odd so the positions differ
+        first = hashes & np.uint64(0xFFFFFFFF)
+        second = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.hash_count, dtype=np.uint64)
+        return (first[:, None] + steps[None, :] * second[:, None]) % np.uint64(
+            len(self.bits)
+        )
+
+    def contains(self, hashes):
+        return self.bits[self.positions(hashes)].all(axis=1)
+
+    def add(self, hashes):
+        self.bits[self.positions(hashes)] = True
+        self.items += len(hashes)
+
+
+@dataclass
+class OrderIdFilter:
+    """
+    The scalable Bloom filter of one order table.
+
+    Args:
+        table_name (str): The order table.
+        layers (list): FilterLayer, oldest first.
+        changed (bool): Whether the filter differs from the stored one.
+    """
+
+    table_name: str
+    layers: list = field(default_factory=list)
+    changed: bool = False
+
+    def contains(self, hashes):
+        import numpy as np
+
+        found = np.zeros(len(hashes), dtype=bool)
+        for start in range(0, len(hashes), HASH_CHUNK_SIZE):
+            chunk = hashes[start : start + HASH_CHUNK_SIZE]
+            for layer in self.layers:
+                found[start : start + len(chunk)] |= layer.contains(chunk)
+        return found
+
+    def add(self, hashes):
+        start = 0
+        while start < len(hashes):
+            if not self.layers or self.layers[-1].items >= self.layers[-1].capacity:
+                depth = len(self.layers)
+                self.layers.append(
+                    FilterLayer.empty(
+                        ORDER_ID_FILTER_CAPACITY * 2**depth,
+                        ORDER_ID_FILTER_ERROR_RATE / 2**depth,
+                    )
+                )
+            layer = self.layers[-1]
+            count = min(layer.capacity - layer.items, HASH_CHUNK_SIZE)
+            layer.add(hashes[start : start + count])
+            start += count
+        self.changed = self.changed or len(hashes) > 0
+
+
+def load_order_id_filter(con, table_name):
+    """
+    Reads the filter of an order table. A table without a stored filter is seeded with the
+    ORDER_IDs of the table and of the archive. Archived orders of the other table only add
+    false positives, which the warehouse lookup weeds out.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The DuckDB connection.
+        table_name (str): The order table.
+
+    Returns:
+        OrderIdFilter: The filter.
+    """
+    import numpy as np
+
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ORDER_ID_FILTERS (
+            TABLE_NAME VARCHAR,
+            LAYER INTEGER,
+            CAPACITY BIGINT,
+            HASH_COUNT INTEGER,
+            ITEMS BIGINT,
+            BIT_COUNT BIGINT,
+            BITS BLOB
+        );
+        """
+    )
+    rows = con.execute(
+        """
+        SELECT CAPACITY, HASH_COUNT, ITEMS, BIT_COUNT, BITS
+        FROM ORDER_ID_FILTERS WHERE TABLE_NAME = ? ORDER BY LAYER
+        """,
+        [table_name],
+    ).fetchall()
+    order_id_filter = OrderIdFilter(
+        table_name,
+        [
+            FilterLayer(
+                capacity,
+                hash_count,
+                items,
+                np.unpackbits(np.frombuffer(bits, dtype=np.uint8))[:bit_count].astype(
+                    bool
+                ),
+            )
+            for capacity, hash_count, items, bit_count, bits in rows
+        ],
+    )
+    if rows:
+        return order_id_filter
+
+    # The archive view is in the gold file, so the Parquet files are read directly
+    sources = [f"({archive_query()})"]
+    if relation_exists(con, table_name):
+        sources.append(table_name)
+    order_ids = con.execute(
+        " UNION ".join(f"SELECT ORDER_ID FROM {source}" for source in sources)
+    ).fetchnumpy()["ORDER_ID"]
+    order_id_filter.add(hash_order_ids(order_ids))
+    # A seeded filter is stored with the load that seeded it
+    order_id_filter.changed = True
+    return order_id_filter
+
+
+def save_order_id_filter(con, order_id_filter):
+    """
+    Stores a filter that changed since it was loaded.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The DuckDB connection.
+        order_id_filter (OrderIdFilter): The filter.
+    """
+    import numpy as np
+
+    # An empty filter is seeded again from the empty table, so it is not stored
+    if not order_id_filter.changed or not order_id_filter.layers:
+        return
+    con.execute(
+        "DELETE FROM ORDER_ID_FILTERS WHERE TABLE_NAME = ?",
+        [order_id_filter.table_name],
+    )
+    con.executemany(
+        "INSERT INTO ORDER_ID_FILTERS VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                order_id_filter.table_name,
+                depth,
+                layer.capacity,
+                layer.hash_count,
+                layer.items,
+                len(layer.bits),
+                np.packbits(layer.bits).tobytes(),
+            )
+            for depth, layer in enumerate(order_id_filter.layers)
+        ],
+    )
+    order_id_filter.changed = False
+
+
+@dataclass
+class OrderIdCheck:
+    """
+    The outcome of check_order_ids.
+
+    Args:
+        new_rows (pd.Series): True for the rows whose ORDER_ID was never loaded.
+        possible_duplicates (int): Rows the filters could not rule out.
+        duplicates (pd.DataFrame): Confirmed duplicates from another window or table.
+        hashes (np.ndarray): Hashes of the new ORDER_IDs, for record_order_ids.
+        filters (list): The filters checked against.
+    """
+
+    new_rows: object
+    possible_duplicates: int
+    duplicates: object
+    hashes: object
+    filters: list
+
+
+def check_order_ids(con, table_name, df):
+    """
+    Classifies the incoming rows of an order table as definitely new or possibly
+    duplicate, and confirms the possible duplicates against both order tables.
+    Needs to run before the load, which overwrites the partition of reloaded orders.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The DuckDB connection.
+        table_name (str): The order table being loaded.
+        df (pd.DataFrame): The incoming rows, with ORDER_ID, PARTITION_DATE and
+            PARTITION_WINDOW.
+
+    Returns:
+        OrderIdCheck: The classification.
+    """
+    import pandas as pd
+
+    hashes = hash_order_ids(df["ORDER_ID"])
+    # The table's own filter first
+    filters = [load_order_id_filter(con, table_name)] + [
+        load_order_id_filter(con, other)
+        for other in ORDER_TABLES
+        if other != table_name
+    ]
+    seen = [order_id_filter.contains(hashes) for order_id_filter in filters]
+
+    lookups = []
+    for order_id_filter, found in zip(filters, seen):
+        if found.any() and relation_exists(con, order_id_filter.table_name):
+            con.register(
+                "df_order_id_candidates",
+                df.loc[found, ["ORDER_ID", "PARTITION_DATE", "PARTITION_WINDOW"]],
+            )
+            lookups.append(
+                con.execute(
+                    f"""
+                    SELECT
+                        c.ORDER_ID,
+                        CAST(c.PARTITION_DATE AS DATE) AS PARTITION_DATE,
+                        c.PARTITION_WINDOW,
+                        '{order_id_filter.table_name}' AS DUPLICATE_OF_TABLE,
+                        t.PARTITION_DATE AS DUPLICATE_OF_PARTITION_DATE,
+                        t.PARTITION_WINDOW AS DUPLICATE_OF_PARTITION_WINDOW
+                    FROM df_order_id_candidates c
+                    JOIN {order_id_filter.table_name} t ON t.ORDER_ID = c.ORDER_ID
+                    """
+                ).fetchdf()
+            )
+            con.unregister("df_order_id_candidates")
+
+    duplicates = pd.concat(lookups, ignore_index=True) if lookups else pd.DataFrame()
+    if not duplicates.empty:
+        # Reloading a window is not a duplicate, the upsert replaces the rows
+        reloaded = (
+            (duplicates["DUPLICATE_OF_TABLE"] == table_name)
+            & (
+                duplicates["PARTITION_DATE"]
+                == duplicates["DUPLICATE_OF_PARTITION_DATE"]
+            )
+            & (
+                duplicates["PARTITION_WINDOW"]
+                == duplicates["DUPLICATE_OF_PARTITION_WINDOW"]
+            )
+        )
+        duplicates = duplicates[~reloaded]
+
+    new_rows = pd.Series(~seen[0], index=df.index)
+    return OrderIdCheck(
+        new_rows=new_rows,
+        possible_duplicates=int(seen[0].sum()),
+        duplicates=duplicates,
+        hashes=hashes[~seen[0]],
+        filters=filters,
+    )
+
+
+def record_order_ids(con, run_id, table_name, check):
+    """
+    Adds the new ORDER_IDs to the table's filter, stores the changed filters and appends
+    the confirmed duplicates to ORDER_ID_DUPLICATES. Runs after the load, in its transaction.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The DuckDB connection.
+        run_id (str): The Dagster run id.
+        table_name (str): The order table loaded.
+        check (OrderIdCheck): The result of check_order_ids.
+    """
+    check.filters[0].add(check.hashes)
+    for order_id_filter in check.filters:
+        save_order_id_filter(con, order_id_filter)
+
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ORDER_ID_DUPLICATES (
+            RUN_ID VARCHAR,
+            DETECTED_AT TIMESTAMP,
+            TABLE_NAME VARCHAR,
+            ORDER_ID VARCHAR,
+            PARTITION_DATE DATE,
+            PARTITION_WINDOW VARCHAR,
+            DUPLICATE_OF_TABLE VARCHAR,
+            DUPLICATE_OF_PARTITION_DATE DATE,
+            DUPLICATE_OF_PARTITION_WINDOW VARCHAR
+        );
+        """
+    )
+    if check.duplicates.empty:
+        return
+    con.register("df_order_id_duplicates", check.duplicates)
+    con.execute(
+        """
+        INSERT INTO ORDER_ID_DUPLICATES
+        SELECT
+            ?, current_localtimestamp(), ?, ORDER_ID, PARTITION_DATE, PARTITION_WINDOW,
+            DUPLICATE_OF_TABLE, DUPLICATE_OF_PARTITION_DATE, DUPLICATE_OF_PARTITION_WINDOW
+        FROM df_order_id_duplicates
+        """,
+        [run_id, table_name],
+    )
+    con.unregister("df_order_id_duplicates")
@@ -0,0 +1,317 @@
+"""
+Per-asset performance metadata.
+
+Assets wrap their body in track_performance, which measures wall time, CPU time and peak
+memory and emits them with the asset's row and byte counts as Dagster output metadata.
+Every materialization then carries the same numeric keys, so the asset's Plots tab in the
+UI charts them across runs and regressions stand out.
+
+Peak traced Python memory is only measured when ASSET_TRACE_MEMORY=1, as tracemalloc slows
+pandas parsing down several times.
+
+dbt models get the same treatment from dbt's run_results.json and the DuckDB query profile
+each table model writes, and every run is appended to DBT_MODEL_RUN_HISTORY so model timings
+can be compared as volume grows.
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from dagster import MetadataValue
+
+from .constants import ASSET_TRACE_MEMORY
+
+
+@dataclass
+class AssetPerformance:
+    """
+    Counters an asset fills in while it runs.
+
+    Args:
+        input_bytes (int): Size of the source files read.
+        rows_in (int): Rows read from the source.
+        rows_upserted (int): Rows inserted or updated in DuckDB.
+        rows_rejected (int): Rows read but not written, e.g. superseded duplicates.
+    """
+
+    input_bytes: int = 0
+    rows_in: int = 0
+    rows_upserted: int = 0
+    rows_rejected: int = 0
+
+    def add_input_file(self, file_path):
+        """
+        Counts the size of a source file towards input_bytes.
+
+        Args:
+            file_path (Path): The path to the source file.
+        """
+        self.input_bytes += Path(file_path).stat().st_size
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of the process so far, or None if unsupported.
+    This is a high-water mark for the whole process, including memory held by DuckDB.
+
+    Returns:
+        float: Peak RSS in MB.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is reported in KB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+
+
+@contextmanager
+def track_performance(context):
+    """
+    Measures the enclosed asset body and logs the results as output metadata.
+    Metadata is only logged when the body succeeds.
+
+    Args:
+        context (AssetExecutionContext): The execution context.
+
+    Yields:
+        AssetPerformance: Counters for the asset to fill in.
+    """
+    performance = AssetPerformance()
+    tracing = ASSET_TRACE_MEMORY and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield performance
+        wall_time = time.perf_counter() - wall_start
+        cpu_time = time.process_time() - cpu_start
+        traced_peak = tracemalloc.get_traced_memory()[1] if tracing else None
+    finally:
+        if tracing:
+            tracemalloc.stop()
+
+    metadata = {
+        "wall_time_s": round(wall_time, 3),
+        "cpu_time_s": round(cpu_time, 3),
+        "input_bytes": performance.input_bytes,
+        "rows_in": performance.rows_in,
+        "rows_upserted": performance.rows_upserted,
+        "rows_rejected": performance.rows_rejected,
+        "rows_per_s": round(performance.rows_in / wall_time, 1) if wall_time else 0.0,
+    }
+    rss = peak_rss_mb()
+    if rss is not None:
+        metadata["peak_rss_mb"] = rss
+    if traced_peak is not None:
+        metadata["peak_traced_mb"] = round(traced_peak / 1024**2, 2)
+    context.add_output_metadata(metadata)
+
+
+def read_query_profile(profile_path):
+    """
+    Summarises a DuckDB JSON query profile.
+
+    Args:
+        profile_path (Path): The profile written by the start_query_profile dbt macro.
+
+    Returns:
+        dict: Query time, rows written and the slowest operators, or None if no profile exists.
+    """
+    if not profile_path.exists():
+        return None
+    profile = json.loads(profile_path.read_text())
+
+    operators = []
+    pending = list(profile["children"])
+    while pending:
+        operator = pending.pop()
+        operators.append(operator)
+        pending.extend(operator["children"])
+
+    # Write operators report a single row, the rows written are the cardinality of their input
+    writes = [
+        op for op in operators if op["name"].strip() in ("CREATE_TABLE_AS", "INSERT")
+    ]
+    rows_affected = (
+        sum(child["cardinality"] for child in writes[0]["children"]) if writes else None
+    )
+    slowest = sorted(operators, key=lambda op: op["timing"], reverse=True)[:3]
+    return {
+        "query_time_s": round(profile["timing"], 3),
+        "rows_affected": rows_affected,
+        "slowest_operators": ", ".join(
+            f"{op['name'].strip()} {op['timing']:.3f}s" for op in slowest
+        ),
+    }
+
+
+def step_seconds(step):
+    """
+    Returns the duration of a dbt timing step.
+
+    Args:
+        step (dict): A run_results.json timing entry with started_at and completed_at.
+
+    Returns:
+        float: The step duration in seconds.
+    """
+    started_at = datetime.fromisoformat(step["started_at"])
+    completed_at = datetime.fromisoformat(step["completed_at"])
+    return round((completed_at - started_at).total_seconds(), 3)
+
+
+def dbt_model_performance(run_results, profile_dir):
+    """
+    Collects per-model timings from dbt's run_results.json and the model query profiles.
+
+    Args:
+        run_results (dict): The parsed run_results.json of the dbt invocation.
+        profile_dir (Path): The directory the query profiles were written to.
+
+    Returns:
+        dict: Performance record per model, keyed by dbt unique_id.
+    """
+    records = {}
+    for result in run_results["results"]:
+        if not result["unique_id"].startswith("model."):
+            continue
+        timing = {step["name"]: step for step in result["timing"]}
+        steps = [timing[name] for name in ("compile", "execute") if name in timing]
+        record = {
+            "model": result["unique_id"].split(".")[-1],
+            "relation_name": result["relation_name"],
+            "status": result["status"],
+            "started_at": (
+                datetime.fromisoformat(steps[0]["started_at"]) if steps else None
+            ),
+            "completed_at": (
+                datetime.fromisoformat(steps[-1]["completed_at"]) if steps else None
+            ),
+            "execution_time_s": round(result["execution_time"], 3),
+            "query_time_s": None,
+            "rows_affected": None,
+            "slowest_operators": None,
+            "row_count": None,
+        }
+        for name in ("compile", "execute"):
+            record[f"{name}_time_s"] = (
+                step_seconds(timing[name]) if name in timing else None
+            )
+        profile = read_query_profile(profile_dir.joinpath(f"{record['model']}.json"))
+        if profile:
+            record.update(profile)
+        records[result["unique_id"]] = record
+    return records
+
+
+def record_dbt_run_history(con, run_id, invocation_id, records):
+    """
+    Counts the rows of each table model and appends the run to DBT_MODEL_RUN_HISTORY.
+    Views are not counted as that would execute them. Models are looked up by the
+    database, schema and name of their relation, in every database attached to the
+    connection.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The DuckDB connection.
+        run_id (str): The Dagster run id.
+        invocation_id (str): The dbt invocation id.
+        records (dict): Performance records from dbt_model_performance, updated in place.
+    """
+    tables = set(
+        con.execute(
+            "SELECT lower(database_name), lower(schema_name), lower(table_name) FROM duckdb_tables()"
+        ).fetchall()
+    )
+    for record in records.values():
+        if record["status"] != "success" or not record["relation_name"]:
+            continue
+        # dbt quotes each part, e.g. "silver"."main"."processed_dataset"
+        relation = tuple(
+            part.strip('"').lower() for part in record["relation_name"].split(".")
+        )
+        if relation in tables:
+            (record["row_count"],) = con.execute(
+                f"SELECT COUNT(*) FROM {record['relation_name']}"
+            ).fetchone()
+
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS DBT_MODEL_RUN_HISTORY (
+            RUN_ID VARCHAR,
+            INVOCATION_ID VARCHAR,
+            MODEL VARCHAR,
+            STATUS VARCHAR,
+            STARTED_AT TIMESTAMPTZ,
+            COMPLETED_AT TIMESTAMPTZ,
+            EXECUTION_TIME_S DOUBLE,
+            COMPILE_TIME_S DOUBLE,
+            EXECUTE_TIME_S DOUBLE,
+            QUERY_TIME_S DOUBLE,
+            ROWS_AFFECTED BIGINT,
+            ROW_COUNT BIGINT,
+            SLOWEST_OPERATORS VARCHAR
+        );
+        """
+    )
+    con.executemany(
+        "INSERT INTO DBT_MODEL_RUN_HISTORY VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                run_id,
+                invocation_id,
+                record["model"],
+                record["status"],
+                record["started_at"],
+                record["completed_at"],
+                record["execution_time_s"],
+                record["compile_time_s"],
+                record["execute_time_s"],
+                record["query_time_s"],
+                record["rows_affected"],
+                record["row_count"],
+                record["slowest_operators"],
+            )
+            for record in records.values()
+        ],
+    )
+
+
+def dbt_model_metadata(record, profile_dir):
+    """
+    Turns a model performance record into Dagster output metadata.
+
+    Args:
+        record (dict): Performance record from dbt_model_performance.
+        profile_dir (Path): The directory the query profiles were written to.
+
+    Returns:
+        dict: Output metadata, without keys that have no value for the model.
+    """
+    metadata = {
+        key: record[key]
+        for key in (
+            "execution_time_s",
+            "compile_time_s",
+            "execute_time_s",
+            "query_time_s",
+            "rows_affected",
+            "row_count",
+            "slowest_operators",
+        )
+        if record[key] is not None
+    }
+    profile_path = profile_dir.joinpath(f"{record['model']}.json")
+    if profile_path.exists():
+        metadata["query_profile"] = MetadataValue.path(os.fspath(profile_path))
+    return metadata
@@ -1,16 +1,40 @@
 """
-To add a daily schedule that materializes your dbt assets, uncomment the following lines.
+Scheduled warehouse maintenance. A tick is skipped while an input load is running, as
+DuckDB only allows one writer at a time.
 """
 
-from dagster_dbt import build_schedule_from_dbt_selection
+from dagster import (
+    DefaultScheduleStatus,
+    RunRequest,
+    ScheduleEvaluationContext,
+    SkipReason,
+    schedule,
+)
 
-from .assets import dbt_assets
+from .constants import MAINTENANCE_CRON_SCHEDULE
+from .jobs import count_active_runs, incremental_input_job, warehouse_maintenance_job
 
-schedules = [
-    #     build_schedule_from_dbt_selection(
-    #         [jaffle_shop_dbt_assets],
-    #         job_name="materialize_dbt_models",
-    #         cron_schedule="0 0 * * *",
-    #         dbt_select="fqn:*",
-    #     ),
-]
+
+@schedule(
+    job=warehouse_maintenance_job,
+    cron_schedule=MAINTENANCE_CRON_SCHEDULE,
+    default_status=DefaultScheduleStatus.RUNNING,
+    description="Checkpoints, compacts and measures the warehouse.",
+)
+def warehouse_maintenance_schedule(context: ScheduleEvaluationContext):
+    """
+    Requests a maintenance run unless an input load is in progress.
+
+    Args:
+        context (ScheduleEvaluationContext): The schedule evaluation context.
+    """
+    active_runs = count_active_runs(context.instance, incremental_input_job)
+    if active_runs:
+        return SkipReason(f"Waiting on {active_runs} active input loads.")
+    return RunRequest(
+        run_key=context.scheduled_execution_time.isoformat(),
+        tags={"maintenance": "scheduled"},
+    )
+
+
+schedules = [warehouse_maintenance_schedule]
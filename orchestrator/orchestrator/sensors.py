@@ -0,0 +1,247 @@
+"""
+File-arrival sensor that loads new input windows as soon as they land.
+
+Source files arrive in data/input/<YYYYMMDD>/<window>/. A window is picked up once both
+dataset1.xlsx and dataset2.json are present and have not been modified for
+INPUT_SETTLE_SECONDS, so half-copied files are never read. Windows that settle within the
+same tick are coalesced into a single run, and runs are capped at INPUT_MAX_CONCURRENT_RUNS
+because DuckDB only allows one writer at a time.
+
+A window only counts as loaded once its run succeeds. A failed or canceled run's windows,
+and those of a requested run that was never created within INPUT_RUN_LAUNCH_TIMEOUT_SECONDS,
+are requested again, up to INPUT_MAX_RUN_ATTEMPTS runs, after which they are left for a
+manual re-run: launch incremental_input_job with their partitions in the raw assets'
+config, or touch their files, which makes them a new delivery.
+"""
+
+import json
+import time
+
+from dagster import (
+    DagsterRunStatus,
+    DefaultSensorStatus,
+    RunRequest,
+    RunsFilter,
+    SensorEvaluationContext,
+    SkipReason,
+    sensor,
+)
+
+from .constants import (
+    INPUT_DIR,
+    INPUT_EXCEL_FILE_NAME,
+    INPUT_JSON_FILE_NAME,
+    INPUT_MAX_CONCURRENT_RUNS,
+    INPUT_MAX_PARTITIONS_PER_RUN,
+    INPUT_MAX_RUN_ATTEMPTS,
+    INPUT_RUN_LAUNCH_TIMEOUT_SECONDS,
+    INPUT_SENSOR_INTERVAL_SECONDS,
+    INPUT_SETTLE_SECONDS,
+)
+from .jobs import count_active_runs, incremental_input_job, warehouse_maintenance_job
+
+# Assets that read source files and accept InputPartitionsConfig
+RAW_INPUT_ASSETS = ["raw_dataset_1", "raw_dataset_2", "raw_mapping"]
+
+FAILED_RUN_STATUSES = [DagsterRunStatus.FAILURE, DagsterRunStatus.CANCELED]
+
+
+def find_complete_input_partitions(input_dir, settle_seconds, now):
+    """
+    Lists input windows whose source file pair is complete.
+
+    Args:
+        input_dir (Path): The data/input directory.
+        settle_seconds (int): How long both files must be untouched before loading.
+        now (float): The current epoch time.
+
+    Returns:
+        dict: Partition key ("<YYYYMMDD>/<window>") to the newest file mtime of the pair.
+    """
+    partitions = {}
+    if not input_dir.is_dir():
+        return partitions
+
+    for date_dir in sorted(input_dir.iterdir()):
+        if not (
+            date_dir.is_dir() and date_dir.name.isdigit() and len(date_dir.name) == 8
+        ):
+            continue
+        for window_dir in sorted(date_dir.iterdir()):
+            files = [
+                window_dir.joinpath(INPUT_EXCEL_FILE_NAME),
+                window_dir.joinpath(INPUT_JSON_FILE_NAME),
+            ]
+            if not all(f.is_file() and f.stat().st_size > 0 for f in files):
+                continue
+            latest_mtime = max(f.stat().st_mtime for f in files)
+            # Still being written, wait for the burst to settle
+            if now - latest_mtime < settle_seconds:
+                continue
+            partitions[f"{date_dir.name}/{window_dir.name}"] = latest_mtime
+    return partitions
+
+
+def get_run_status(instance, sensor_name, run_key):
+    """
+    Looks up the status of the run a sensor launched for a run key.
+
+    Returns:
+        DagsterRunStatus: The run's status, or None while the run has not been created.
+    """
+    runs = instance.get_runs(
+        filters=RunsFilter(
+            tags={"dagster/sensor_name": sensor_name, "dagster/run_key": run_key}
+        ),
+        limit=1,
+    )
+    return runs[0].status if runs else None
+
+
+def delivery_id(key, mtime):
+    # A re-delivered window has a new mtime, so its attempts are counted afresh
+    return f"{key}@{int(mtime)}"
+
+
+def settle_pending_runs(instance, sensor_name, cursor, now):
+    """
+    Moves the windows of finished runs out of the cursor's pending runs. Those of a
+    successful run become loaded, those of a failed or canceled run count an attempt and
+    are requested again. So do those of a run that was not created within
+    INPUT_RUN_LAUNCH_TIMEOUT_SECONDS of its request, as Dagster skips a request whose run
+    key was already used and a failed launch leaves no run behind.
+
+    Args:
+        instance (DagsterInstance): The Dagster instance.
+        sensor_name (str): The sensor that launched the runs.
+        cursor (dict): The sensor cursor, updated in place.
+        now (float): The current epoch time.
+    """
+    for run_key, pending in list(cursor["pending"].items()):
+        partitions = pending["partitions"]
+        status = get_run_status(instance, sensor_name, run_key)
+        if status == DagsterRunStatus.SUCCESS:
+            cursor["loaded"].update(partitions)
+            # Attempts of this and of earlier deliveries are no longer needed
+            cursor["attempts"] = {
+                delivery: count
+                for delivery, count in cursor["attempts"].items()
+                if delivery.split("@")[0] not in partitions
+            }
+        elif status in FAILED_RUN_STATUSES or (
+            status is None
+            and now - pending["requested_at"] >= INPUT_RUN_LAUNCH_TIMEOUT_SECONDS
+        ):
+            for key, mtime in partitions.items():
+                delivery = delivery_id(key, mtime)
+                cursor["attempts"][delivery] = cursor["attempts"].get(delivery, 0) + 1
+        else:
+            continue
+        del cursor["pending"][run_key]
+
+
+def build_input_run_config(partitions):
+    """
+    Builds run config that points every raw asset at the given input partitions.
+
+    Args:
+        partitions (list): Partition keys formatted as "<YYYYMMDD>/<window>".
+
+    Returns:
+        dict: The run config.
+    """
+    return {
+        "ops": {
+            asset_name: {"config": {"partitions": partitions}}
+            for asset_name in RAW_INPUT_ASSETS
+        }
+    }
+
+
+@sensor(
+    job=incremental_input_job,
+    minimum_interval_seconds=INPUT_SENSOR_INTERVAL_SECONDS,
+    default_status=DefaultSensorStatus.RUNNING,
+    description="Launches incremental runs for newly landed input windows.",
+)
+def input_arrival_sensor(context: SensorEvaluationContext):
+    """
+    Launches runs for input windows that are new or were re-delivered since the last tick.
+    The cursor holds the file mtime each partition key was successfully loaded at, the
+    windows and request time of runs that have not finished yet by run key, and the
+    failed runs of each window since it was last loaded.
+
+    Args:
+        context (SensorEvaluationContext): The sensor evaluation context.
+    """
+    cursor = json.loads(context.cursor) if context.cursor else {}
+    if "loaded" not in cursor:
+        # Cursors of earlier versions only held the loaded windows
+        cursor = {"loaded": cursor}
+    cursor.setdefault("pending", {})
+    cursor.setdefault("attempts", {})
+    now = time.time()
+    for run_key, pending in cursor["pending"].items():
+        if "requested_at" not in pending:
+            # Pending runs of earlier versions only held their windows
+            cursor["pending"][run_key] = {"partitions": pending, "requested_at": now}
+    settle_pending_runs(context.instance, context.sensor_name, cursor, now)
+    context.update_cursor(json.dumps(cursor))
+
+    pending = {
+        key for pending in cursor["pending"].values() for key in pending["partitions"]
+    }
+    arrived = find_complete_input_partitions(INPUT_DIR, INPUT_SETTLE_SECONDS, now)
+    new_partitions, given_up = [], []
+    for key, mtime in sorted(arrived.items()):
+        if cursor["loaded"].get(key, 0) >= mtime or key in pending:
+            continue
+        if cursor["attempts"].get(delivery_id(key, mtime), 0) >= INPUT_MAX_RUN_ATTEMPTS:
+            given_up.append(key)
+        else:
+            new_partitions.append(key)
+    if given_up:
+        context.log.warning(
+            f"Input windows {', '.join(given_up)} failed {INPUT_MAX_RUN_ATTEMPTS} runs "
+            "and need a manual re-run."
+        )
+    if not new_partitions:
+        return SkipReason("No new input windows.")
+
+    if count_active_runs(context.instance, warehouse_maintenance_job):
+        return SkipReason(
+            f"{len(new_partitions)} input windows waiting on warehouse maintenance."
+        )
+    active_runs = count_active_runs(context.instance, incremental_input_job)
+    open_slots = INPUT_MAX_CONCURRENT_RUNS - active_runs
+    if open_slots <= 0:
+        return SkipReason(
+            f"{len(new_partitions)} input windows waiting on {active_runs} active runs."
+        )
+
+    run_requests = []
+    for i in range(0, len(new_partitions), INPUT_MAX_PARTITIONS_PER_RUN):
+        if len(run_requests) == open_slots:
+            break
+        batch = new_partitions[i : i + INPUT_MAX_PARTITIONS_PER_RUN]
+        deliveries = [delivery_id(key, arrived[key]) for key in batch]
+        # Run keys are never launched twice, so a retry carries its attempt number
+        attempt = max(cursor["attempts"].get(delivery, 0) for delivery in deliveries)
+        run_key = "|".join(deliveries) + (f"#{attempt + 1}" if attempt else "")
+        run_requests.append(
+            RunRequest(
+                run_key=run_key,
+                run_config=build_input_run_config(batch),
+                tags={"input_partitions": ",".join(batch)},
+            )
+        )
+        cursor["pending"][run_key] = {
+            "partitions": {key: arrived[key] for key in batch},
+            "requested_at": now,
+        }
+
+    context.update_cursor(json.dumps(cursor))
+    return run_requests
+
+
+sensors = [input_arrival_sensor]
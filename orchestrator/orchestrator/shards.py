@@ -0,0 +1,93 @@
+"""
+Province shards of the gold order facts, for the dashboard's fan-out queries.
+
+The orders of curated_fact_orders, hot and archived, are written to ZSTD Parquet with the
+city, district and city tier attributes the dashboard aggregates and filters by, one shard
+per province under <version dir>/SHARD_ID=<n>/. An order's province is its city's PROVINCE
+in curated_dim_city, which comes from TRANSLATIONS_CITY_MAPPING. Orders of untranslated
+cities and of cities without a province share one shard. Within a shard the rows are in
+partition and order time order, so row group statistics let the dashboard's date and window
+filters skip most of a shard.
+
+A province's aggregates only read its own shard, and an aggregate over all provinces is a
+partial aggregate per shard, run in parallel, merged by the dashboard.
+"""
+
+# Denormalized so a shard answers the dashboard aggregates without the dimensions
+SHARD_QUERY = """
+    SELECT
+        f.ORDER_ID,
+        f.ORDER_TIME_PST,
+        f.CITY_KEY,
+        f.DISTRICT_KEY,
+        c.SHIP_TO_CITY_CD,
+        c.SHIP_TO_CITY_CD_ENG,
+        c.PROVINCE,
+        c.PER_CAPITA_USD,
+        COALESCE(c.IS_TRANSLATED, false) AS CITY_IS_TRANSLATED,
+        d.SHIP_TO_DISTRICT_NAME,
+        d.SHIP_TO_DISTRICT_NAME_ENG,
+        COALESCE(d.IS_TRANSLATED, false) AS DISTRICT_IS_TRANSLATED,
+        f.RMB_DOLLARS,
+        f.ORDER_QTY,
+        f.PARTITION_DATE,
+        f.PARTITION_WINDOW,
+        f.ORDER_TS,
+        f.ORDER_HOUR,
+        t.cluster AS CITY_TIER,
+        s.SHARD_ID
+    FROM curated_fact_orders f
+    LEFT JOIN curated_dim_city c ON f.CITY_KEY = c.CITY_KEY
+    LEFT JOIN curated_dim_district d ON f.DISTRICT_KEY = d.DISTRICT_KEY
+    LEFT JOIN CURATED_CITY_CLUSTER_RESULTS t ON c.SHIP_TO_CITY_CD = t.SHIP_TO_CITY_CD
+    JOIN province_shards s ON c.PROVINCE IS NOT DISTINCT FROM s.PROVINCE
+"""
+
+
+def write_province_shards(con, version_dir):
+    """
+    Writes the province shards of the gold facts.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): A connection to the gold warehouse.
+        version_dir (Path): The directory to write the shards to, created by the COPY.
+
+    Returns:
+        list: One dict per shard with its province, None for the shared shard, its
+            directory relative to version_dir and its row count, largest shard first.
+    """
+    # NULL sorts last, so the shared shard has the highest id
+    con.execute(
+        """
+        CREATE OR REPLACE TEMP TABLE province_shards AS
+        SELECT
+            PROVINCE,
+            CAST(DENSE_RANK() OVER (ORDER BY PROVINCE NULLS LAST) AS INTEGER) AS SHARD_ID
+        FROM (
+            SELECT DISTINCT PROVINCE FROM curated_dim_city
+            UNION
+            SELECT NULL
+        )
+        """
+    )
+    shards = con.execute(
+        f"""
+        SELECT SHARD_ID, PROVINCE, COUNT(*) AS ROW_COUNT
+        FROM ({SHARD_QUERY})
+        GROUP BY SHARD_ID, PROVINCE
+        ORDER BY ROW_COUNT DESC, SHARD_ID
+        """
+    ).fetchall()
+    con.execute(
+        f"""
+        COPY (
+            {SHARD_QUERY}
+            ORDER BY s.SHARD_ID, f.PARTITION_DATE, f.PARTITION_WINDOW, f.ORDER_TS
+        ) TO '{version_dir.as_posix()}'
+        (FORMAT PARQUET, PARTITION_BY (SHARD_ID), COMPRESSION ZSTD)
+        """
+    )
+    return [
+        {"province": province, "path": f"SHARD_ID={shard_id}", "rows": row_count}
+        for shard_id, province, row_count in shards
+    ]
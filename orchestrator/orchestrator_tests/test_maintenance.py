@@ -0,0 +1,28 @@
+import duckdb
+
+from orchestrator.maintenance import compact_warehouse
+
+
+def test_compact_warehouse_shrinks_file_and_keeps_rows(tmp_path):
+    path = tmp_path / "warehouse.duckdb"
+    con = duckdb.connect(str(path))
+    con.execute(
+        "CREATE TABLE orders AS SELECT range AS ORDER_ID, range * 2 AS RMB_DOLLARS "
+        "FROM range(1000)"
+    )
+    # A dropped table leaves free blocks that DuckDB never returns to the filesystem
+    con.execute("CREATE TABLE scratch AS SELECT random() AS VALUE FROM range(1000000)")
+    con.execute("DROP TABLE scratch")
+    con.execute("CHECKPOINT")
+    size_before = path.stat().st_size
+
+    compact_warehouse(con, path)
+
+    assert path.stat().st_size < size_before
+    assert [p.name for p in tmp_path.iterdir()] == ["warehouse.duckdb"]
+    con = duckdb.connect(str(path), read_only=True)
+    assert con.execute("SELECT COUNT(*), SUM(RMB_DOLLARS) FROM orders").fetchone() == (
+        1000,
+        999000,
+    )
+    con.close()
@@ -0,0 +1,129 @@
+"""
+Import-time benchmark for the Dagster code location and the Streamlit dashboard.
+
+Imports each entry point in a fresh interpreter with -X importtime and prints the best wall
+time of several runs, along with a digest of where the import time goes: the slowest
+packages by self time and the slowest first-party modules by cumulative time.
+
+Usage (from the repo root): python scripts/benchmark_import_time.py [--runs 5] [--top 10]
+Loading the orchestrator needs a dbt manifest, either target/manifest.json or a cached one
+parsed with DAGSTER_DBT_PARSE_PROJECT_ON_LOAD=1, which is passed through to the imports.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# (name, module to import, directory the module is imported from)
+TARGETS = [
+    ("orchestrator", "orchestrator.definitions", REPO_DIR.joinpath("orchestrator")),
+    ("dashboard", "sections", REPO_DIR.joinpath("visualization")),
+]
+
+# "import time: <self us> | <cumulative us> | <indent><module>", nested imports indent by 2
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+def profile_import(module, directory):
+    """
+    Imports a module in a fresh interpreter with -X importtime.
+
+    Args:
+        module (str): The module to import.
+        directory (Path): Working directory and PYTHONPATH of the interpreter.
+
+    Returns:
+        tuple: Wall seconds of the interpreter and (self us, cumulative us, depth, module)
+            rows in the order -X importtime reports them.
+    """
+    env = dict(os.environ, PYTHONPATH=os.fspath(directory))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=directory,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((int(self_us), int(cumulative_us), len(indent) // 2, name))
+    return elapsed, rows
+
+
+def summarize(rows, directory, top):
+    """
+    Digests -X importtime rows.
+
+    Args:
+        rows (list): Rows from profile_import.
+        directory (Path): The directory the entry point was imported from.
+        top (int): Number of packages and modules to keep.
+
+    Returns:
+        dict: Total import seconds, slowest packages by self time and slowest first-party
+            modules by cumulative time, which includes the third-party imports they trigger.
+    """
+    packages = Counter()
+    for self_us, _, _, name in rows:
+        packages[name.split(".")[0]] += self_us
+
+    # Helper processes (e.g. multiprocessing's resource tracker) inherit -X importtime and
+    # interleave their rows, so first-party modules are matched by name, not by nesting
+    first_party = {path.stem for path in directory.iterdir() if path.suffix == ".py"}
+    first_party |= {path.name for path in directory.iterdir() if path.is_dir()}
+    modules = [row for row in rows if row[3].split(".")[0] in first_party]
+
+    return {
+        "import_s": sum(row[1] for row in rows if row[2] == 0) / 1e6,
+        "packages": [(name, us / 1e6) for name, us in packages.most_common(top)],
+        "modules": [
+            (row[3], row[1] / 1e6)
+            for row in sorted(modules, key=lambda row: row[1], reverse=True)[:top]
+        ],
+    }
+
+
+def print_report(name, module, wall_times, summary):
+    print(
+        f"{name} (import {module}): best {min(wall_times):.3f}s, "
+        f"median {sorted(wall_times)[len(wall_times) // 2]:.3f}s wall "
+        f"over {len(wall_times)} runs, {summary['import_s']:.3f}s in imports"
+    )
+    for title, entries in (
+        ("slowest packages (self time)", summary["packages"]),
+        ("slowest first-party modules (cumulative)", summary["modules"]),
+    ):
+        print(f"  {title}:")
+        width = max((len(entry) for entry, _ in entries), default=0)
+        for entry, seconds in entries:
+            print(f"    {entry:<{width}}  {seconds:7.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="imports per entry point")
+    parser.add_argument("--top", type=int, default=10, help="rows per digest table")
+    args = parser.parse_args()
+
+    for name, module, directory in TARGETS:
+        runs = [profile_import(module, directory) for _ in range(args.runs)]
+        wall_times = [elapsed for elapsed, _ in runs]
+        _, best_rows = min(runs, key=lambda run: run[0])
+        print_report(
+            name, module, wall_times, summarize(best_rows, directory, args.top)
+        )
@@ -0,0 +1,125 @@
+"""
+Infobox parsing benchmark: the BeautifulSoup html.parser extraction against infobox.py.
+
+Parses the pages saved by the translation scrapers with both, checks that every result is
+identical and prints the best time of several runs for each, plus the time of parsing all
+pages in the process pool of parse_cached_pages.
+
+Usage (from the repo root, after a scrape): python scripts/benchmark_infobox_parsing.py [--runs 3] [--identifier-type SHIP_TO_CITY_CD]
+"""
+
+import argparse
+import re
+import time
+from pathlib import Path
+from urllib.parse import unquote
+
+from bs4 import BeautifulSoup
+
+from constants import WIKIPEDIA_PAGES_DIR
+from infobox import parse_cached_pages, parse_html
+
+
+def clean_text_bs4(text):
+    if isinstance(text, str):
+        text = re.sub(r"\xa0", " ", text)
+        text = re.sub(r"\s+", " ", text)
+        return text.strip()
+    return text
+
+
+def parse_html_bs4(identifier, html_content, identifier_type):
+    # The scrapers' extraction before infobox.py
+    soup = BeautifulSoup(html_content, "html.parser")
+    english_name = soup.title.string.replace("- Wikipedia", "").strip()
+    demographics = {}
+    tables = soup.find_all("table", class_="infobox")
+
+    for table in tables:
+        for row in table.find_all("tr"):
+            th = row.find("th")
+            td = row.find("td")
+            if th and td:
+                key = th.text.strip()
+                value = td.text.strip()
+                demographics[key] = value
+
+    cleaned_demographics = {
+        re.sub(r"^[-•]\s*", "", key): clean_text_bs4(value)
+        for key, value in demographics.items()
+    }
+
+    return {
+        f"{identifier_type}_ENG": english_name,
+        identifier_type: identifier,
+        "metadata": cleaned_demographics,
+    }
+
+
+def measure(parse, pages, identifier_type, runs):
+    """
+    Parses every page several times with one extraction.
+
+    Returns:
+        tuple: Best seconds and the results of the last run.
+    """
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        results = [
+            parse(identifier, html_content, identifier_type)
+            for identifier, html_content in pages
+        ]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3, help="parses per extraction")
+    parser.add_argument(
+        "--identifier-type",
+        default="SHIP_TO_CITY_CD",
+        choices=["SHIP_TO_CITY_CD", "SHIP_TO_DISTRICT_NAME"],
+    )
+    args = parser.parse_args()
+
+    paths = sorted(Path(WIKIPEDIA_PAGES_DIR, args.identifier_type).glob("*.html"))
+    if not paths:
+        raise SystemExit(f"No pages saved under {WIKIPEDIA_PAGES_DIR}")
+    pages = [(unquote(path.stem), path.read_bytes()) for path in paths]
+    page_mb = sum(len(html_content) for _, html_content in pages) / 1024**2
+    print(f"{len(pages)} pages, {page_mb:.1f}MB")
+
+    baseline_s, expected = measure(
+        parse_html_bs4, pages, args.identifier_type, args.runs
+    )
+    lxml_s, results = measure(parse_html, pages, args.identifier_type, args.runs)
+    mismatches = [
+        result[args.identifier_type]
+        for result, expected_result in zip(results, expected)
+        if result != expected_result
+    ]
+
+    pool_s = None
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        pool_results = parse_cached_pages(args.identifier_type)
+        elapsed = time.perf_counter() - start
+        pool_s = elapsed if pool_s is None else min(pool_s, elapsed)
+    if pool_results != expected:
+        mismatches.append("process pool")
+
+    for name, seconds in [
+        ("bs4", baseline_s),
+        ("lxml", lxml_s),
+        ("lxml pool", pool_s),
+    ]:
+        print(
+            f"  {name:<10} {seconds * 1000:8.1f}ms {len(pages) / seconds:8.1f} pages/s  "
+            f"{baseline_s / seconds:5.1f}x faster"
+        )
+    if mismatches:
+        raise SystemExit(f"Results differ for: {', '.join(mismatches)}")
+    print("Results identical")
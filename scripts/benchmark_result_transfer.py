@@ -0,0 +1,76 @@
+"""
+Result transfer benchmark: fetchdf() against the Arrow-native helpers in data_access.py.
+
+For the largest results the scripts fetch, prints the best time of several runs and the
+memory held by the result for fetchdf(), fetch_frame() (Arrow-backed strings) and
+fetch_arrow() (the Arrow table itself). --repeat multiplies every result by cross joining
+it with range(n), to see how the difference grows with volume.
+
+Usage (from the repo root, after make etl): python scripts/benchmark_result_transfer.py [--runs 5] [--repeat 1]
+"""
+
+import argparse
+import time
+
+import duckdb
+
+from constants import DUCKDB_FILE_PATH
+from data_access import fetch_arrow, fetch_frame
+
+QUERIES = {
+    "raw_dataset_1": "SELECT * FROM RAW_DATASET_1",
+    "raw_dataset_2": "SELECT * FROM RAW_DATASET_2",
+    "processed_dataset": "SELECT * FROM PROCESSED_DATASET",
+    "curated_dataset": "SELECT * FROM CURATED_DATASET",
+    "clustering_input": "SELECT SHIP_TO_CITY_CD, RMB_DOLLARS FROM CURATED_DATASET",
+}
+
+METHODS = {
+    "fetchdf": lambda con, query: con.execute(query).fetchdf(),
+    "fetch_frame": fetch_frame,
+    "fetch_arrow": fetch_arrow,
+}
+
+
+def result_mb(result):
+    if hasattr(result, "nbytes"):
+        return result.nbytes / 1024**2
+    # deep counts the Python string objects of object columns
+    return result.memory_usage(deep=True).sum() / 1024**2
+
+
+def measure(con, method, query, runs):
+    """
+    Fetches a query result several times with one method.
+
+    Returns:
+        tuple: Best seconds, result MB and result rows.
+    """
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = METHODS[method](con, query)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result_mb(result), len(result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="fetches per method")
+    parser.add_argument("--repeat", type=int, default=1, help="result size multiplier")
+    args = parser.parse_args()
+
+    con = duckdb.connect(database=DUCKDB_FILE_PATH, read_only=True)
+    for name, query in QUERIES.items():
+        if args.repeat > 1:
+            query = f"SELECT q.* FROM ({query}) q, range({args.repeat})"
+        results = {method: measure(con, method, query, args.runs) for method in METHODS}
+        baseline_s, baseline_mb, rows = results["fetchdf"]
+        print(f"{name} ({rows} rows)")
+        for method, (seconds, mb, _) in results.items():
+            print(
+                f"  {method:<12} {seconds * 1000:8.1f}ms {mb:8.1f}MB  "
+                f"{baseline_s / seconds:5.1f}x faster, {baseline_mb / mb:5.1f}x smaller"
+            )
+    con.close()
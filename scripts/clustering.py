@@ -1,20 +1,22 @@
 import duckdb
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
+from data_access import fetch_frame
 from constants import DUCKDB_FILE_PATH, CITY_CLUSTER_RESULTS_FILE_PATH
 
 # Extract from OLAP and aggregate
 # Connect to DuckDB and retrieve the data
 con = duckdb.connect(database=DUCKDB_FILE_PATH, read_only=False)
-df = con.execute("SELECT SHIP_TO_CITY_CD, RMB_DOLLARS FROM CURATED_DATASET").fetchdf()
+df = fetch_frame(con, "SELECT SHIP_TO_CITY_CD, RMB_DOLLARS FROM CURATED_DATASET")
 
 # Aggregate total sales by city
 city_sales = df.groupby("SHIP_TO_CITY_CD").sum().reset_index()
 
 # Optionally, merge with English city names if available
-city_names = con.execute(
-    "SELECT SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG, PROVINCE, PER_CAPITA_USD  FROM TRANSLATIONS_CITY_MAPPING"
-).fetchdf()
+city_names = fetch_frame(
+    con,
+    "SELECT SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG, PROVINCE, PER_CAPITA_USD  FROM TRANSLATIONS_CITY_MAPPING",
+)
 city_sales = city_sales.merge(city_names, on="SHIP_TO_CITY_CD", how="left")
 
 # Data Preprocessing
@@ -10,3 +10,5 @@ ERROR_DISTRICTS_TRANSLATIONS_FILE_PATH = (
 )
 CITY_CLUSTER_RESULTS_FILE_PATH = "data/static/cluster/cluster_results.csv"
 GEOJSON_FILE_PATH = "data/static/geojson/province_geojson.json"
+# Pages fetched by the translation scrapers, parsed again by their --from-cache option
+WIKIPEDIA_PAGES_DIR = "data/output/wikipedia_pages"
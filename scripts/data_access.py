@@ -0,0 +1,77 @@
+"""
+Arrow-native query results for the scripts.
+
+fetchdf() has DuckDB build the pandas objects itself, which copies every string into a
+Python object. These helpers fetch an Arrow table instead and hand it to pandas with
+Arrow-backed string columns, so strings stay in Arrow buffers, and numeric columns without
+nulls are handed over without another copy.
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+def fetch_arrow(con, query, parameters=None):
+    """
+    Runs a query and returns its result as an Arrow table.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The DuckDB connection.
+        query (str): The query to run.
+        parameters (list): Values for the query's ? placeholders.
+
+    Returns:
+        pyarrow.Table: The query result.
+    """
+    return con.execute(query, parameters).fetch_arrow_table()
+
+
+def arrow_pandas_dtype(arrow_type):
+    # ArrowDtype rather than string[pyarrow], which DuckDB 1.0 scans through deprecated internals
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    # Everything else gets the NumPy dtype pandas would pick
+    return None
+
+
+def to_frame(table, self_destruct=False):
+    """
+    Converts an Arrow table to a DataFrame with Arrow-backed string columns.
+    DECIMAL columns become float64 and DATE columns datetime64, as they do with fetchdf().
+
+    Args:
+        table (pyarrow.Table): The table to convert.
+        self_destruct (bool): Release each Arrow column once converted. The table is
+            unusable afterwards.
+
+    Returns:
+        pd.DataFrame: The converted DataFrame.
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type):
+            table = table.set_column(
+                i, field.name, pc.cast(table.column(i), pa.float64())
+            )
+    # split_blocks keeps pandas from consolidating, i.e. copying, same-typed columns
+    return table.to_pandas(
+        types_mapper=arrow_pandas_dtype,
+        date_as_object=False,
+        split_blocks=True,
+        self_destruct=self_destruct,
+    )
+
+
+def fetch_frame(con, query, parameters=None):
+    """
+    Runs a query and returns its result as a DataFrame with Arrow-backed string columns.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The DuckDB connection.
+        query (str): The query to run.
+        parameters (list): Values for the query's ? placeholders.
+
+    Returns:
+        pd.DataFrame: The query result.
+    """
+    return to_frame(fetch_arrow(con, query, parameters), self_destruct=True)
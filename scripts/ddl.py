@@ -13,7 +13,9 @@ CREATE TABLE IF NOT EXISTS RAW_DATASET_1 (
     CITY_DISTRICT_ID INT,
     RPTG_AMT DECIMAL(18,2),
     CURRENCY_CD VARCHAR,
-    ORDER_QTY VARCHAR
+    ORDER_QTY VARCHAR,
+    PARTITION_DATE DATE,
+    PARTITION_WINDOW VARCHAR
 );
 CREATE TABLE IF NOT EXISTS RAW_MAPPING (
     CITY_DISTRICT_ID INT PRIMARY KEY,
@@ -27,7 +29,9 @@ CREATE TABLE IF NOT EXISTS RAW_DATASET_2 (
     SHIP_TO_CITY_CD VARCHAR,
     RPTG_AMT DECIMAL(18,2),
     CURRENCY_CD VARCHAR,
-    ORDER_QTY INT
+    ORDER_QTY INT,
+    PARTITION_DATE DATE,
+    PARTITION_WINDOW VARCHAR
 );
 
 -- Silver Layer Tables
@@ -38,7 +42,9 @@ CREATE TABLE IF NOT EXISTS PROCESSED_DATASET (
     SHIP_TO_DISTRICT_NAME VARCHAR,
     RPTG_AMT DECIMAL(18,2),
     CURRENCY_CD VARCHAR,
-    ORDER_QTY INT
+    ORDER_QTY INT,
+    PARTITION_DATE DATE,
+    PARTITION_WINDOW VARCHAR
 );
 
 CREATE TABLE IF NOT EXISTS EXCEPTIONS_DATASET (
@@ -67,6 +73,11 @@ CREATE TABLE IF NOT EXISTS CURRENCY_CODE_MAPPING (
     DATE_RECORDED DATE
 );
 
+"""
+
+# Gold table of transform_to_gold.py. pipeline.py builds the gold layer with dbt instead,
+# where CURATED_DATASET is a view.
+gold_ddl_statements = """
 -- Gold Layer Table
 CREATE TABLE IF NOT EXISTS CURATED_DATASET (
     ORDER_ID VARCHAR PRIMARY KEY,
@@ -76,21 +87,31 @@ CREATE TABLE IF NOT EXISTS CURATED_DATASET (
     SHIP_TO_DISTRICT_NAME_ENG VARCHAR,
     SHIP_TO_CITY_CD_ENG VARCHAR,
     RMB_DOLLARS DECIMAL(18,2),
-    ORDER_QTY INT
+    ORDER_QTY INT,
+    PARTITION_DATE DATE,
+    PARTITION_WINDOW VARCHAR,
+    ORDER_TS TIMESTAMP,
+    ORDER_DATE_KEY INTEGER,
+    ORDER_HOUR INTEGER,
+    ORDER_HOUR_TS TIMESTAMP,
+    ORDER_15MIN_TS TIMESTAMP,
+    ORDER_MINUTE_TS TIMESTAMP
 );
 
 -- Creating Proper Indexes on PK Columns
 """
 
-# Create a DuckDB connection to a persistent database file
-con = duckdb.connect(database=duckdb_file_path, read_only=False)
+if __name__ == "__main__":
+    # Create a DuckDB connection to a persistent database file
+    con = duckdb.connect(database=duckdb_file_path, read_only=False)
 
-# Execute the DDL statements
-con.execute(ddl_statements)
+    # Execute the DDL statements
+    con.execute(ddl_statements)
+    con.execute(gold_ddl_statements)
 
-# Verify by listing all tables
-tables = con.execute("SHOW TABLES").fetchall()
-print("Tables in the database:", tables)
+    # Verify by listing all tables
+    tables = con.execute("SHOW TABLES").fetchall()
+    print("Tables in the database:", tables)
 
-# Close the DuckDB connection
-con.close()
+    # Close the DuckDB connection
+    con.close()
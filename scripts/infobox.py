@@ -0,0 +1,152 @@
+"""
+Extracts the page title and infobox rows of the Wikipedia pages the translation scrapers fetch.
+
+The pages are parsed with lxml's C parser and only the infobox tables are walked, instead of
+building a BeautifulSoup tree of the whole page. The metadata matches what BeautifulSoup's
+get_text() returned: comments and the contents of script, style, template, rt and rp tags
+are left out of the cell text.
+
+Fetched pages are saved under WIKIPEDIA_PAGES_DIR/<identifier_type>/, so they can be parsed
+again in bulk, in a process pool, without fetching them again.
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+from lxml import etree, html
+
+from constants import WIKIPEDIA_PAGES_DIR
+
+NBSP_RE = re.compile(r"\xa0")
+WHITESPACE_RE = re.compile(r"\s+")
+BULLET_RE = re.compile(r"^[-•]\s*")
+
+INFOBOX_XPATH = etree.XPath(
+    "//table[contains(concat(' ', normalize-space(@class), ' '), ' infobox ')]"
+)
+
+# Tags whose strings BeautifulSoup does not count as text
+SKIPPED_TAGS = {"script", "style", "template", "rt", "rp"}
+
+
+# Function to clean up the data
+def clean_text(text):
+    if isinstance(text, str):
+        # Replace non-breaking spaces, then runs of whitespace, with a single space
+        text = NBSP_RE.sub(" ", text)
+        text = WHITESPACE_RE.sub(" ", text)
+        return text.strip()
+    return text
+
+
+def element_text(element):
+    """
+    Concatenates the text of an element and its descendants, like BeautifulSoup's .text.
+
+    Args:
+        element (lxml.html.HtmlElement): The element.
+
+    Returns:
+        str: The text.
+    """
+    parts = []
+
+    def collect(node):
+        if node.text and node.tag not in SKIPPED_TAGS:
+            parts.append(node.text)
+        for child in node:
+            # Comments and processing instructions have a callable tag
+            if isinstance(child.tag, str) and child.tag not in SKIPPED_TAGS:
+                collect(child)
+            if child.tail:
+                parts.append(child.tail)
+
+    collect(element)
+    return "".join(parts)
+
+
+# Function to parse the HTML content
+def parse_html(identifier, html_content, identifier_type):
+    if isinstance(html_content, bytes):
+        # Wikipedia serves UTF-8
+        html_content = html_content.decode("utf-8", errors="replace")
+    root = html.document_fromstring(html_content)
+    english_name = root.find(".//title").text.replace("- Wikipedia", "").strip()
+    demographics = {}
+
+    # Nested infoboxes are walked again on their own, as BeautifulSoup's find_all did
+    for table in INFOBOX_XPATH(root):
+        for row in table.iter("tr"):
+            th = row.find(".//th")
+            td = row.find(".//td")
+            if th is not None and td is not None:
+                key = element_text(th).strip()
+                value = element_text(td).strip()
+                demographics[key] = value
+
+    cleaned_demographics = {
+        BULLET_RE.sub("", key): clean_text(value) for key, value in demographics.items()
+    }
+
+    return {
+        f"{identifier_type}_ENG": english_name,
+        identifier_type: identifier,
+        "metadata": cleaned_demographics,
+    }
+
+
+def page_path(identifier_type, identifier):
+    # Identifiers are quoted so any name makes a valid file name
+    return Path(
+        WIKIPEDIA_PAGES_DIR, identifier_type, f"{quote(identifier, safe='')}.html"
+    )
+
+
+def save_page(identifier, html_content, identifier_type):
+    """
+    Saves a fetched page for parse_cached_pages.
+
+    Args:
+        identifier (str): The city or district the page was fetched for.
+        html_content (bytes | str): The page.
+        identifier_type (str): SHIP_TO_CITY_CD or SHIP_TO_DISTRICT_NAME.
+    """
+    path = page_path(identifier_type, identifier)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(html_content, str):
+        html_content = html_content.encode("utf-8")
+    path.write_bytes(html_content)
+
+
+def parse_cached_page(path, identifier_type):
+    return parse_html(unquote(path.stem), path.read_bytes(), identifier_type)
+
+
+def parse_cached_pages(identifier_type, max_workers=None):
+    """
+    Parses every saved page of an identifier type in a process pool.
+
+    Args:
+        identifier_type (str): SHIP_TO_CITY_CD or SHIP_TO_DISTRICT_NAME.
+        max_workers (int): Worker processes, the CPU count by default.
+
+    Returns:
+        list: The parse_html results, in identifier order.
+    """
+    paths = sorted(Path(WIKIPEDIA_PAGES_DIR, identifier_type).glob("*.html"))
+    if not paths:
+        return []
+    max_workers = min(max_workers or os.cpu_count(), len(paths))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # Pages are a few hundred KB, so batches keep the pickling overhead low
+        return list(
+            executor.map(
+                parse_cached_page,
+                paths,
+                [identifier_type] * len(paths),
+                chunksize=max(1, len(paths) // (max_workers * 4)),
+            )
+        )
@@ -0,0 +1,131 @@
+"""
+Load test for the read-only metrics API (visualization/api.py).
+
+Runs concurrent clients against a running API for a fixed duration per scenario and
+prints requests per second, latency percentiles and bytes per response. The scenarios
+cover both formats with and without gzip, and clients revalidating with If-None-Match.
+
+Usage: python visualization/api.py, then (from the repo root)
+python scripts/load_test_metrics_api.py [--url http://localhost:8502] [--clients 8] [--seconds 10]
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+# (name, query string, request headers, send If-None-Match)
+SCENARIOS = [
+    ("json", "", {}, False),
+    ("json gzip", "", {"Accept-Encoding": "gzip"}, False),
+    ("arrow", "?format=arrow", {}, False),
+    ("arrow gzip", "?format=arrow", {"Accept-Encoding": "gzip"}, False),
+    ("json revalidate", "", {"Accept-Encoding": "gzip"}, True),
+]
+
+
+def client(url, paths, headers, revalidate, deadline, results):
+    """
+    Requests paths round robin until the deadline.
+
+    Args:
+        url (SplitResult): The API base URL.
+        paths (list): Request paths to cycle through.
+        headers (dict): Headers sent with every request.
+        revalidate (bool): Whether to send back each path's last ETag in If-None-Match.
+        deadline (float): perf_counter time to stop at.
+        results (list): Receives (status, seconds, body bytes) per request.
+    """
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    etags = {}
+    latencies = []
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        request_headers = dict(headers)
+        if revalidate and path in etags:
+            request_headers["If-None-Match"] = etags[path]
+        start = time.perf_counter()
+        connection.request("GET", path, headers=request_headers)
+        response = connection.getresponse()
+        body = response.read()
+        latencies.append((response.status, time.perf_counter() - start, len(body)))
+        if response.getheader("ETag"):
+            etags[path] = response.getheader("ETag")
+        # The API answers HTTP/1.0 and closes the connection after each response
+        connection.close()
+    results.extend(latencies)
+
+
+def run_scenario(url, metrics, clients, seconds, query, headers, revalidate):
+    paths = [f"{url.path.rstrip('/')}/metrics/{metric}{query}" for metric in metrics]
+    results = []
+    deadline = time.perf_counter() + seconds
+    threads = [
+        threading.Thread(
+            target=client, args=(url, paths, headers, revalidate, deadline, results)
+        )
+        for _ in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[
+        min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    ]
+
+
+def print_report(name, results, elapsed):
+    latencies = sorted(seconds for _, seconds, _ in results)
+    statuses = {}
+    for status, _, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(
+        f"{name:<16} {len(results) / elapsed:8.0f} req/s  "
+        f"p50 {percentile(latencies, 0.5) * 1000:6.2f}ms  "
+        f"p95 {percentile(latencies, 0.95) * 1000:6.2f}ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:6.2f}ms  "
+        f"{sum(size for _, _, size in results) / len(results):8.0f} B/resp  "
+        f"status {dict(sorted(statuses.items()))}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8502", help="API base URL")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument(
+        "--seconds", type=float, default=10, help="duration per scenario"
+    )
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    connection.request("GET", f"{url.path.rstrip('/')}/metrics")
+    index = json.loads(connection.getresponse().read())
+    connection.close()
+    print(
+        f"{len(index['metrics'])} metrics at data version {index['data_version']}, "
+        f"{args.clients} clients, {args.seconds:g}s per scenario"
+    )
+
+    for name, query, headers, revalidate in SCENARIOS:
+        results, elapsed = run_scenario(
+            url,
+            index["metrics"],
+            args.clients,
+            args.seconds,
+            query,
+            headers,
+            revalidate,
+        )
+        print_report(name, results, elapsed)
@@ -1,7 +1,19 @@
+import os
 import duckdb
 import pandas as pd
+from datetime import datetime
 from constants import EXCEL_FILE_PATH, JSON_FILE_PATH, DUCKDB_FILE_PATH
 
+
+# Input files are laid out as data/input/<YYYYMMDD>/<window>/<file>
+def get_partition_from_path(file_path):
+    window_dir = os.path.dirname(file_path)
+    partition_date = datetime.strptime(
+        os.path.basename(os.path.dirname(window_dir)), "%Y%m%d"
+    ).date()
+    return partition_date, os.path.basename(window_dir)
+
+
 # Create a DuckDB connection to a persistent database file
 con = duckdb.connect(database=DUCKDB_FILE_PATH, read_only=False)
 con.execute("SET GLOBAL pandas_analyze_sample=100000000")
@@ -10,6 +22,9 @@ con.execute("SET GLOBAL pandas_analyze_sample=100000000")
 df_dataset1 = pd.read_excel(EXCEL_FILE_PATH, sheet_name="DATA")
 # Rename the column
 df_dataset1.rename(columns={"ORDER_TIME  (PST)": "ORDER_TIME_PST"}, inplace=True)
+df_dataset1["PARTITION_DATE"], df_dataset1["PARTITION_WINDOW"] = (
+    get_partition_from_path(EXCEL_FILE_PATH)
+)
 
 # Display the first few rows of the DataFrame to verify the contents
 print("DataFrame loaded from Excel file (RAW_DATASET_1):")
@@ -27,7 +42,9 @@ ON CONFLICT(ORDER_ID) DO UPDATE SET
     CITY_DISTRICT_ID = EXCLUDED.CITY_DISTRICT_ID,
     RPTG_AMT = EXCLUDED.RPTG_AMT,
     CURRENCY_CD = EXCLUDED.CURRENCY_CD,
-    ORDER_QTY = EXCLUDED.ORDER_QTY;
+    ORDER_QTY = EXCLUDED.ORDER_QTY,
+    PARTITION_DATE = EXCLUDED.PARTITION_DATE,
+    PARTITION_WINDOW = EXCLUDED.PARTITION_WINDOW;
 """
 
 con.execute(upsert_query)
@@ -55,6 +72,9 @@ con.execute(upsert_query)
 
 # Read the JSON file into a Pandas DataFrame for RAW_DATASET_2
 df_dataset2 = pd.read_json(JSON_FILE_PATH)
+df_dataset2["PARTITION_DATE"], df_dataset2["PARTITION_WINDOW"] = (
+    get_partition_from_path(JSON_FILE_PATH)
+)
 
 # Display the first few rows of the DataFrame to verify the contents
 print("DataFrame loaded from JSON file (RAW_DATASET_2):")
@@ -73,7 +93,9 @@ ON CONFLICT(ORDER_ID) DO UPDATE SET
     SHIP_TO_DISTRICT_NAME = EXCLUDED.SHIP_TO_DISTRICT_NAME,
     RPTG_AMT = EXCLUDED.RPTG_AMT,
     CURRENCY_CD = EXCLUDED.CURRENCY_CD,
-    ORDER_QTY = EXCLUDED.ORDER_QTY;
+    ORDER_QTY = EXCLUDED.ORDER_QTY,
+    PARTITION_DATE = EXCLUDED.PARTITION_DATE,
+    PARTITION_WINDOW = EXCLUDED.PARTITION_WINDOW;
 """
 
 con.execute(upsert_query)
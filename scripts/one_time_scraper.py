@@ -4,9 +4,8 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+import argparse
 import json
-import re
 import os
 import glob
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -17,45 +16,12 @@ from constants import (
     DISTRICTS_TRANSLATIONS_FILE_PATH,
     ERROR_DISTRICTS_TRANSLATIONS_FILE_PATH,
 )
-
-
-# Function to clean up the data
-def clean_text(text):
-    if isinstance(text, str):
-        text = re.sub(
-            r"\xa0", " ", text
-        )  # Replace non-breaking space with normal space
-        text = re.sub(r"\s+", " ", text)  # Replace multiple spaces with a single space
-        return text.strip()
-    return text
-
-
-# Function to parse the HTML content
-def parse_html(identifier, html_content, identifier_type):
-    soup = BeautifulSoup(html_content, "html.parser")
-    english_name = soup.title.string.replace("- Wikipedia", "").strip()
-    demographics = {}
-    tables = soup.find_all("table", class_="infobox")
-
-    for table in tables:
-        for row in table.find_all("tr"):
-            th = row.find("th")
-            td = row.find("td")
-            if th and td:
-                key = th.text.strip()
-                value = td.text.strip()
-                demographics[key] = value
-
-    cleaned_demographics = {
-        re.sub(r"^[-•]\s*", "", key): clean_text(value)
-        for key, value in demographics.items()
-    }
-
-    return {
-        f"{identifier_type}_ENG": english_name,
-        identifier_type: identifier,
-        "metadata": cleaned_demographics,
-    }
+from infobox import parse_cached_pages, parse_html, save_page
+from translation_backfill import (
+    logged_identifiers,
+    pending_identifiers,
+    reopen_json_file,
+)
 
 
 # Function to initialize the JSON file
@@ -70,7 +36,8 @@ def finalize_json_file(filename):
     with open(filename, "rb+") as json_file:
         json_file.seek(-2, os.SEEK_END)
         json_file.truncate()
-        json_file.write(b"\n]")
+        # Nothing was saved after the opening bracket
+        json_file.write(b"[]" if json_file.tell() == 0 else b"\n]")
 
 
 # Function to log and save results incrementally
@@ -125,6 +92,7 @@ def fetch_and_process(identifier, identifier_type, output_filename, error_filena
         )
 
         html_content = driver.page_source
+        save_page(identifier, html_content, identifier_type)
         result = parse_html(identifier, html_content, identifier_type)
 
         # Save the result incrementally
@@ -141,34 +109,39 @@ def fetch_and_process(identifier, identifier_type, output_filename, error_filena
 
 # Function to process identifiers
 def process_identifiers(
-    identifier_type, output_filename, error_filename, max_workers=10
+    identifier_type,
+    output_filename,
+    error_filename,
+    max_workers=10,
+    delta=False,
+    limit=None,
 ):
-    # Connect to DuckDB and retrieve unique identifiers
-    con = duckdb.connect(database=DUCKDB_FILE_PATH, read_only=False)
-    df_identifiers = con.execute(
-        f"""
-        SELECT DISTINCT {identifier_type} FROM (
-            SELECT {identifier_type} FROM RAW_DATASET_2
-            UNION ALL
-            SELECT {identifier_type} FROM RAW_MAPPING
-        )
-        """
-    ).fetchdf()
+    # Identifiers translated or failed in earlier runs are skipped in delta mode
+    skip = (
+        logged_identifiers(identifier_type, output_filename, error_filename)
+        if delta
+        else ()
+    )
+
+    # Connect to DuckDB and retrieve the identifiers to fetch, highest spend first
+    con = duckdb.connect(database=DUCKDB_FILE_PATH, read_only=True)
+    identifiers = pending_identifiers(con, identifier_type, skip, delta, limit)
     con.close()
 
-    total_identifiers = len(df_identifiers)
+    total_identifiers = len(identifiers)
+    print(f"{identifier_type}: {total_identifiers} identifiers to fetch")
 
     # we use thread safe multithreading to improve performance
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         futures = [
             executor.submit(
                 fetch_and_process,
-                row[identifier_type],
+                identifier,
                 identifier_type,
                 output_filename,
                 error_filename,
             )
-            for index, row in df_identifiers.iterrows()
+            for identifier, _ in identifiers
         ]
 
         for i, future in enumerate(as_completed(futures)):
@@ -178,29 +151,58 @@ def process_identifiers(
             print(f"Progress: {progress:.2f}%")
 
 
+# Function to parse the saved pages again, without fetching them
+def reparse_cached_pages(identifier_type, output_filename):
+    results = parse_cached_pages(identifier_type)
+    initialize_json_file(output_filename)
+    for result in results:
+        save_result_incrementally(result, output_filename)
+    finalize_json_file(output_filename)
+    print(f"{identifier_type}: {len(results)} cached pages parsed")
+
+
 # Main function to process both city and district names
-def main():
-    # Use glob to list all files in the directory
-    files = glob.glob(os.path.join("data/static/", "*"))
-
-    # Loop through the files and remove each one
-    for file in files:
-        print(
-            f"{file} exists! Removing before this pipeline runs to ensure idempotency."
-        )
-        try:
-            os.remove(file)
-            print(f"Successfully deleted: {file}")
-        except Exception as e:
-            print(f"Error deleting {file}: {e}")
+def main(delta=False, limit=None, from_cache=False):
+    if from_cache:
+        # Error logs are left as they are, as only pages fetched successfully were saved
+        reparse_cached_pages("SHIP_TO_CITY_CD", CITY_TRANSLATIONS_FILE_PATH)
+        reparse_cached_pages("SHIP_TO_DISTRICT_NAME", DISTRICTS_TRANSLATIONS_FILE_PATH)
+        return
+
+    json_files = [
+        CITY_TRANSLATIONS_FILE_PATH,
+        ERROR_TRANSLATIONS_FILE_PATH,
+        DISTRICTS_TRANSLATIONS_FILE_PATH,
+        ERROR_DISTRICTS_TRANSLATIONS_FILE_PATH,
+    ]
+    if delta:
+        # Keep earlier results and append the new translations to them
+        for json_file in json_files:
+            reopen_json_file(json_file)
+    else:
+        # Use glob to list all files in the directory
+        files = glob.glob(os.path.join("data/static/", "*"))
+
+        # Loop through the files and remove each one
+        for file in files:
+            print(
+                f"{file} exists! Removing before this pipeline runs to ensure idempotency."
+            )
+            try:
+                os.remove(file)
+                print(f"Successfully deleted: {file}")
+            except Exception as e:
+                print(f"Error deleting {file}: {e}")
 
-    initialize_json_file(CITY_TRANSLATIONS_FILE_PATH)
-    initialize_json_file(ERROR_TRANSLATIONS_FILE_PATH)
-    initialize_json_file(DISTRICTS_TRANSLATIONS_FILE_PATH)
-    initialize_json_file(ERROR_DISTRICTS_TRANSLATIONS_FILE_PATH)
+        for json_file in json_files:
+            initialize_json_file(json_file)
 
     process_identifiers(
-        "SHIP_TO_CITY_CD", CITY_TRANSLATIONS_FILE_PATH, ERROR_TRANSLATIONS_FILE_PATH
+        "SHIP_TO_CITY_CD",
+        CITY_TRANSLATIONS_FILE_PATH,
+        ERROR_TRANSLATIONS_FILE_PATH,
+        delta=delta,
+        limit=limit,
     )
     finalize_json_file(CITY_TRANSLATIONS_FILE_PATH)
     finalize_json_file(ERROR_TRANSLATIONS_FILE_PATH)
@@ -209,10 +211,29 @@ def main():
         "SHIP_TO_DISTRICT_NAME",
         DISTRICTS_TRANSLATIONS_FILE_PATH,
         ERROR_DISTRICTS_TRANSLATIONS_FILE_PATH,
+        delta=delta,
+        limit=limit,
     )
     finalize_json_file(DISTRICTS_TRANSLATIONS_FILE_PATH)
     finalize_json_file(ERROR_DISTRICTS_TRANSLATIONS_FILE_PATH)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(
+        description="Scrape city and district translations from Wikipedia"
+    )
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="only fetch identifiers without a translation or logged error, keeping earlier results",
+    )
+    parser.add_argument(
+        "--limit", type=int, help="fetch at most this many identifiers of each type"
+    )
+    parser.add_argument(
+        "--from-cache",
+        action="store_true",
+        help="parse the pages saved by earlier runs again instead of fetching them",
+    )
+    args = parser.parse_args()
+    main(delta=args.delta, limit=args.limit, from_cache=args.from_cache)
@@ -0,0 +1,439 @@
+"""
+Runs the local ETL end to end in a single process on one DuckDB connection.
+
+Replaces running ddl.py, load_to_bronze.py, transform_to_silver.py,
+transform_to_silver_mappings.py, transform_to_gold.py, post_run_indexing.py and
+load_clustering_results.py one after another. Everything past the Excel read stays
+inside DuckDB, and a per-stage timing summary is printed at the end. The gold layer is
+built by the dbt curated models rather than transform_to_gold.py, so it matches the
+Dagster pipeline's.
+
+Usage (from the repo root): python scripts/pipeline.py
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+import duckdb
+import pandas as pd
+from dbt.cli.main import dbtRunner
+
+from constants import (
+    EXCEL_FILE_PATH,
+    JSON_FILE_PATH,
+    DUCKDB_FILE_PATH,
+    CITY_TRANSLATIONS_FILE_PATH,
+    DISTRICTS_TRANSLATIONS_FILE_PATH,
+    CITY_CLUSTER_RESULTS_FILE_PATH,
+)
+from ddl import ddl_statements
+
+# Same rules as the pydantic models in pydantic_models/RawDatasets.py, as SQL conditions.
+# A NULL result counts as a failure, as a missing value fails pydantic validation.
+EXCEL_VALIDATIONS = [
+    ("ORDER_TIME_PST", "regexp_full_match(ORDER_TIME_PST, '\\d+')"),
+    (
+        "CITY_DISTRICT_ID",
+        "CITY_DISTRICT_ID > 0 AND CITY_DISTRICT_ID IN (SELECT CITY_DISTRICT_ID FROM RAW_MAPPING)",
+    ),
+    ("RPTG_AMT", "RPTG_AMT >= 0"),
+    ("CURRENCY_CD", "CURRENCY_CD IN ('USD', 'RMB')"),
+    ("ORDER_QTY", "TRY_CAST(ORDER_QTY AS INTEGER) > 0"),
+]
+JSON_VALIDATIONS = [
+    ("ORDER_TIME_PST", "ORDER_TIME_PST BETWEEN 50000 AND 120000"),
+    ("RPTG_AMT", "RPTG_AMT >= 0"),
+    ("CURRENCY_CD", "CURRENCY_CD IN ('USD', 'RMB')"),
+    ("ORDER_QTY", "ORDER_QTY > 0"),
+]
+
+# dbt project of the curated models, built into their own target path so the compiled
+# SQL of a Dagster run is left alone
+DBT_PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DBT_TARGET_PATH = os.path.join("target", "scripts")
+
+# Columns of curated_fact_orders_archive, same as ARCHIVE_COLUMNS and PARTITION_COLUMNS in
+# orchestrator/archive.py
+ARCHIVE_COLUMNS = {
+    "ORDER_ID": "VARCHAR",
+    "ORDER_TIME_PST": "INTEGER",
+    "SHIP_TO_CITY_CD": "VARCHAR",
+    "SHIP_TO_DISTRICT_NAME": "VARCHAR",
+    "RMB_DOLLARS": "DECIMAL(18,2)",
+    "ORDER_QTY": "INTEGER",
+    "ORDER_TS": "TIMESTAMP",
+    "ORDER_DATE_KEY": "INTEGER",
+    "ORDER_HOUR": "INTEGER",
+    "ORDER_HOUR_TS": "TIMESTAMP",
+    "ORDER_15MIN_TS": "TIMESTAMP",
+    "ORDER_MINUTE_TS": "TIMESTAMP",
+    "PARTITION_DATE": "DATE",
+    "PARTITION_WINDOW": "VARCHAR",
+}
+
+
+# Input files are laid out as data/input/<YYYYMMDD>/<window>/<file>
+def get_partition_from_path(file_path):
+    window_dir = os.path.dirname(file_path)
+    partition_date = datetime.strptime(
+        os.path.basename(os.path.dirname(window_dir)), "%Y%m%d"
+    ).date()
+    return partition_date, os.path.basename(window_dir)
+
+
+def validated_field_sql(field, condition):
+    return f"CASE WHEN {condition} THEN {field} END AS {field}"
+
+
+def validation_errors_sql(validations):
+    """
+    Builds an expression listing the error message of every failed validation.
+
+    Args:
+        validations (list): (field, condition) pairs.
+
+    Returns:
+        str: A SQL expression evaluating to a VARCHAR[] of error messages.
+    """
+    checks = ", ".join(
+        f"CASE WHEN NOT COALESCE({condition}, FALSE) THEN 'Invalid {field}' END"
+        for field, condition in validations
+    )
+    return f"list_filter([{checks}], e -> e IS NOT NULL)"
+
+
+def create_tables(con):
+    con.execute(ddl_statements)
+
+
+def load_to_bronze(con):
+    # Parse the workbook once for both sheets
+    sheets = pd.read_excel(EXCEL_FILE_PATH, sheet_name=["DATA", "CITY_DISTRICT_MAP"])
+    df_dataset1 = sheets["DATA"].rename(columns={"ORDER_TIME  (PST)": "ORDER_TIME_PST"})
+    df_mapping = sheets["CITY_DISTRICT_MAP"]
+    excel_date, excel_window = get_partition_from_path(EXCEL_FILE_PATH)
+    json_date, json_window = get_partition_from_path(JSON_FILE_PATH)
+
+    con.register("df_dataset1", df_dataset1)
+    con.execute(
+        """
+    INSERT INTO RAW_DATASET_1
+    SELECT ORDER_ID, ORDER_TIME_PST, CITY_DISTRICT_ID, RPTG_AMT, CURRENCY_CD, ORDER_QTY, ?, ?
+    FROM df_dataset1
+    ON CONFLICT(ORDER_ID) DO UPDATE SET
+        ORDER_TIME_PST = EXCLUDED.ORDER_TIME_PST,
+        CITY_DISTRICT_ID = EXCLUDED.CITY_DISTRICT_ID,
+        RPTG_AMT = EXCLUDED.RPTG_AMT,
+        CURRENCY_CD = EXCLUDED.CURRENCY_CD,
+        ORDER_QTY = EXCLUDED.ORDER_QTY,
+        PARTITION_DATE = EXCLUDED.PARTITION_DATE,
+        PARTITION_WINDOW = EXCLUDED.PARTITION_WINDOW
+    """,
+        [excel_date, excel_window],
+    )
+    con.unregister("df_dataset1")
+
+    con.register("df_mapping", df_mapping)
+    con.execute(
+        """
+    INSERT INTO RAW_MAPPING
+    SELECT CITY_DISTRICT_ID, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME FROM df_mapping
+    ON CONFLICT(CITY_DISTRICT_ID) DO UPDATE SET
+        SHIP_TO_CITY_CD = EXCLUDED.SHIP_TO_CITY_CD,
+        SHIP_TO_DISTRICT_NAME = EXCLUDED.SHIP_TO_DISTRICT_NAME
+    """
+    )
+    con.unregister("df_mapping")
+
+    # DuckDB reads the JSON file directly, no DataFrame in between
+    con.execute(
+        f"""
+    INSERT INTO RAW_DATASET_2
+    SELECT
+        ORDER_ID,
+        TRY_CAST(ORDER_TIME_PST AS BIGINT),
+        SHIP_TO_DISTRICT_NAME,
+        SHIP_TO_CITY_CD,
+        TRY_CAST(RPTG_AMT AS DECIMAL(18,2)),
+        CURRENCY_CD,
+        TRY_CAST(ORDER_QTY AS INTEGER),
+        ?,
+        ?
+    FROM read_json_auto('{JSON_FILE_PATH}')
+    ON CONFLICT(ORDER_ID) DO UPDATE SET
+        ORDER_TIME_PST = EXCLUDED.ORDER_TIME_PST,
+        SHIP_TO_CITY_CD = EXCLUDED.SHIP_TO_CITY_CD,
+        SHIP_TO_DISTRICT_NAME = EXCLUDED.SHIP_TO_DISTRICT_NAME,
+        RPTG_AMT = EXCLUDED.RPTG_AMT,
+        CURRENCY_CD = EXCLUDED.CURRENCY_CD,
+        ORDER_QTY = EXCLUDED.ORDER_QTY,
+        PARTITION_DATE = EXCLUDED.PARTITION_DATE,
+        PARTITION_WINDOW = EXCLUDED.PARTITION_WINDOW
+    """,
+        [json_date, json_window],
+    )
+
+
+def transform_to_silver(con):
+    # Invalid dataset 1 fields are nulled, dataset 2 rows are only reported
+    excel_fields = ",\n            ".join(
+        validated_field_sql(field, condition) for field, condition in EXCEL_VALIDATIONS
+    )
+    con.execute(
+        f"""
+    INSERT INTO PROCESSED_DATASET (
+        ORDER_ID, ORDER_TIME_PST, RPTG_AMT, CURRENCY_CD, ORDER_QTY, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME, PARTITION_DATE, PARTITION_WINDOW
+    )
+    WITH qualified_dataset_1 AS (
+        SELECT
+            ORDER_ID,
+            {excel_fields},
+            PARTITION_DATE,
+            PARTITION_WINDOW
+        FROM RAW_DATASET_1
+    )
+    SELECT q.ORDER_ID, q.ORDER_TIME_PST, q.RPTG_AMT, q.CURRENCY_CD, q.ORDER_QTY, m.SHIP_TO_CITY_CD, m.SHIP_TO_DISTRICT_NAME, q.PARTITION_DATE, q.PARTITION_WINDOW
+    FROM qualified_dataset_1 q
+    LEFT JOIN RAW_MAPPING m ON q.CITY_DISTRICT_ID = m.CITY_DISTRICT_ID
+    UNION ALL
+    SELECT ORDER_ID, ORDER_TIME_PST, RPTG_AMT, CURRENCY_CD, ORDER_QTY, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME, PARTITION_DATE, PARTITION_WINDOW
+    FROM RAW_DATASET_2
+    ON CONFLICT(ORDER_ID) DO UPDATE SET
+        ORDER_TIME_PST = EXCLUDED.ORDER_TIME_PST,
+        RPTG_AMT = EXCLUDED.RPTG_AMT,
+        CURRENCY_CD = EXCLUDED.CURRENCY_CD,
+        ORDER_QTY = EXCLUDED.ORDER_QTY,
+        SHIP_TO_CITY_CD = EXCLUDED.SHIP_TO_CITY_CD,
+        SHIP_TO_DISTRICT_NAME = EXCLUDED.SHIP_TO_DISTRICT_NAME,
+        PARTITION_DATE = EXCLUDED.PARTITION_DATE,
+        PARTITION_WINDOW = EXCLUDED.PARTITION_WINDOW
+    """
+    )
+
+    con.execute("DROP TABLE IF EXISTS EXCEPTIONS_DATASET")
+    con.execute(
+        f"""
+    CREATE TABLE EXCEPTIONS_DATASET AS
+    WITH errors AS (
+        SELECT ORDER_ID, {validation_errors_sql(EXCEL_VALIDATIONS)} AS errors
+        FROM RAW_DATASET_1
+        UNION ALL
+        SELECT ORDER_ID, {validation_errors_sql(JSON_VALIDATIONS)} AS errors
+        FROM RAW_DATASET_2
+    )
+    SELECT ORDER_ID, CAST(to_json(flatten(list(errors))) AS VARCHAR) AS ERROR_MESSAGE
+    FROM errors
+    WHERE len(errors) > 0
+    GROUP BY ORDER_ID
+    """
+    )
+
+
+def load_mappings(con):
+    # Same extraction as transform_to_silver_mappings.py, one set-based upsert per file.
+    # Later duplicates in a file win, as they did with the row-by-row upserts.
+    con.execute(
+        rf"""
+    INSERT INTO TRANSLATIONS_CITY_MAPPING (SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG, METADATA, PROVINCE, PER_CAPITA_USD, TOTAL_GDP_USD)
+    WITH source AS (
+        SELECT
+            *,
+            json_extract_string(metadata, '$."Per capita"') AS per_capita_str,
+            json_extract_string(metadata, '$."Total"') AS total_gdp_str,
+            row_number() OVER () AS file_order
+        FROM read_json(
+            '{CITY_TRANSLATIONS_FILE_PATH}',
+            format = 'array',
+            columns = {{SHIP_TO_CITY_CD: 'VARCHAR', SHIP_TO_CITY_CD_ENG: 'VARCHAR', metadata: 'JSON'}}
+        )
+    )
+    SELECT
+        SHIP_TO_CITY_CD,
+        SHIP_TO_CITY_CD_ENG,
+        metadata,
+        COALESCE(
+            NULLIF(replace(json_extract_string(metadata, '$."Province"'), '"', ''), ''),
+            SHIP_TO_CITY_CD_ENG
+        ),
+        NULLIF(replace(regexp_extract(per_capita_str, 'US\$ ([\d,]+)', 1), ',', ''), ''),
+        CASE
+            WHEN regexp_matches(total_gdp_str, 'US\$ ([\d\.]+) billion')
+            THEN CAST(CAST(trunc(CAST(regexp_extract(total_gdp_str, 'US\$ ([\d\.]+) billion', 1) AS DOUBLE) * 1e9) AS BIGINT) AS VARCHAR)
+            ELSE NULLIF(replace(regexp_extract(total_gdp_str, 'US\$ ([\d,]+)', 1), ',', ''), '')
+        END
+    FROM source
+    QUALIFY row_number() OVER (PARTITION BY SHIP_TO_CITY_CD ORDER BY file_order DESC) = 1
+    ON CONFLICT(SHIP_TO_CITY_CD) DO UPDATE SET
+        SHIP_TO_CITY_CD_ENG = EXCLUDED.SHIP_TO_CITY_CD_ENG,
+        METADATA = EXCLUDED.METADATA,
+        PROVINCE = EXCLUDED.PROVINCE,
+        PER_CAPITA_USD = EXCLUDED.PER_CAPITA_USD,
+        TOTAL_GDP_USD = EXCLUDED.TOTAL_GDP_USD
+    """
+    )
+
+    con.execute(
+        f"""
+    INSERT INTO TRANSLATIONS_DISTRICT_MAPPING (SHIP_TO_DISTRICT_NAME, SHIP_TO_DISTRICT_NAME_ENG, METADATA)
+    SELECT SHIP_TO_DISTRICT_NAME, SHIP_TO_DISTRICT_NAME_ENG, metadata
+    FROM (
+        SELECT *, row_number() OVER () AS file_order
+        FROM read_json(
+            '{DISTRICTS_TRANSLATIONS_FILE_PATH}',
+            format = 'array',
+            columns = {{SHIP_TO_DISTRICT_NAME: 'VARCHAR', SHIP_TO_DISTRICT_NAME_ENG: 'VARCHAR', metadata: 'JSON'}}
+        )
+    )
+    QUALIFY row_number() OVER (PARTITION BY SHIP_TO_DISTRICT_NAME ORDER BY file_order DESC) = 1
+    ON CONFLICT(SHIP_TO_DISTRICT_NAME) DO UPDATE SET
+        SHIP_TO_DISTRICT_NAME_ENG = EXCLUDED.SHIP_TO_DISTRICT_NAME_ENG,
+        METADATA = EXCLUDED.METADATA
+    """
+    )
+
+    con.execute(
+        """
+    INSERT INTO CURRENCY_CODE_MAPPING (CURRENCY_CD, MULTIPLIER, DATE_RECORDED)
+    VALUES
+        ('RMB', 1, CURRENT_DATE),
+        ('USD', 7.28, CURRENT_DATE)
+    ON CONFLICT (CURRENCY_CD) DO UPDATE SET
+        MULTIPLIER = EXCLUDED.MULTIPLIER,
+        DATE_RECORDED = EXCLUDED.DATE_RECORDED
+    """
+    )
+
+
+def transform_to_gold(con):
+    """
+    Builds the gold layer with the dbt curated models, the same SQL the Dagster pipeline
+    runs. dbt opens this file alongside the pipeline's connection, and reads the bronze and
+    silver tables from it instead of the separate layer files.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): Connection to the warehouse file.
+    """
+    database, path = con.execute(
+        "SELECT database_name, path FROM duckdb_databases() WHERE database_name = current_database()"
+    ).fetchone()
+    # The hand-written gold stage this replaces created upper case tables, which dbt
+    # refuses to replace with its lower case models
+    for (table,) in con.execute(
+        """
+        SELECT table_name FROM duckdb_tables()
+        WHERE database_name = current_database()
+            AND table_name LIKE 'CURATED_%'
+            AND table_name = upper(table_name)
+        """
+    ).fetchall():
+        con.execute(f"DROP TABLE {table}")
+
+    # Partitions are never archived here, so the models read an empty archive
+    con.execute(
+        f"""
+    CREATE OR REPLACE VIEW CURATED_FACT_ORDERS_ARCHIVE AS
+    SELECT {", ".join(f"CAST(NULL AS {data_type}) AS {name}" for name, data_type in ARCHIVE_COLUMNS.items())}
+    FROM (SELECT 1) WHERE false
+    """
+    )
+
+    loaded_partitions = sorted(
+        f"{partition_date:%Y%m%d}/{window}"
+        for partition_date, window in {
+            get_partition_from_path(EXCEL_FILE_PATH),
+            get_partition_from_path(JSON_FILE_PATH),
+        }
+    )
+    dbt_vars = {
+        "scripts_database_path": path,
+        "bronze_database": database,
+        "silver_database": database,
+        "loaded_partitions": loaded_partitions,
+    }
+    result = dbtRunner().invoke(
+        [
+            "build",
+            "--select",
+            "curated",
+            "--target",
+            "scripts",
+            "--target-path",
+            DBT_TARGET_PATH,
+            "--project-dir",
+            DBT_PROJECT_DIR,
+            "--profiles-dir",
+            DBT_PROJECT_DIR,
+            "--vars",
+            json.dumps(dbt_vars),
+        ]
+    )
+    if not result.success:
+        raise RuntimeError(
+            "dbt build of the curated models failed"
+        ) from result.exception
+
+
+def load_clustering_results(con):
+    con.execute(
+        f"""
+    CREATE OR REPLACE TABLE CURATED_CITY_CLUSTER_RESULTS (
+        SHIP_TO_CITY_CD VARCHAR,
+        RMB_DOLLARS DOUBLE,
+        SHIP_TO_CITY_CD_ENG VARCHAR,
+        PROVINCE VARCHAR,
+        PER_CAPITA_USD VARCHAR,
+        normalized_sales DOUBLE,
+        cluster INTEGER
+    );
+    COPY CURATED_CITY_CLUSTER_RESULTS FROM '{CITY_CLUSTER_RESULTS_FILE_PATH}' (HEADER, DELIMITER ',');
+    """
+    )
+
+
+STAGES = [
+    ("ddl", create_tables),
+    ("load_to_bronze", load_to_bronze),
+    ("transform_to_silver", transform_to_silver),
+    ("transform_to_silver_mappings", load_mappings),
+    ("transform_to_gold", transform_to_gold),
+    ("load_clustering_results", load_clustering_results),
+]
+
+
+def run_pipeline(database=DUCKDB_FILE_PATH, stages=STAGES):
+    """
+    Runs the given stages in order on a single connection.
+
+    Args:
+        database (str): Path to the DuckDB warehouse file.
+        stages (list): (name, function) pairs, each function taking the connection.
+
+    Returns:
+        list: (stage name, elapsed seconds) for every stage that ran.
+    """
+    timings = []
+    con = duckdb.connect(database=database, read_only=False)
+    con.execute("SET GLOBAL pandas_analyze_sample=100000000")
+    try:
+        for name, stage in stages:
+            start = time.perf_counter()
+            stage(con)
+            timings.append((name, time.perf_counter() - start))
+    finally:
+        con.close()
+    return timings
+
+
+def print_timings(timings):
+    width = max(len(name) for name, _ in timings)
+    total = sum(elapsed for _, elapsed in timings)
+    print("Stage timings:")
+    for name, elapsed in timings:
+        print(f"  {name:<{width}}  {elapsed:8.3f}s  {elapsed / total:6.1%}")
+    print(f"  {'total':<{width}}  {total:8.3f}s")
+
+
+if __name__ == "__main__":
+    print_timings(run_pipeline())
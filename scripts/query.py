@@ -1,4 +1,5 @@
 import duckdb
+from data_access import fetch_frame
 from constants import DUCKDB_FILE_PATH
 
 # Create a DuckDB connection to a persistent database file
@@ -69,12 +70,13 @@ con = duckdb.connect(database=DUCKDB_FILE_PATH, read_only=True)
 # print("City with the highest per-hour sales:", highest_per_hour_sales)
 
 # Query to find the city with the highest average sales by district
-highest_avg_sales_by_district = con.execute(
+highest_avg_sales_by_district = fetch_frame(
+    con,
     """
 select distinct province from translations_city_mapping;
 
-"""
-).fetchdf()
+""",
+)
 
 print(highest_avg_sales_by_district)
 
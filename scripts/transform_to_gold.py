@@ -1,16 +1,17 @@
 import duckdb
+from data_access import fetch_frame
 from constants import DUCKDB_FILE_PATH
 
 # Connect to DuckDB
 con = duckdb.connect(database=DUCKDB_FILE_PATH, read_only=False)
 
 # Load necessary data from Silver Layer
-processed_df = con.execute("SELECT * FROM PROCESSED_DATASET").fetchdf()
-currency_code_df = con.execute("SELECT * FROM CURRENCY_CODE_MAPPING").fetchdf()
-translations_city_df = con.execute("SELECT * FROM TRANSLATIONS_CITY_MAPPING").fetchdf()
-translations_district_df = con.execute(
-    "SELECT * FROM TRANSLATIONS_DISTRICT_MAPPING"
-).fetchdf()
+processed_df = fetch_frame(con, "SELECT * FROM PROCESSED_DATASET")
+currency_code_df = fetch_frame(con, "SELECT * FROM CURRENCY_CODE_MAPPING")
+translations_city_df = fetch_frame(con, "SELECT * FROM TRANSLATIONS_CITY_MAPPING")
+translations_district_df = fetch_frame(
+    con, "SELECT * FROM TRANSLATIONS_DISTRICT_MAPPING"
+)
 
 # Perform the required transformations with suffixes to avoid clashes
 merged_df = processed_df.merge(
@@ -40,6 +41,8 @@ curated_df = merged_df[
         "SHIP_TO_CITY_CD_ENG",
         "RMB_DOLLARS",
         "ORDER_QTY",
+        "PARTITION_DATE",
+        "PARTITION_WINDOW",
     ]
 ]
 
@@ -48,7 +51,34 @@ con.register("curated_df", curated_df)
 con.execute(
     """
 INSERT INTO CURATED_DATASET
-SELECT * FROM curated_df
+-- Order timestamp and time buckets are derived once at load from partition date + HHMMSS
+WITH parsed_df AS (
+    SELECT
+        * REPLACE (CAST(PARTITION_DATE AS DATE) AS PARTITION_DATE),
+        CAST(ORDER_TIME_PST AS BIGINT) AS HHMMSS
+    FROM curated_df
+),
+timed_df AS (
+    SELECT
+        * EXCLUDE (HHMMSS),
+        CASE
+            WHEN HHMMSS // 10000 < 24
+                AND (HHMMSS // 100) % 100 < 60
+                AND HHMMSS % 100 < 60
+            THEN PARTITION_DATE + make_time(
+                HHMMSS // 10000, (HHMMSS // 100) % 100, HHMMSS % 100
+            )
+        END AS ORDER_TS
+    FROM parsed_df
+)
+SELECT
+    *,
+    CAST(strftime(PARTITION_DATE, '%Y%m%d') AS INTEGER) AS ORDER_DATE_KEY,
+    CAST(hour(ORDER_TS) AS INTEGER) AS ORDER_HOUR,
+    date_trunc('hour', ORDER_TS) AS ORDER_HOUR_TS,
+    time_bucket(INTERVAL '15 minutes', ORDER_TS) AS ORDER_15MIN_TS,
+    date_trunc('minute', ORDER_TS) AS ORDER_MINUTE_TS
+FROM timed_df
 ON CONFLICT(ORDER_ID) DO UPDATE SET
     ORDER_TIME_PST = EXCLUDED.ORDER_TIME_PST,
     SHIP_TO_CITY_CD = EXCLUDED.SHIP_TO_CITY_CD,
@@ -56,12 +86,77 @@ ON CONFLICT(ORDER_ID) DO UPDATE SET
     SHIP_TO_DISTRICT_NAME = EXCLUDED.SHIP_TO_DISTRICT_NAME,
     SHIP_TO_DISTRICT_NAME_ENG = EXCLUDED.SHIP_TO_DISTRICT_NAME_ENG,
     RMB_DOLLARS = EXCLUDED.RMB_DOLLARS,
-    ORDER_QTY = EXCLUDED.ORDER_QTY
+    ORDER_QTY = EXCLUDED.ORDER_QTY,
+    PARTITION_DATE = EXCLUDED.PARTITION_DATE,
+    PARTITION_WINDOW = EXCLUDED.PARTITION_WINDOW,
+    ORDER_TS = EXCLUDED.ORDER_TS,
+    ORDER_DATE_KEY = EXCLUDED.ORDER_DATE_KEY,
+    ORDER_HOUR = EXCLUDED.ORDER_HOUR,
+    ORDER_HOUR_TS = EXCLUDED.ORDER_HOUR_TS,
+    ORDER_15MIN_TS = EXCLUDED.ORDER_15MIN_TS,
+    ORDER_MINUTE_TS = EXCLUDED.ORDER_MINUTE_TS
+"""
+)
+
+# Rebuild the star schema the dashboard reads: integer-keyed dims and a narrow fact table
+con.execute(
+    """
+CREATE OR REPLACE TABLE CURATED_DIM_CITY AS
+WITH all_cities AS (
+    SELECT SHIP_TO_CITY_CD FROM CURATED_DATASET WHERE SHIP_TO_CITY_CD IS NOT NULL
+    UNION
+    SELECT SHIP_TO_CITY_CD FROM TRANSLATIONS_CITY_MAPPING
+)
+SELECT
+    CAST(ROW_NUMBER() OVER (ORDER BY a.SHIP_TO_CITY_CD) AS INTEGER) AS CITY_KEY,
+    a.SHIP_TO_CITY_CD,
+    tc.SHIP_TO_CITY_CD_ENG,
+    tc.PROVINCE,
+    TRY_CAST(REPLACE(tc.PER_CAPITA_USD, ',', '') AS DOUBLE) AS PER_CAPITA_USD,
+    TRY_CAST(tc.TOTAL_GDP_USD AS DOUBLE) AS TOTAL_GDP_USD,
+    tc.SHIP_TO_CITY_CD IS NOT NULL AS IS_TRANSLATED
+FROM all_cities a
+LEFT JOIN TRANSLATIONS_CITY_MAPPING tc ON a.SHIP_TO_CITY_CD = tc.SHIP_TO_CITY_CD;
+
+CREATE OR REPLACE TABLE CURATED_DIM_DISTRICT AS
+WITH all_districts AS (
+    SELECT SHIP_TO_DISTRICT_NAME FROM CURATED_DATASET WHERE SHIP_TO_DISTRICT_NAME IS NOT NULL
+    UNION
+    SELECT SHIP_TO_DISTRICT_NAME FROM TRANSLATIONS_DISTRICT_MAPPING
+)
+SELECT
+    CAST(ROW_NUMBER() OVER (ORDER BY a.SHIP_TO_DISTRICT_NAME) AS INTEGER) AS DISTRICT_KEY,
+    a.SHIP_TO_DISTRICT_NAME,
+    td.SHIP_TO_DISTRICT_NAME_ENG,
+    td.SHIP_TO_DISTRICT_NAME IS NOT NULL AS IS_TRANSLATED
+FROM all_districts a
+LEFT JOIN TRANSLATIONS_DISTRICT_MAPPING td ON a.SHIP_TO_DISTRICT_NAME = td.SHIP_TO_DISTRICT_NAME;
+
+CREATE OR REPLACE TABLE CURATED_FACT_ORDERS AS
+SELECT
+    c.ORDER_ID,
+    CAST(c.ORDER_TIME_PST AS INTEGER) AS ORDER_TIME_PST,
+    dc.CITY_KEY,
+    dd.DISTRICT_KEY,
+    c.RMB_DOLLARS,
+    CAST(c.ORDER_QTY AS INTEGER) AS ORDER_QTY,
+    c.PARTITION_DATE,
+    c.PARTITION_WINDOW,
+    c.ORDER_TS,
+    c.ORDER_DATE_KEY,
+    c.ORDER_HOUR,
+    c.ORDER_HOUR_TS,
+    c.ORDER_15MIN_TS,
+    c.ORDER_MINUTE_TS
+FROM CURATED_DATASET c
+LEFT JOIN CURATED_DIM_CITY dc ON c.SHIP_TO_CITY_CD = dc.SHIP_TO_CITY_CD
+LEFT JOIN CURATED_DIM_DISTRICT dd ON c.SHIP_TO_DISTRICT_NAME = dd.SHIP_TO_DISTRICT_NAME
+ORDER BY c.PARTITION_DATE, c.PARTITION_WINDOW, c.ORDER_TS;
 """
 )
 
 # Verify by running a SQL query on the DuckDB table
-result_df = con.execute("SELECT * FROM CURATED_DATASET LIMIT 5").fetchdf()
+result_df = fetch_frame(con, "SELECT * FROM CURATED_DATASET LIMIT 5")
 print(result_df)
 
 # Close the DuckDB connection
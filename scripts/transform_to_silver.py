@@ -1,3 +1,18 @@
+"""
+Validates the bronze orders into PROCESSED_DATASET and EXCEPTIONS_DATASET.
+
+Validation runs row by row through the pydantic models, so it is spread over a process pool
+by input partition. Each worker reads its partition of RAW_DATASET_1 and RAW_DATASET_2 from
+its own read-only connection. The results and validation errors of every partition are
+written back in one transaction once all of them are validated.
+
+Usage (from the repo root): python scripts/transform_to_silver.py [--workers N]
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import duckdb
 import pandas as pd
 from pydantic_models.RawDatasets import (
@@ -6,100 +21,176 @@ from pydantic_models.RawDatasets import (
     RawDatasetJSONModel,
     validate_only,
 )
+from data_access import fetch_frame
 from constants import DUCKDB_FILE_PATH
 
+PARTITION_FILTER = (
+    "PARTITION_DATE IS NOT DISTINCT FROM ? AND PARTITION_WINDOW IS NOT DISTINCT FROM ?"
+)
 
-# Create a DuckDB connection to a persistent database file
-con = duckdb.connect(database=DUCKDB_FILE_PATH, read_only=False)
-con.execute("SET GLOBAL pandas_analyze_sample=100000000")
 
-# Fetch
-df = con.execute("SELECT * FROM RAW_DATASET_1").fetchdf()
-df_json = con.execute("SELECT * FROM RAW_DATASET_2").fetchdf()
+# Load the RAW_MAPPING references the validators check against, once per worker
+def set_validation_references(raw_mapping_df):
+    RawDatasetExcelModel.raw_mapping_ids = set(
+        raw_mapping_df["CITY_DISTRICT_ID"].tolist()
+    )
+    RawDatasetJSONModel.raw_mapping_city_ids = set(
+        raw_mapping_df["SHIP_TO_CITY_CD"].tolist()
+    )
+    RawDatasetJSONModel.raw_mapping_district_names = set(
+        raw_mapping_df["SHIP_TO_DISTRICT_NAME"].tolist()
+    )
 
-# Fetch CITY_DISTRICT_IDs from RAW_MAPPING table
-raw_mapping_df = con.execute(
-    "SELECT CITY_DISTRICT_ID, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME FROM RAW_MAPPING"
-).fetchdf()
 
-RawDatasetExcelModel.raw_mapping_ids = set(raw_mapping_df["CITY_DISTRICT_ID"].tolist())
-RawDatasetJSONModel.raw_mapping_city_ids = set(
-    raw_mapping_df["SHIP_TO_CITY_CD"].tolist()
-)
-RawDatasetJSONModel.raw_mapping_district_names = set(
-    raw_mapping_df["SHIP_TO_DISTRICT_NAME"].tolist()
-)
-# Validate the data and replace invalid values with NaN
-df_cleaned, validation_errors = validate_and_replace(df)
+def validate_partition(partition_date, partition_window):
+    """
+    Validates one input partition of both bronze order tables.
+
+    Args:
+        partition_date (datetime.date): The partition date.
+        partition_window (str): The partition window.
+
+    Returns:
+        tuple: The cleaned RAW_DATASET_1 rows, the RAW_DATASET_2 rows and the validation errors.
+    """
+    # Read-only connections of several processes can share the file
+    con = duckdb.connect(database=DUCKDB_FILE_PATH, read_only=True)
+    parameters = [partition_date, partition_window]
+    df = fetch_frame(
+        con, f"SELECT * FROM RAW_DATASET_1 WHERE {PARTITION_FILTER}", parameters
+    )
+    df_json = fetch_frame(
+        con, f"SELECT * FROM RAW_DATASET_2 WHERE {PARTITION_FILTER}", parameters
+    )
+    con.close()
 
-df_json, validation_errors_2 = validate_only(df_json)
+    # Validate the data and replace invalid values with NaN
+    df_cleaned, validation_errors = validate_and_replace(df)
+    df_json, validation_errors_2 = validate_only(df_json)
+    return df_cleaned, df_json, validation_errors + validation_errors_2
 
-# Perform the left join with raw_mapping_df to add SHIP_TO_CITY_CD and SHIP_TO_DISTRICT_NAME columns
-df_merged = pd.merge(df_cleaned, raw_mapping_df, on="CITY_DISTRICT_ID", how="left")
 
-# Drop the CITY_DISTRICT_ID column from df_merged
-df_merged.drop(columns=["CITY_DISTRICT_ID"], inplace=True)
+def main(max_workers=None):
+    # Only read here, so the workers can open the file while the partitions are listed
+    con = duckdb.connect(database=DUCKDB_FILE_PATH, read_only=True)
+    partitions = con.execute(
+        """
+        SELECT PARTITION_DATE, PARTITION_WINDOW FROM RAW_DATASET_1
+        UNION
+        SELECT PARTITION_DATE, PARTITION_WINDOW FROM RAW_DATASET_2
+        ORDER BY ALL
+        """
+    ).fetchall()
 
-# Register the cleaned and merged DataFrame as a DuckDB table
-con.register("df_merged", df_merged)
+    # Fetch CITY_DISTRICT_IDs from RAW_MAPPING table
+    raw_mapping_df = fetch_frame(
+        con,
+        "SELECT CITY_DISTRICT_ID, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME FROM RAW_MAPPING",
+    )
+    con.close()
 
-# Create and insert data into the PROCESSED_DATASET table with upsert
-# Insert data into the table
-con.execute(
-    """
-    INSERT INTO PROCESSED_DATASET (
-        ORDER_ID, ORDER_TIME_PST, RPTG_AMT, CURRENCY_CD, ORDER_QTY, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME
+    if not partitions:
+        print("No orders in RAW_DATASET_1 or RAW_DATASET_2")
+        return
+    max_workers = min(max_workers or os.cpu_count(), len(partitions))
+    print(f"Validating {len(partitions)} partitions on {max_workers} processes")
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=set_validation_references,
+        initargs=(raw_mapping_df,),
+    ) as executor:
+        results = list(executor.map(validate_partition, *zip(*partitions)))
+
+    df_cleaned = pd.concat([result[0] for result in results], ignore_index=True)
+    df_json = pd.concat([result[1] for result in results], ignore_index=True)
+    validation_errors = [error for result in results for error in result[2]]
+
+    # Perform the left join with raw_mapping_df to add SHIP_TO_CITY_CD and SHIP_TO_DISTRICT_NAME columns
+    df_merged = pd.merge(df_cleaned, raw_mapping_df, on="CITY_DISTRICT_ID", how="left")
+
+    # Drop the CITY_DISTRICT_ID column from df_merged
+    df_merged.drop(columns=["CITY_DISTRICT_ID"], inplace=True)
+
+    # Convert validation errors to a DataFrame
+    errors_df = pd.DataFrame(validation_errors)
+
+    con = duckdb.connect(database=DUCKDB_FILE_PATH, read_only=False)
+    con.execute("SET GLOBAL pandas_analyze_sample=100000000")
+
+    # Register the cleaned and merged DataFrames as DuckDB tables
+    con.register("df_merged", df_merged)
+    con.register("df_json", df_json)
+    con.register("errors_df", errors_df)
+
+    # Write the orders and the exceptions of all partitions together
+    con.execute("BEGIN TRANSACTION")
+
+    # Create and insert data into the PROCESSED_DATASET table with upsert
+    con.execute(
+        """
+        INSERT INTO PROCESSED_DATASET (
+            ORDER_ID, ORDER_TIME_PST, RPTG_AMT, CURRENCY_CD, ORDER_QTY, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME, PARTITION_DATE, PARTITION_WINDOW
+        )
+        SELECT ORDER_ID, ORDER_TIME_PST, RPTG_AMT, CURRENCY_CD, ORDER_QTY, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME, PARTITION_DATE, PARTITION_WINDOW
+        FROM (
+            SELECT ORDER_ID, ORDER_TIME_PST, RPTG_AMT, CURRENCY_CD, ORDER_QTY, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME, PARTITION_DATE, PARTITION_WINDOW FROM df_merged
+            UNION ALL
+            SELECT ORDER_ID, ORDER_TIME_PST, RPTG_AMT, CURRENCY_CD, ORDER_QTY, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME, PARTITION_DATE, PARTITION_WINDOW FROM df_json
+        )
+        ON CONFLICT(ORDER_ID) DO UPDATE SET
+            ORDER_TIME_PST = EXCLUDED.ORDER_TIME_PST,
+            RPTG_AMT = EXCLUDED.RPTG_AMT,
+            CURRENCY_CD = EXCLUDED.CURRENCY_CD,
+            ORDER_QTY = EXCLUDED.ORDER_QTY,
+            SHIP_TO_CITY_CD = EXCLUDED.SHIP_TO_CITY_CD,
+            SHIP_TO_DISTRICT_NAME = EXCLUDED.SHIP_TO_DISTRICT_NAME,
+            PARTITION_DATE = EXCLUDED.PARTITION_DATE,
+            PARTITION_WINDOW = EXCLUDED.PARTITION_WINDOW
+        """
     )
-    SELECT ORDER_ID, ORDER_TIME_PST, RPTG_AMT, CURRENCY_CD, ORDER_QTY, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME
-    FROM (
-        SELECT ORDER_ID, ORDER_TIME_PST, RPTG_AMT, CURRENCY_CD, ORDER_QTY, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME FROM df_merged
-        UNION ALL
-        SELECT ORDER_ID, ORDER_TIME_PST, RPTG_AMT, CURRENCY_CD, ORDER_QTY, SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME FROM df_json
+
+    # Load errors into EXCEPTIONS_DATASET table
+    con.execute("DROP TABLE IF EXISTS EXCEPTIONS_DATASET")
+    con.execute(
+        """
+        CREATE TABLE EXCEPTIONS_DATASET (
+            ORDER_ID VARCHAR,
+            ERROR_MESSAGE VARCHAR
+        )
+        """
     )
-    ON CONFLICT(ORDER_ID) DO UPDATE SET
-        ORDER_TIME_PST = EXCLUDED.ORDER_TIME_PST,
-        RPTG_AMT = EXCLUDED.RPTG_AMT,
-        CURRENCY_CD = EXCLUDED.CURRENCY_CD,
-        ORDER_QTY = EXCLUDED.ORDER_QTY,
-        SHIP_TO_CITY_CD = EXCLUDED.SHIP_TO_CITY_CD,
-        SHIP_TO_DISTRICT_NAME = EXCLUDED.SHIP_TO_DISTRICT_NAME
-    """
-)
+    con.execute(
+        """
+        INSERT INTO EXCEPTIONS_DATASET
+        SELECT ORDER_ID, json_group_array(errors) AS ERROR_MESSAGE
+        FROM errors_df
+        GROUP BY ORDER_ID
+        """
+    )
+    con.execute("COMMIT")
 
-# Convert validation errors to a DataFrame
-errors_df = pd.concat(
-    [pd.DataFrame(validation_errors), pd.DataFrame(validation_errors_2)]
-)
+    # Verify by running a SQL query on the PROCESSED_DATASET table
+    result_df = fetch_frame(con, "SELECT * FROM PROCESSED_DATASET LIMIT 5")
+    errors_df = fetch_frame(con, "SELECT * FROM EXCEPTIONS_DATASET LIMIT 5")
 
-# Load errors into EXCEPTIONS_DATASET table
-con.execute("DROP TABLE IF EXISTS EXCEPTIONS_DATASET")
-con.execute(
-    """
-CREATE TABLE EXCEPTIONS_DATASET (
-    ORDER_ID VARCHAR,
-    ERROR_MESSAGE VARCHAR
-)
-"""
-)
-con.register("errors_df", errors_df)
-con.execute(
-    """
-INSERT INTO EXCEPTIONS_DATASET
-SELECT ORDER_ID, json_group_array(errors) AS ERROR_MESSAGE
-FROM errors_df
-GROUP BY ORDER_ID
-"""
-)
+    # Print the result
+    print("Cleaned data from PROCESSED_DATASET table in DuckDB:")
+    print(result_df)
+    print("Error data from EXCEPTIONS_DATASET table in DuckDB:")
+    print(errors_df)
 
-# Verify by running a SQL query on the PROCESSED_DATASET table
-result_df = con.execute("SELECT * FROM PROCESSED_DATASET LIMIT 5").fetchdf()
-errors_df = con.execute("SELECT * FROM EXCEPTIONS_DATASET LIMIT 5").fetchdf()
+    # Close the DuckDB connection
+    con.close()
 
-# Print the result
-print("Cleaned data from PROCESSED_DATASET table in DuckDB:")
-print(result_df)
-print("Error data from EXCEPTIONS_DATASET table in DuckDB:")
-print(errors_df)
 
-# Close the DuckDB connection
-con.close()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Validate the bronze orders into PROCESSED_DATASET"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="validation processes, the CPU count by default",
+    )
+    args = parser.parse_args()
+    main(max_workers=args.workers)
@@ -0,0 +1,157 @@
+"""
+Picks the identifiers the translation scrapers fetch.
+
+A full run fetches every city or district seen in RAW_DATASET_2, RAW_MAPPING and
+CURATED_DATASET. A delta run skips the identifiers already translated, either in the
+TRANSLATIONS_* tables or in the JSON output of an earlier scrape that has not been loaded
+yet, and the ones logged as errors. Both fetch in descending order of CURATED_DATASET spend,
+so the most valuable translations land first and a run can be cut short with a limit.
+"""
+
+import json
+import os
+
+TRANSLATION_TABLES = {
+    "SHIP_TO_CITY_CD": "TRANSLATIONS_CITY_MAPPING",
+    "SHIP_TO_DISTRICT_NAME": "TRANSLATIONS_DISTRICT_MAPPING",
+}
+
+
+def relation_exists(con, name):
+    (count,) = con.execute(
+        """
+        SELECT COUNT(*) FROM (
+            SELECT table_name AS name FROM duckdb_tables()
+            UNION ALL
+            SELECT view_name AS name FROM duckdb_views()
+        )
+        WHERE lower(name) = lower(?)
+        """,
+        [name],
+    ).fetchone()
+    return count > 0
+
+
+def read_json_records(filename):
+    """
+    Reads a scraper output or error log. A file left open by an interrupted run, still
+    ending in a comma, is read up to its last complete record.
+
+    Args:
+        filename (str): The JSON file.
+
+    Returns:
+        list: The records, empty when the file does not exist.
+    """
+    if not os.path.exists(filename):
+        return []
+    with open(filename, encoding="utf-8") as json_file:
+        text = json_file.read().strip()
+    if not text:
+        return []
+    if not text.endswith("]"):
+        text = text.rstrip(",") + "\n]"
+    return json.loads(text)
+
+
+def reopen_json_file(filename):
+    """
+    Prepares a JSON array file for appending, the counterpart of finalize_json_file.
+    Records are appended after the existing ones instead of replacing them.
+
+    Args:
+        filename (str): The JSON file.
+    """
+    records = read_json_records(filename)
+    with open(filename, "w", encoding="utf-8") as json_file:
+        json_file.write("[\n")
+        for record in records:
+            json.dump(record, json_file, ensure_ascii=False, indent=4)
+            json_file.write(",\n")
+
+
+def logged_identifiers(identifier_type, output_filename, error_filename):
+    """
+    Lists the identifiers an earlier scrape already translated or failed on.
+
+    Args:
+        identifier_type (str): SHIP_TO_CITY_CD or SHIP_TO_DISTRICT_NAME.
+        output_filename (str): The scraper's JSON output.
+        error_filename (str): The scraper's JSON error log.
+
+    Returns:
+        set: The identifiers.
+    """
+    identifiers = {
+        record[identifier_type]
+        for record in read_json_records(output_filename)
+        if identifier_type in record
+    }
+    # Error records map the identifier to its error message
+    for record in read_json_records(error_filename):
+        identifiers.update(record)
+    return identifiers
+
+
+def pending_identifiers(con, identifier_type, skip=(), delta=False, limit=None):
+    """
+    Lists the identifiers to fetch, highest CURATED_DATASET spend first. Identifiers
+    without orders, e.g. mapping-only districts, come last.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The DuckDB connection.
+        identifier_type (str): SHIP_TO_CITY_CD or SHIP_TO_DISTRICT_NAME.
+        skip (Iterable): Identifiers to leave out, in delta mode.
+        delta (bool): Leave out translated and skipped identifiers.
+        limit (int): Fetch at most this many identifiers.
+
+    Returns:
+        list: (identifier, spend) tuples.
+    """
+    sources = ["RAW_DATASET_2", "RAW_MAPPING"]
+    has_curated = relation_exists(con, "CURATED_DATASET")
+    if has_curated:
+        # Archived order partitions are only left in CURATED_DATASET
+        sources.append("CURATED_DATASET")
+    identifiers = " UNION ".join(
+        f"SELECT {identifier_type} AS IDENTIFIER FROM {source}" for source in sources
+    )
+    spend = (
+        f"""
+        SELECT {identifier_type} AS IDENTIFIER, SUM(RMB_DOLLARS) AS SPEND
+        FROM CURATED_DATASET
+        GROUP BY {identifier_type}
+        """
+        if has_curated
+        else "SELECT NULL AS IDENTIFIER, NULL AS SPEND"
+    )
+
+    filters = ["i.IDENTIFIER IS NOT NULL"]
+    parameters = []
+    if delta:
+        translation_table = TRANSLATION_TABLES[identifier_type]
+        if relation_exists(con, translation_table):
+            filters.append(
+                f"""
+                NOT EXISTS (
+                    SELECT 1 FROM {translation_table} t
+                    WHERE t.{identifier_type} = i.IDENTIFIER
+                )
+                """
+            )
+        filters.append("NOT list_contains(CAST(? AS VARCHAR[]), i.IDENTIFIER)")
+        parameters.append(sorted(skip))
+
+    return con.execute(
+        f"""
+        WITH identifiers AS ({identifiers}),
+        spend AS ({spend})
+        SELECT i.IDENTIFIER, s.SPEND
+        FROM identifiers i
+        LEFT JOIN spend s ON i.IDENTIFIER = s.IDENTIFIER
+        WHERE {" AND ".join(filters)}
+        ORDER BY s.SPEND DESC NULLS LAST, i.IDENTIFIER
+        {f"LIMIT {int(limit)}" if limit else ""}
+        """,
+        parameters,
+    ).fetchall()
@@ -0,0 +1,330 @@
+"""
+Read-only HTTP API over the dashboard's aggregates, for consumers that should not open the
+warehouse file themselves.
+
+    GET /metrics                  index of metrics and the current data version
+    GET /metrics/<name>           one metric as JSON
+    GET /metrics/<name>?format=arrow, or Accept: application/vnd.apache.arrow.stream
+                                  the same rows as an Arrow IPC stream
+    GET /metrics/<name>?province=<PROVINCE>
+                                  an order aggregate over one province's orders, read from
+                                  its province shard only
+
+Responses carry the data version as their ETag, so a client sending it back in
+If-None-Match gets a 304 until the pipeline writes again, and are gzipped when the client
+accepts it. Results are read from the pipeline's precomputed chart data when it is current,
+then from the province shards when the pipeline writes them, otherwise from a read-only
+warehouse connection opened for the request.
+
+Run from the repo root (or /app in the container): python visualization/api.py
+"""
+
+import gzip
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+import duckdb
+import pyarrow as pa
+
+from chart_data import get_data_version, chart_data_file
+from data_access import fetch_arrow
+from shards import shard_manifest, fan_out
+from constants import (
+    DUCKDB_FILE_PATH,
+    METRICS_API_HOST,
+    METRICS_API_PORT,
+    METRICS_API_WORKERS,
+    METRICS_API_CACHE_SIZE,
+    METRICS_API_GZIP_MIN_BYTES,
+    SHARD_QUERY_WORKERS,
+)
+from queries import DASHBOARD_QUERIES, SHARDED_QUERIES
+
+# Public metric name -> dashboard query it is served from
+METRICS = {
+    "province_spending": "AGG_PROVINCE_SPENDING",
+    "top_provinces": "AGG_TOP_10_PROVINCE_SPENDING",
+    "top_cities": "AGG_TOP_10_CITIES_SPENDING",
+    "top_transactions": "ALL_TOP_10_TRANSACTIONS",
+    "hourly_sales": "AGG_TOTAL_SPEND_PER_HOUR",
+    "top_city_per_hour": "RANKED_TOP_CITY_PER_HOUR",
+    "top_city_hours": "RANKED_TOP_10_CITY_HOUR_PAIR",
+    "district_averages": "RANKED_TOP_10_CITIES_HIGHEST_DISTRICT_AVG",
+    "district_medians": "RANKED_TOP_10_CITIES_HIGHEST_DISTRICT_MEDIAN",
+    "spend_vs_gdp": "CORR_TOTAL_SPEND_GDP_PER_CAPITA",
+    "cluster_tiers": "ALL_CITY_CLUSTER_RESULTS",
+}
+
+JSON_TYPE = "application/json"
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+FORMATS = {"json": JSON_TYPE, "arrow": ARROW_TYPE}
+
+
+class ShardsUnavailable(Exception):
+    """The pipeline has not written province shards of the current warehouse version."""
+
+
+class Warehouse:
+    """
+    The dashboard queries behind the metrics, shared by the worker threads. Each warehouse
+    query opens its own short-lived read-only connection: a held handle keeps a lock on the
+    file that blocks the pipeline's writers, and does not see their writes. Rendered
+    metrics are cached by data version, so this only happens on a cache miss.
+    """
+
+    def __init__(self):
+        self._chart_data = duckdb.connect()
+        self._shard_executor = ThreadPoolExecutor(
+            SHARD_QUERY_WORKERS, thread_name_prefix="shards"
+        )
+
+    def connect(self):
+        return duckdb.connect(DUCKDB_FILE_PATH, read_only=True)
+
+    def fetch(self, query_name, data_version, province=None):
+        """
+        Runs a dashboard query, from the precomputed chart data when it is current.
+
+        Args:
+            query_name (str): The dashboard query.
+            data_version (str): The warehouse version.
+            province (str): Only aggregate this province's orders, from its shard.
+
+        Returns:
+            pyarrow.Table: The query result.
+
+        Raises:
+            ShardsUnavailable: When a province is given and there are no current shards.
+        """
+        if province is not None:
+            manifest = shard_manifest(data_version)
+            if manifest is None:
+                raise ShardsUnavailable()
+            return fan_out(
+                self._chart_data,
+                self._shard_executor,
+                SHARDED_QUERIES[query_name],
+                manifest,
+                provinces=(province,),
+            )
+        chart_file = chart_data_file(query_name, data_version)
+        if chart_file:
+            with self._chart_data.cursor() as cursor:
+                return fetch_arrow(
+                    cursor, "SELECT * FROM read_parquet(?)", [chart_file]
+                )
+        manifest = (
+            shard_manifest(data_version) if query_name in SHARDED_QUERIES else None
+        )
+        if manifest:
+            return fan_out(
+                self._chart_data,
+                self._shard_executor,
+                SHARDED_QUERIES[query_name],
+                manifest,
+            )
+        with self.connect() as connection:
+            return fetch_arrow(connection, DASHBOARD_QUERIES[query_name])
+
+
+WAREHOUSE = Warehouse()
+
+
+def json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode(table, fmt, metric, data_version, province=None):
+    if fmt == "arrow":
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+    document = {
+        "metric": metric,
+        "data_version": data_version,
+        "province": province,
+        "rows": table.to_pylist(),
+    }
+    return json.dumps(document, default=json_value, ensure_ascii=False).encode()
+
+
+# Encoded bodies are shared by all clients and keyed by data version, so each metric is
+# queried and encoded once per pipeline write and format. The compressed body is cached
+# separately, clients that do not accept gzip never pay for compressing it.
+@lru_cache(maxsize=METRICS_API_CACHE_SIZE)
+def render(metric, fmt, data_version, province=None):
+    return encode(
+        WAREHOUSE.fetch(METRICS[metric], data_version, province),
+        fmt,
+        metric,
+        data_version,
+        province,
+    )
+
+
+@lru_cache(maxsize=METRICS_API_CACHE_SIZE)
+def render_gzip(metric, fmt, data_version, province=None):
+    return gzip.compress(render(metric, fmt, data_version, province), compresslevel=6)
+
+
+def render_index(data_version):
+    document = {
+        "data_version": data_version,
+        "metrics": sorted(METRICS),
+        "province_metrics": sorted(
+            metric for metric, name in METRICS.items() if name in SHARDED_QUERIES
+        ),
+        "formats": sorted(FORMATS),
+    }
+    return json.dumps(document).encode()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    server_version = "MetricsAPI/1.0"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        if not parts or parts[0] != "metrics" or len(parts) > 2:
+            return self.send_error(HTTPStatus.NOT_FOUND, "Try /metrics")
+        try:
+            data_version = get_data_version()
+        except FileNotFoundError:
+            return self.send_error(HTTPStatus.SERVICE_UNAVAILABLE, "No warehouse yet")
+
+        if len(parts) == 1:
+            etag = f'W/"{data_version}-index"'
+            if not self.is_modified(etag):
+                return
+            return self.send_body(render_index(data_version), JSON_TYPE, etag)
+
+        metric = parts[1]
+        if metric not in METRICS:
+            return self.send_error(HTTPStatus.NOT_FOUND, f"Unknown metric {metric}")
+        query = parse_qs(url.query)
+        fmt = self.negotiate_format(query.get("format", [None])[0])
+        if fmt is None:
+            return self.send_error(
+                HTTPStatus.NOT_ACCEPTABLE, "Formats are json and arrow"
+            )
+        province = query.get("province", [None])[0]
+        if province is not None and METRICS[metric] not in SHARDED_QUERIES:
+            return self.send_error(
+                HTTPStatus.BAD_REQUEST, f"{metric} has no province filter"
+            )
+
+        # Weak ETags, as gzipped and identity bodies of a format are the same representation
+        etag = f'W/"{data_version}-{fmt}"'
+        if province is not None:
+            etag = f'W/"{data_version}-{fmt}-{quote(province)}"'
+        if not self.is_modified(etag):
+            return
+
+        try:
+            body = render(metric, fmt, data_version, province)
+        except ShardsUnavailable:
+            return self.send_error(
+                HTTPStatus.SERVICE_UNAVAILABLE, "No province shards of this version"
+            )
+        except duckdb.Error as error:
+            # Most likely the pipeline holds the warehouse write lock, clients should retry
+            self.log_error("metric %s failed: %s", metric, error)
+            return self.send_error(HTTPStatus.SERVICE_UNAVAILABLE, "Warehouse busy")
+        accepts_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+        gzipped = accepts_gzip and len(body) >= METRICS_API_GZIP_MIN_BYTES
+        if gzipped:
+            body = render_gzip(metric, fmt, data_version, province)
+        self.send_body(body, FORMATS[fmt], etag, gzipped)
+
+    def is_modified(self, etag):
+        """
+        Answers 304 Not Modified when the client already has this representation.
+
+        Returns:
+            bool: Whether the response body still has to be sent.
+        """
+        if etag not in self.headers.get("If-None-Match", ""):
+            return True
+        self.send_response(HTTPStatus.NOT_MODIFIED)
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept, Accept-Encoding")
+        self.end_headers()
+        return False
+
+    def negotiate_format(self, requested):
+        if requested is not None:
+            return requested if requested in FORMATS else None
+        return "arrow" if ARROW_TYPE in self.headers.get("Accept", "") else "json"
+
+    def send_body(self, body, content_type, etag, gzipped=False):
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept, Accept-Encoding")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_request(self, code="-", size="-"):
+        # Access logs would dominate the cost of a cached response, errors are still logged
+        pass
+
+
+class PooledHTTPServer(HTTPServer):
+    """
+    Serves requests on a fixed pool of worker threads, unlike ThreadingHTTPServer which
+    starts a thread per request. The pool bounds the concurrent DuckDB cursors.
+    """
+
+    # Connections wait in the listen backlog while every worker is busy
+    request_queue_size = 128
+
+    def __init__(self, address, handler, workers):
+        super().__init__(address, handler)
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="metrics-api")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    server = PooledHTTPServer(
+        (METRICS_API_HOST, METRICS_API_PORT), MetricsHandler, METRICS_API_WORKERS
+    )
+    print(
+        f"Serving metrics on {METRICS_API_HOST}:{METRICS_API_PORT} "
+        f"with {METRICS_API_WORKERS} workers"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,30 @@
+import json
+import os
+from constants import DUCKDB_FILE_PATH, CHART_DATA_DIR
+
+# Shared by the dashboard and the metrics API, so neither has to import the other
+
+
+def get_data_version():
+    """
+    Identifies the current warehouse contents. Every pipeline write changes the
+    file's mtime or size, which moves all cached query results and figures to a new key.
+    """
+    stat = os.stat(DUCKDB_FILE_PATH)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def chart_data_file(name, data_version):
+    """
+    Finds the pipeline's precomputed result of a dashboard query by name. Returns None when
+    there is none, or when it was computed from a different warehouse version than data_version.
+    """
+    try:
+        with open(os.path.join(CHART_DATA_DIR, "latest.json")) as latest_file:
+            latest = json.load(latest_file)
+    except FileNotFoundError:
+        return None
+    chart = latest["charts"].get(name)
+    if chart is None or latest["warehouse_version"] != data_version:
+        return None
+    return os.path.join(CHART_DATA_DIR, latest["version"], chart["file"])
@@ -1,2 +1,28 @@
+import os
+
 DUCKDB_FILE_PATH = "data/output/datawarehouse.duckdb"
+# Chart data precomputed by the pipeline's dashboard_chart_data asset
+CHART_DATA_DIR = "data/output/chart_data"
+# Province shards of the gold facts, written by the pipeline when PROVINCE_SHARDS=1, and the
+# threads a query fans out over them on
+PROVINCE_SHARDS_DIR = "data/output/province_shards"
+SHARD_QUERY_WORKERS = int(os.getenv("SHARD_QUERY_WORKERS", "8"))
 GEOJSON_FILE_PATH = "data/static/geojson/province_geojson.json"
+# Province outlines are simplified to this tolerance (degrees) once per server process
+GEOJSON_SIMPLIFY_TOLERANCE = 0.02
+# Number of data versions to keep cached figures for
+FIGURE_CACHE_MAX_VERSIONS = 2
+# Dashboard filter combinations to keep cached query results and figures for, per data version
+FILTER_CACHE_MAX_COMBINATIONS = 16
+# Approximate mode: the share of orders in CURATED_FACT_ORDERS_SAMPLE (the dbt
+# approx_sample_percent var), and the z-score of the confidence interval shown next to
+# approximate numbers
+APPROX_SAMPLE_PERCENT = 10
+APPROX_CONFIDENCE_Z = 1.96
+# Read-only metrics API (api.py): bind address, worker threads and encoded responses kept in memory
+METRICS_API_HOST = os.getenv("METRICS_API_HOST", "0.0.0.0")
+METRICS_API_PORT = int(os.getenv("METRICS_API_PORT", "8502"))
+METRICS_API_WORKERS = int(os.getenv("METRICS_API_WORKERS", "8"))
+METRICS_API_CACHE_SIZE = 128
+# Responses smaller than this are not worth gzipping
+METRICS_API_GZIP_MIN_BYTES = 512
@@ -0,0 +1,26 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Query results are fetched as Arrow tables. The metrics API serves them as is and the
+# dashboard converts them to pandas for Plotly, which is the only conversion they go through.
+
+
+def fetch_arrow(cursor, query, parameters=None):
+    """
+    Runs a query on a DuckDB cursor and returns the result as an Arrow table.
+    """
+    return cursor.execute(query, parameters).fetch_arrow_table()
+
+
+def to_frame(table):
+    """
+    Converts an Arrow table to the DataFrame fetchdf() would return: DECIMAL columns become
+    float64 and strings Python objects. Plotly 5 cannot serialize the pd.NA of Arrow-backed
+    string columns, so those are not used for figures.
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type):
+            table = table.set_column(
+                i, field.name, pc.cast(table.column(i), pa.float64())
+            )
+    return table.to_pandas(date_as_object=False, split_blocks=True)
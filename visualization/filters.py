@@ -0,0 +1,110 @@
+from collections import namedtuple
+
+from queries import CITIES_SOURCE, ORDERS_SOURCE
+
+# The dashboard's global filters. Filter values are only ever bound as query parameters:
+# the SQL of a filtered query depends on which filters are set and how many values each
+# has, never on the values, so DuckDB binds them as constants. That lets the date and
+# window predicates reach the table and Parquet scans as filters, which skip row groups
+# and archived partitions, instead of being evaluated on every order.
+#
+# A filter left unset is None or an empty tuple. Filters are a tuple of hashable values so
+# that each combination is its own entry in the dashboard's caches.
+Filters = namedtuple(
+    "Filters",
+    ["start_date", "end_date", "windows", "provinces", "city_tiers"],
+    defaults=(None, None, (), (), ()),
+)
+
+NO_FILTERS = Filters()
+
+
+def is_filtered(filters):
+    return filters != NO_FILTERS
+
+
+def is_partition_filtered(filters):
+    return (
+        filters.start_date is not None
+        or filters.end_date is not None
+        or bool(filters.windows)
+    )
+
+
+# Provinces and city tiers are the only filters that apply to cities
+def city_filters(filters):
+    return Filters(provinces=filters.provinces, city_tiers=filters.city_tiers)
+
+
+def placeholders(values):
+    return ", ".join("?" for _ in values)
+
+
+def filter_predicate(filters):
+    """
+    Builds the WHERE clause of the orders a set of filters selects, over the columns of a
+    province shard.
+
+    Args:
+        filters (Filters): The filters.
+
+    Returns:
+        tuple: The predicate and its parameters.
+    """
+    clauses, parameters = [], []
+    if filters.start_date is not None:
+        clauses.append("PARTITION_DATE >= ?")
+        parameters.append(filters.start_date)
+    if filters.end_date is not None:
+        clauses.append("PARTITION_DATE <= ?")
+        parameters.append(filters.end_date)
+    if filters.windows:
+        clauses.append(f"PARTITION_WINDOW IN ({placeholders(filters.windows)})")
+        parameters.extend(filters.windows)
+    if filters.provinces:
+        clauses.append(f"PROVINCE IN ({placeholders(filters.provinces)})")
+        parameters.extend(filters.provinces)
+    if filters.city_tiers:
+        clauses.append(f"CITY_TIER IN ({placeholders(filters.city_tiers)})")
+        parameters.extend(filters.city_tiers)
+    return " AND ".join(clauses) or "true", parameters
+
+
+def filtered_query(sharded_query, filters):
+    """
+    Builds a sharded query over the filtered gold orders, for when there are no current
+    province shards. The partial query runs once, over all of the filtered orders.
+
+    Args:
+        sharded_query (queries.ShardedQuery): The partial and merge queries.
+        filters (Filters): The filters.
+
+    Returns:
+        tuple: The query and its parameters.
+    """
+    predicate, parameters = filter_predicate(filters)
+    query = f"""
+        WITH shard AS (SELECT * FROM ({ORDERS_SOURCE}) WHERE {predicate}),
+        partials AS ({sharded_query.partial})
+        {sharded_query.merge}
+    """
+    return query, parameters
+
+
+def filtered_city_query(query, filters):
+    """
+    Builds a city query over the cities a set of city filters selects.
+
+    Args:
+        query (str): The query, from queries.CITY_QUERIES.
+        filters (Filters): The filters, from city_filters.
+
+    Returns:
+        tuple: The query and its parameters.
+    """
+    predicate, parameters = filter_predicate(filters)
+    query = f"""
+        WITH cities AS (SELECT * FROM ({CITIES_SOURCE}) WHERE {predicate})
+        {query}
+    """
+    return query, parameters
@@ -0,0 +1,112 @@
+def _perpendicular_distance(point, start, end):
+    (x, y), (x1, y1), (x2, y2) = point, start, end
+    dx, dy = x2 - x1, y2 - y1
+    if dx == 0 and dy == 0:
+        return ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+    return abs(dy * x - dx * y + x2 * y1 - y2 * x1) / (dx**2 + dy**2) ** 0.5
+
+
+def simplify_ring(ring, tolerance):
+    """
+    Simplifies a closed polygon ring with the Ramer-Douglas-Peucker algorithm.
+    Falls back to the original ring if simplification would collapse it.
+
+    Args:
+        ring (list): [lon, lat] pairs, first and last point equal.
+        tolerance (float): Max distance in degrees a dropped point may deviate.
+
+    Returns:
+        list: The simplified ring.
+    """
+    if len(ring) < 5:
+        return ring
+    keep = [False] * len(ring)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(ring) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance, index = 0.0, first
+        for i in range(first + 1, last):
+            distance = _perpendicular_distance(ring[i], ring[first], ring[last])
+            if distance > max_distance:
+                max_distance, index = distance, i
+        if max_distance > tolerance:
+            keep[index] = True
+            stack.extend([(first, index), (index, last)])
+    simplified = [point for point, kept in zip(ring, keep) if kept]
+    return simplified if len(simplified) >= 4 else ring
+
+
+def preprocess_geojson(geojson, tolerance, precision=3, id_property="NAME_1"):
+    """
+    Simplifies province geometry once and indexes features by province name.
+    Only the id is kept on each feature, which keeps the serialized figure small.
+
+    Args:
+        geojson (dict): A FeatureCollection of Polygon / MultiPolygon features.
+        tolerance (float): Simplification tolerance in degrees.
+        precision (int): Decimal places to round coordinates to.
+        id_property (str): The property used as the feature id.
+
+    Returns:
+        dict: Feature id to simplified feature, with [min_lon, min_lat, max_lon, max_lat] bounds.
+    """
+    index = {}
+    for feature in geojson["features"]:
+        geometry = feature["geometry"]
+        polygons = (
+            [geometry["coordinates"]]
+            if geometry["type"] == "Polygon"
+            else geometry["coordinates"]
+        )
+        simplified = [
+            [
+                [[round(lon, precision), round(lat, precision)] for lon, lat in ring]
+                for ring in (simplify_ring(ring, tolerance) for ring in polygon)
+            ]
+            for polygon in polygons
+        ]
+        points = [point for polygon in simplified for ring in polygon for point in ring]
+        feature_id = feature["properties"][id_property]
+        index[feature_id] = {
+            "type": "Feature",
+            "id": feature_id,
+            "geometry": {"type": "MultiPolygon", "coordinates": simplified},
+            "bounds": [
+                min(lon for lon, _ in points),
+                min(lat for _, lat in points),
+                max(lon for lon, _ in points),
+                max(lat for _, lat in points),
+            ],
+        }
+    return index
+
+
+def feature_collection(index, feature_ids):
+    """
+    Builds a FeatureCollection from the pre-indexed features that are present in the data,
+    along with the bounds that cover them.
+
+    Args:
+        index (dict): Output of preprocess_geojson.
+        feature_ids (iterable): The feature ids to include.
+
+    Returns:
+        tuple: The FeatureCollection dict and its [min_lon, min_lat, max_lon, max_lat] bounds.
+    """
+    features = [index[i] for i in dict.fromkeys(feature_ids) if i in index]
+    if not features:
+        features = list(index.values())
+    bounds = [
+        min(f["bounds"][0] for f in features),
+        min(f["bounds"][1] for f in features),
+        max(f["bounds"][2] for f in features),
+        max(f["bounds"][3] for f in features),
+    ]
+    geojson = {
+        "type": "FeatureCollection",
+        "features": [
+            {key: f[key] for key in ("type", "id", "geometry")} for f in features
+        ],
+    }
+    return geojson, bounds
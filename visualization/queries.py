@@ -1,17 +1,31 @@
+from collections import namedtuple
+
+from constants import APPROX_CONFIDENCE_Z
+
 AGG_PROVINCE_SPENDING = """
+WITH city_district_spending AS (
+    SELECT
+        CITY_KEY,
+        DISTRICT_KEY,
+        SUM(RMB_DOLLARS) AS total_spending
+    FROM
+        CURATED_FACT_ORDERS
+    GROUP BY
+        CITY_KEY, DISTRICT_KEY
+)
 SELECT 
-    PROVINCE,
-    SUM(RMB_DOLLARS) AS TOTAL_SPENDING,
-    COUNT(DISTINCT c.SHIP_TO_CITY_CD) AS TOTAL_COUNT_OF_CITIES,
-    COUNT(DISTINCT d.SHIP_TO_DISTRICT_NAME) AS TOTAL_COUNT_OF_DISTRICTS
+    c.PROVINCE,
+    SUM(s.total_spending) AS TOTAL_SPENDING,
+    COUNT(DISTINCT s.CITY_KEY) AS TOTAL_COUNT_OF_CITIES,
+    COUNT(DISTINCT d.DISTRICT_KEY) AS TOTAL_COUNT_OF_DISTRICTS
 FROM 
-    TRANSLATIONS_CITY_MAPPING t
+    city_district_spending s
 JOIN
-    CURATED_DATASET c ON t.SHIP_TO_CITY_CD = c.SHIP_TO_CITY_CD
+    CURATED_DIM_CITY c ON s.CITY_KEY = c.CITY_KEY AND c.IS_TRANSLATED
 LEFT JOIN
-    TRANSLATIONS_DISTRICT_MAPPING d ON c.SHIP_TO_DISTRICT_NAME = d.SHIP_TO_DISTRICT_NAME
+    CURATED_DIM_DISTRICT d ON s.DISTRICT_KEY = d.DISTRICT_KEY AND d.IS_TRANSLATED
 GROUP BY 
-    PROVINCE
+    c.PROVINCE
 ORDER BY 
     TOTAL_SPENDING DESC;
 """
@@ -20,211 +34,712 @@ ALL_CITY_MAPPING = """
 -- Exploding METADATA JSON column into separate columns
 SELECT *
 FROM 
-    TRANSLATIONS_CITY_MAPPING
+    CURATED_TRANSLATIONS_CITY_MAPPING
 LIMIT 10;
 """
 AGG_TOP_10_PROVINCE_SPENDING = """
-WITH CityProvinceMapping AS (
-    SELECT
-        SHIP_TO_CITY_CD,
-        PROVINCE
-    FROM
-        TRANSLATIONS_CITY_MAPPING
-),
-CitySales AS (
-    SELECT
-        d.SHIP_TO_CITY_CD,
-        p.PROVINCE,
-        SUM(d.RMB_DOLLARS) AS total_sales
-    FROM
-        CURATED_DATASET d
-    JOIN
-        CityProvinceMapping p ON d.SHIP_TO_CITY_CD = p.SHIP_TO_CITY_CD
-    GROUP BY
-        d.SHIP_TO_CITY_CD,
-        p.PROVINCE
-)
 SELECT
     PROVINCE,
-    SUM(total_sales) AS province_total_sales
+    SCORE AS province_total_sales
 FROM
-    CitySales
-GROUP BY
-    PROVINCE
+    CURATED_LEADERBOARDS
+WHERE
+    BOARD = 'province_spending'
 ORDER BY
-    province_total_sales DESC
-LIMIT 10;
+    LEADERBOARD_RANK;
 """
 PERCENTAGE_OF_VALID_CITY_TRANSLATIONS = """
-WITH unique_cities AS (
-    SELECT DISTINCT SHIP_TO_CITY_CD
-    FROM (
-        SELECT SHIP_TO_CITY_CD FROM RAW_DATASET_2
-        UNION ALL
-        SELECT SHIP_TO_CITY_CD FROM RAW_MAPPING
-    )
-),
-translated_cities AS (
-    SELECT COUNT(*) AS translated_count
-    FROM TRANSLATIONS_CITY_MAPPING
-),
-total_unique_cities AS (
-    SELECT COUNT(*) AS unique_count
-    FROM unique_cities
-)
 SELECT 
-    translated_count,
-    unique_count,
-    (translated_count::FLOAT / unique_count::FLOAT) * 100 AS percentage
+    TRANSLATED_COUNT AS translated_count,
+    UNIQUE_COUNT AS unique_count,
+    PERCENTAGE AS percentage
 FROM
-    translated_cities, total_unique_cities;
+    CURATED_TRANSLATION_COVERAGE
+WHERE
+    DIMENSION = 'city';
 """
 PERCENTAGE_OF_VALID_DISTRICTS_TRANSLATIONS = """
-WITH unique_districts AS (
-    SELECT DISTINCT SHIP_TO_DISTRICT_NAME
-    FROM (
-        SELECT SHIP_TO_DISTRICT_NAME FROM RAW_DATASET_2
-        UNION ALL
-        SELECT SHIP_TO_DISTRICT_NAME FROM RAW_MAPPING
-    )
-),
-translated_districts AS (
-    SELECT COUNT(*) AS translated_count
-    FROM TRANSLATIONS_DISTRICT_MAPPING
-),
-total_unique_districts AS (
-    SELECT COUNT(*) AS unique_count
-    FROM unique_districts
-)
 SELECT 
-    translated_count,
-    unique_count,
-    (translated_count::FLOAT / unique_count::FLOAT) * 100 AS percentage
+    TRANSLATED_COUNT AS translated_count,
+    UNIQUE_COUNT AS unique_count,
+    PERCENTAGE AS percentage
 FROM
-    translated_districts, total_unique_districts;
+    CURATED_TRANSLATION_COVERAGE
+WHERE
+    DIMENSION = 'district';
 """
 AGG_TOP_10_CITIES_SPENDING = """
-SELECT SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG, SUM(RMB_DOLLARS) as total_sales
-FROM CURATED_DATASET
-GROUP BY SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG
-ORDER BY total_sales DESC
-LIMIT 10
+SELECT SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG, SCORE AS total_sales
+FROM CURATED_LEADERBOARDS
+WHERE BOARD = 'city_spending'
+ORDER BY LEADERBOARD_RANK
 """
 AGG_TOP_10_CITIES_TRANSACTION_COUNT = """
 SELECT
     SHIP_TO_CITY_CD,
     SHIP_TO_CITY_CD_ENG,
-    COUNT(*) AS order_count
+    CAST(SCORE AS BIGINT) AS order_count
 FROM
-    CURATED_DATASET
-GROUP BY
-    SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG,
+    CURATED_LEADERBOARDS
+WHERE
+    BOARD = 'city_order_count'
 ORDER BY
-    order_count DESC
-LIMIT 10;
+    LEADERBOARD_RANK;
 """
 ALL_TOP_10_TRANSACTIONS = """
 SELECT
-    *
+    ORDER_ID,
+    ORDER_TIME_PST,
+    SHIP_TO_CITY_CD,
+    SHIP_TO_DISTRICT_NAME,
+    SHIP_TO_DISTRICT_NAME_ENG,
+    SHIP_TO_CITY_CD_ENG,
+    SCORE AS RMB_DOLLARS,
+    ORDER_QTY,
+    ORDER_TS
 FROM
-    CURATED_DATASET
+    CURATED_LEADERBOARDS
+WHERE
+    BOARD = 'transaction'
 ORDER BY
-    RMB_DOLLARS DESC
-LIMIT 10;
-
+    LEADERBOARD_RANK;
 """
 RANKED_TOP_CITY_PER_HOUR = """
 WITH HourlySales AS (
     SELECT
-        SHIP_TO_CITY_CD,
-        ROUND(CAST(ORDER_TIME_PST AS BIGINT) / 10000) AS ORDER_HOUR_PST,
+        CITY_KEY,
+        ORDER_HOUR AS ORDER_HOUR_PST,
         SUM(RMB_DOLLARS) AS total_sales,
-        ROW_NUMBER() OVER (PARTITION BY ROUND(CAST(ORDER_TIME_PST AS BIGINT) / 10000) ORDER BY SUM(RMB_DOLLARS) DESC) AS rank
+        ROW_NUMBER() OVER (PARTITION BY ORDER_HOUR ORDER BY SUM(RMB_DOLLARS) DESC) AS rank
     FROM
-        CURATED_DATASET
+        CURATED_FACT_ORDERS
+    WHERE
+        ORDER_HOUR IS NOT NULL
     GROUP BY
-        SHIP_TO_CITY_CD,
-        ROUND(CAST(ORDER_TIME_PST AS BIGINT) / 10000)
+        CITY_KEY,
+        ORDER_HOUR
 )
 SELECT
-    SHIP_TO_CITY_CD,
-    ORDER_HOUR_PST,
-    total_sales
+    c.SHIP_TO_CITY_CD,
+    h.ORDER_HOUR_PST,
+    h.total_sales
 FROM
-    HourlySales
+    HourlySales h
+LEFT JOIN
+    CURATED_DIM_CITY c ON h.CITY_KEY = c.CITY_KEY
 WHERE
-    rank = 1
+    h.rank = 1
 ORDER BY
-    ORDER_HOUR_PST;
+    h.ORDER_HOUR_PST;
 """
 RANKED_TOP_10_CITY_HOUR_PAIR = """
-SELECT 
-    SHIP_TO_CITY_CD,
-    ROUND(CAST(ORDER_TIME_PST AS BIGINT) / 10000) AS ORDER_HOUR_PST,
-    SUM(RMB_DOLLARS) AS total_sales
-FROM 
-    CURATED_DATASET
-GROUP BY 
+SELECT
     SHIP_TO_CITY_CD,
-    ROUND(CAST(ORDER_TIME_PST AS BIGINT) / 10000)
-ORDER BY 
-    total_sales DESC
-LIMIT 10;
+    ORDER_HOUR AS ORDER_HOUR_PST,
+    SCORE AS total_sales
+FROM
+    CURATED_LEADERBOARDS
+WHERE
+    BOARD = 'city_hour_spending'
+ORDER BY
+    LEADERBOARD_RANK;
 """
 RANKED_TOP_10_CITIES_HIGHEST_DISTRICT_AVG = """
 WITH district_avg AS (
-    SELECT SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG, SHIP_TO_DISTRICT_NAME, SHIP_TO_DISTRICT_NAME_ENG, AVG(RMB_DOLLARS) as avg_sales
-    FROM CURATED_DATASET
-    GROUP BY SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG,SHIP_TO_DISTRICT_NAME, SHIP_TO_DISTRICT_NAME_ENG,
+    SELECT CITY_KEY, DISTRICT_KEY, AVG(RMB_DOLLARS) as avg_sales
+    FROM CURATED_FACT_ORDERS
+    GROUP BY CITY_KEY, DISTRICT_KEY
 ),
 top_districts AS (
-    SELECT SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG, SHIP_TO_DISTRICT_NAME, SHIP_TO_DISTRICT_NAME_ENG, avg_sales
+    SELECT CITY_KEY, DISTRICT_KEY, avg_sales
     FROM (
-        SELECT SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG, SHIP_TO_DISTRICT_NAME, SHIP_TO_DISTRICT_NAME_ENG, avg_sales,
-               ROW_NUMBER() OVER (PARTITION BY SHIP_TO_CITY_CD ORDER BY avg_sales DESC) as rank
+        SELECT CITY_KEY, DISTRICT_KEY, avg_sales,
+               ROW_NUMBER() OVER (PARTITION BY CITY_KEY ORDER BY avg_sales DESC) as rank
         FROM district_avg
     ) ranked
     WHERE rank = 1
+    ORDER BY avg_sales DESC
+    LIMIT 10
 )
-SELECT SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG, SHIP_TO_DISTRICT_NAME, SHIP_TO_DISTRICT_NAME_ENG, avg_sales as top_avg_sales
-FROM top_districts
-ORDER BY top_avg_sales DESC
-LIMIT 10;
+SELECT c.SHIP_TO_CITY_CD, c.SHIP_TO_CITY_CD_ENG, d.SHIP_TO_DISTRICT_NAME, d.SHIP_TO_DISTRICT_NAME_ENG, t.avg_sales as top_avg_sales
+FROM top_districts t
+LEFT JOIN CURATED_DIM_CITY c ON t.CITY_KEY = c.CITY_KEY
+LEFT JOIN CURATED_DIM_DISTRICT d ON t.DISTRICT_KEY = d.DISTRICT_KEY
+ORDER BY top_avg_sales DESC;
 """
 CORR_TOTAL_SPEND_GDP_PER_CAPITA = """
 WITH TotalSpend AS (
     SELECT
-        t.SHIP_TO_CITY_CD,
-        t.SHIP_TO_CITY_CD_ENG,
-        t.PER_CAPITA_USD,
-        t.PROVINCE,
-        SUM(c.RMB_DOLLARS) AS total_spend
+        CITY_KEY,
+        SUM(RMB_DOLLARS) AS total_spend
     FROM
-        TRANSLATIONS_CITY_MAPPING t
-    JOIN
-        CURATED_DATASET c ON t.SHIP_TO_CITY_CD = c.SHIP_TO_CITY_CD
+        CURATED_FACT_ORDERS
     GROUP BY
-        t.SHIP_TO_CITY_CD, t.SHIP_TO_CITY_CD_ENG, t.PER_CAPITA_USD, t.PROVINCE
-    HAVING
-        t.PER_CAPITA_USD IS NOT NULL AND t.PROVINCE IS NOT NULL
+        CITY_KEY
 )
 SELECT
-    SHIP_TO_CITY_CD_ENG,
-    total_spend,
-    CAST(REPLACE(PER_CAPITA_USD, ',', '') AS DOUBLE) AS PER_CAPITA_USD,
-    PROVINCE
+    c.SHIP_TO_CITY_CD_ENG,
+    s.total_spend,
+    c.PER_CAPITA_USD,
+    c.PROVINCE
 FROM
-    TotalSpend
+    TotalSpend s
+JOIN
+    CURATED_DIM_CITY c ON s.CITY_KEY = c.CITY_KEY
+WHERE
+    c.PER_CAPITA_USD IS NOT NULL AND c.PROVINCE IS NOT NULL
 """
 AGG_TOTAL_SPEND_PER_HOUR = """
 SELECT
-    FLOOR(CAST(ORDER_TIME_PST AS BIGINT) / 10000) AS rounded_order_hour,
+    ORDER_HOUR,
     SUM(RMB_DOLLARS) AS total_sales
 FROM
-    CURATED_DATASET
+    CURATED_FACT_ORDERS
+WHERE
+    ORDER_HOUR IS NOT NULL
+GROUP BY
+    ORDER_HOUR
+ORDER BY
+    ORDER_HOUR;
+
+"""
+ALL_CITY_CLUSTER_RESULTS = """
+SELECT
+    *
+FROM
+    CURATED_CITY_CLUSTER_RESULTS;
+"""
+
+# Approximate mode: distinct counts are estimated from the per-partition HyperLogLog
+# registers in CURATED_DISTINCT_SKETCHES, sums are scaled up from the orders sampled into
+# CURATED_FACT_ORDERS_SAMPLE at build time, each divided by its SAMPLE_FRACTION.
+# *_ERROR columns hold the half-width of the confidence interval at APPROX_CONFIDENCE_Z.
+
+APPROX_PROVINCE_SPENDING = f"""
+WITH merged_registers AS (
+    SELECT
+        PROVINCE,
+        DIMENSION,
+        REGISTER_INDEX,
+        MAX(REGISTER_VALUE) AS REGISTER_VALUE,
+        MAX(REGISTER_COUNT) AS m
+    FROM
+        CURATED_DISTINCT_SKETCHES
+    GROUP BY
+        PROVINCE, DIMENSION, REGISTER_INDEX
+),
+register_sums AS (
+    -- Registers that are not stored are empty and contribute 2^0 each
+    SELECT
+        PROVINCE,
+        DIMENSION,
+        MAX(m) AS m,
+        SUM(power(2.0, -REGISTER_VALUE)) + MAX(m) - COUNT(*) AS harmonic_sum,
+        MAX(m) - COUNT(*) AS empty_registers
+    FROM
+        merged_registers
+    GROUP BY
+        PROVINCE, DIMENSION
+),
+distinct_estimates AS (
+    SELECT
+        PROVINCE,
+        DIMENSION,
+        m,
+        CASE
+            WHEN raw_estimate <= 2.5 * m AND empty_registers > 0 THEN m * ln(m / empty_registers)
+            ELSE raw_estimate
+        END AS estimate
+    FROM (
+        SELECT *, (0.7213 / (1 + 1.079 / m)) * m * m / harmonic_sum AS raw_estimate
+        FROM register_sums
+    )
+),
+sampled_spending AS (
+    SELECT
+        c.PROVINCE,
+        SUM(s.RMB_DOLLARS / s.SAMPLE_FRACTION) AS TOTAL_SPENDING,
+        {APPROX_CONFIDENCE_Z} * sqrt(SUM(
+            (1 - s.SAMPLE_FRACTION) / (s.SAMPLE_FRACTION * s.SAMPLE_FRACTION)
+            * s.RMB_DOLLARS * s.RMB_DOLLARS
+        )) AS TOTAL_SPENDING_ERROR
+    FROM
+        CURATED_FACT_ORDERS_SAMPLE s
+    JOIN
+        CURATED_DIM_CITY c ON s.CITY_KEY = c.CITY_KEY AND c.IS_TRANSLATED
+    GROUP BY
+        c.PROVINCE
+)
+SELECT
+    cities.PROVINCE,
+    COALESCE(s.TOTAL_SPENDING, 0) AS TOTAL_SPENDING,
+    COALESCE(s.TOTAL_SPENDING_ERROR, 0) AS TOTAL_SPENDING_ERROR,
+    ROUND(cities.estimate) AS TOTAL_COUNT_OF_CITIES,
+    ROUND({APPROX_CONFIDENCE_Z} * 1.04 / sqrt(cities.m) * cities.estimate, 1) AS TOTAL_COUNT_OF_CITIES_ERROR,
+    ROUND(COALESCE(districts.estimate, 0)) AS TOTAL_COUNT_OF_DISTRICTS,
+    ROUND(COALESCE({APPROX_CONFIDENCE_Z} * 1.04 / sqrt(districts.m) * districts.estimate, 0), 1) AS TOTAL_COUNT_OF_DISTRICTS_ERROR
+FROM
+    distinct_estimates cities
+LEFT JOIN
+    distinct_estimates districts
+    ON cities.PROVINCE IS NOT DISTINCT FROM districts.PROVINCE AND districts.DIMENSION = 'district'
+LEFT JOIN
+    sampled_spending s ON cities.PROVINCE IS NOT DISTINCT FROM s.PROVINCE
+WHERE
+    cities.DIMENSION = 'city'
+ORDER BY
+    TOTAL_SPENDING DESC;
+"""
+
+APPROX_TOTAL_SPEND_PER_HOUR = f"""
+SELECT
+    ORDER_HOUR,
+    SUM(RMB_DOLLARS / SAMPLE_FRACTION) AS total_sales,
+    {APPROX_CONFIDENCE_Z} * sqrt(SUM(
+        (1 - SAMPLE_FRACTION) / (SAMPLE_FRACTION * SAMPLE_FRACTION)
+        * RMB_DOLLARS * RMB_DOLLARS
+    )) AS total_sales_error
+FROM
+    CURATED_FACT_ORDERS_SAMPLE
+WHERE
+    ORDER_HOUR IS NOT NULL
 GROUP BY
-    FLOOR(CAST(ORDER_TIME_PST AS BIGINT) / 10000)
+    ORDER_HOUR
 ORDER BY
-    rounded_order_hour;
+    ORDER_HOUR;
+"""
+
+# Percentiles are read from the DDSketch buckets in CURATED_QUANTILE_SKETCHES. Buckets merge
+# by summing counts, and the bucket holding rank q * (n - 1) gives the q-th percentile.
+# Each value is within RELATIVE_ACCURACY of the exact percentile.
+SKETCH_BUCKET_VALUE = """
+CASE
+    WHEN BUCKET_INDEX = -32768 THEN 0
+    ELSE 2 * power((1 + a) / (1 - a), BUCKET_INDEX) / ((1 + a) / (1 - a) + 1)
+END
+"""
+
+
+def _city_percentiles(metric):
+    return f"""
+WITH merged_buckets AS (
+    SELECT
+        SHIP_TO_CITY_CD,
+        BUCKET_INDEX,
+        SUM(BUCKET_COUNT) AS bucket_count,
+        MAX(RELATIVE_ACCURACY) AS a
+    FROM
+        CURATED_QUANTILE_SKETCHES
+    WHERE
+        METRIC = '{metric}'
+    GROUP BY
+        SHIP_TO_CITY_CD, BUCKET_INDEX
+),
+cumulative AS (
+    SELECT
+        SHIP_TO_CITY_CD,
+        BUCKET_INDEX,
+        {SKETCH_BUCKET_VALUE} AS bucket_value,
+        SUM(bucket_count) OVER (PARTITION BY SHIP_TO_CITY_CD ORDER BY BUCKET_INDEX) AS cumulative_count,
+        SUM(bucket_count) OVER (PARTITION BY SHIP_TO_CITY_CD) AS order_count
+    FROM
+        merged_buckets
+),
+city_percentiles AS (
+    SELECT
+        SHIP_TO_CITY_CD,
+        MAX(order_count) AS order_count,
+        arg_min(bucket_value, BUCKET_INDEX) FILTER (WHERE cumulative_count > 0.5 * (order_count - 1)) AS p50,
+        arg_min(bucket_value, BUCKET_INDEX) FILTER (WHERE cumulative_count > 0.9 * (order_count - 1)) AS p90,
+        arg_min(bucket_value, BUCKET_INDEX) FILTER (WHERE cumulative_count > 0.99 * (order_count - 1)) AS p99
+    FROM
+        cumulative
+    GROUP BY
+        SHIP_TO_CITY_CD
+    ORDER BY
+        order_count DESC
+    LIMIT 10
+)
+SELECT
+    p.SHIP_TO_CITY_CD,
+    c.SHIP_TO_CITY_CD_ENG,
+    p.order_count,
+    p.p50,
+    p.p90,
+    p.p99
+FROM
+    city_percentiles p
+LEFT JOIN
+    CURATED_DIM_CITY c ON p.SHIP_TO_CITY_CD = c.SHIP_TO_CITY_CD
+ORDER BY
+    p.order_count DESC;
+"""
+
+
+PERCENTILES_ORDER_VALUE_TOP_10_CITIES = _city_percentiles("RMB_DOLLARS")
+PERCENTILES_BASKET_SIZE_TOP_10_CITIES = _city_percentiles("ORDER_QTY")
+
+RANKED_TOP_10_CITIES_HIGHEST_DISTRICT_MEDIAN = f"""
+WITH cumulative AS (
+    SELECT
+        SHIP_TO_CITY_CD,
+        SHIP_TO_DISTRICT_NAME,
+        BUCKET_INDEX,
+        {SKETCH_BUCKET_VALUE} AS bucket_value,
+        SUM(bucket_count) OVER (PARTITION BY SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME ORDER BY BUCKET_INDEX) AS cumulative_count,
+        SUM(bucket_count) OVER (PARTITION BY SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME) AS order_count
+    FROM (
+        SELECT
+            SHIP_TO_CITY_CD,
+            SHIP_TO_DISTRICT_NAME,
+            BUCKET_INDEX,
+            SUM(BUCKET_COUNT) AS bucket_count,
+            MAX(RELATIVE_ACCURACY) AS a
+        FROM
+            CURATED_QUANTILE_SKETCHES
+        WHERE
+            METRIC = 'RMB_DOLLARS'
+        GROUP BY
+            SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME, BUCKET_INDEX
+    )
+),
+district_median AS (
+    SELECT
+        SHIP_TO_CITY_CD,
+        SHIP_TO_DISTRICT_NAME,
+        arg_min(bucket_value, BUCKET_INDEX) FILTER (WHERE cumulative_count > 0.5 * (order_count - 1)) AS median_sales
+    FROM
+        cumulative
+    GROUP BY
+        SHIP_TO_CITY_CD, SHIP_TO_DISTRICT_NAME
+),
+top_districts AS (
+    SELECT *
+    FROM district_median
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY SHIP_TO_CITY_CD ORDER BY median_sales DESC) = 1
+    ORDER BY median_sales DESC
+    LIMIT 10
+)
+SELECT t.SHIP_TO_CITY_CD, c.SHIP_TO_CITY_CD_ENG, t.SHIP_TO_DISTRICT_NAME, d.SHIP_TO_DISTRICT_NAME_ENG, t.median_sales AS top_median_sales
+FROM top_districts t
+LEFT JOIN CURATED_DIM_CITY c ON t.SHIP_TO_CITY_CD = c.SHIP_TO_CITY_CD
+LEFT JOIN CURATED_DIM_DISTRICT d ON t.SHIP_TO_DISTRICT_NAME = d.SHIP_TO_DISTRICT_NAME
+ORDER BY top_median_sales DESC;
+"""
+
+# Choices of the dashboard's global filters
+FILTER_PARTITIONS = """
+SELECT DISTINCT PARTITION_DATE, PARTITION_WINDOW
+FROM CURATED_FACT_ORDERS
+ORDER BY ALL;
+"""
+FILTER_PROVINCES = """
+SELECT DISTINCT PROVINCE
+FROM CURATED_DIM_CITY
+WHERE PROVINCE IS NOT NULL
+ORDER BY PROVINCE;
+"""
+FILTER_CITY_TIERS = """
+SELECT DISTINCT cluster AS CITY_TIER
+FROM CURATED_CITY_CLUSTER_RESULTS
+ORDER BY CITY_TIER;
+"""
+
+# Every query the dashboard runs, by name. The dashboard_chart_data pipeline asset runs
+# each one after every load and writes the results to Parquet, which the dashboard serves
+# instead of aggregating on the request path.
+DASHBOARD_QUERIES = {
+    "AGG_PROVINCE_SPENDING": AGG_PROVINCE_SPENDING,
+    "APPROX_PROVINCE_SPENDING": APPROX_PROVINCE_SPENDING,
+    "CORR_TOTAL_SPEND_GDP_PER_CAPITA": CORR_TOTAL_SPEND_GDP_PER_CAPITA,
+    "ALL_CITY_MAPPING": ALL_CITY_MAPPING,
+    "AGG_TOP_10_PROVINCE_SPENDING": AGG_TOP_10_PROVINCE_SPENDING,
+    "PERCENTAGE_OF_VALID_CITY_TRANSLATIONS": PERCENTAGE_OF_VALID_CITY_TRANSLATIONS,
+    "PERCENTAGE_OF_VALID_DISTRICTS_TRANSLATIONS": PERCENTAGE_OF_VALID_DISTRICTS_TRANSLATIONS,
+    "AGG_TOP_10_CITIES_SPENDING": AGG_TOP_10_CITIES_SPENDING,
+    "ALL_TOP_10_TRANSACTIONS": ALL_TOP_10_TRANSACTIONS,
+    "RANKED_TOP_CITY_PER_HOUR": RANKED_TOP_CITY_PER_HOUR,
+    "RANKED_TOP_10_CITY_HOUR_PAIR": RANKED_TOP_10_CITY_HOUR_PAIR,
+    "RANKED_TOP_10_CITIES_HIGHEST_DISTRICT_AVG": RANKED_TOP_10_CITIES_HIGHEST_DISTRICT_AVG,
+    "RANKED_TOP_10_CITIES_HIGHEST_DISTRICT_MEDIAN": RANKED_TOP_10_CITIES_HIGHEST_DISTRICT_MEDIAN,
+    "ALL_CITY_CLUSTER_RESULTS": ALL_CITY_CLUSTER_RESULTS,
+    "PERCENTILES_ORDER_VALUE_TOP_10_CITIES": PERCENTILES_ORDER_VALUE_TOP_10_CITIES,
+    "PERCENTILES_BASKET_SIZE_TOP_10_CITIES": PERCENTILES_BASKET_SIZE_TOP_10_CITIES,
+    "AGG_TOTAL_SPEND_PER_HOUR": AGG_TOTAL_SPEND_PER_HOUR,
+    "APPROX_TOTAL_SPEND_PER_HOUR": APPROX_TOTAL_SPEND_PER_HOUR,
+    "FILTER_PARTITIONS": FILTER_PARTITIONS,
+    "FILTER_PROVINCES": FILTER_PROVINCES,
+    "FILTER_CITY_TIERS": FILTER_CITY_TIERS,
+}
+
+# Province-sharded form of the order aggregates, for the pipeline's optional province shards
+# (shards.py). The partial query runs over one shard, read as `shard`, and the merge query
+# combines the partial results of every shard read, as `partials`, into the result of the
+# dashboard query. A city belongs to exactly one shard, so city totals and rankings are
+# complete within a shard and only the cross-shard ranking is left to the merge.
+ShardedQuery = namedtuple("ShardedQuery", ["partial", "merge"])
+
+SHARDED_QUERIES = {
+    "AGG_PROVINCE_SPENDING": ShardedQuery(
+        partial="""
+SELECT
+    PROVINCE,
+    SUM(RMB_DOLLARS) AS TOTAL_SPENDING,
+    COUNT(DISTINCT CITY_KEY) AS TOTAL_COUNT_OF_CITIES,
+    COUNT(DISTINCT DISTRICT_KEY) FILTER (WHERE DISTRICT_IS_TRANSLATED) AS TOTAL_COUNT_OF_DISTRICTS
+FROM shard
+WHERE CITY_IS_TRANSLATED
+GROUP BY PROVINCE
+""",
+        # A province is one shard, so its partial row is already its total
+        merge="""
+SELECT * FROM partials
+ORDER BY TOTAL_SPENDING DESC;
+""",
+    ),
+    "CORR_TOTAL_SPEND_GDP_PER_CAPITA": ShardedQuery(
+        partial="""
+SELECT
+    SHIP_TO_CITY_CD_ENG,
+    SUM(RMB_DOLLARS) AS total_spend,
+    PER_CAPITA_USD,
+    PROVINCE
+FROM shard
+WHERE PER_CAPITA_USD IS NOT NULL AND PROVINCE IS NOT NULL
+GROUP BY CITY_KEY, SHIP_TO_CITY_CD_ENG, PER_CAPITA_USD, PROVINCE
+""",
+        merge="SELECT * FROM partials",
+    ),
+    "RANKED_TOP_CITY_PER_HOUR": ShardedQuery(
+        partial="""
+SELECT
+    SHIP_TO_CITY_CD,
+    ORDER_HOUR AS ORDER_HOUR_PST,
+    SUM(RMB_DOLLARS) AS total_sales
+FROM shard
+WHERE ORDER_HOUR IS NOT NULL
+GROUP BY CITY_KEY, SHIP_TO_CITY_CD, ORDER_HOUR
+QUALIFY ROW_NUMBER() OVER (PARTITION BY ORDER_HOUR ORDER BY SUM(RMB_DOLLARS) DESC) = 1
+""",
+        merge="""
+SELECT *
+FROM partials
+QUALIFY ROW_NUMBER() OVER (PARTITION BY ORDER_HOUR_PST ORDER BY total_sales DESC) = 1
+ORDER BY ORDER_HOUR_PST;
+""",
+    ),
+    "RANKED_TOP_10_CITIES_HIGHEST_DISTRICT_AVG": ShardedQuery(
+        partial="""
+SELECT
+    SHIP_TO_CITY_CD,
+    SHIP_TO_CITY_CD_ENG,
+    SHIP_TO_DISTRICT_NAME,
+    SHIP_TO_DISTRICT_NAME_ENG,
+    AVG(RMB_DOLLARS) AS top_avg_sales
+FROM shard
+GROUP BY
+    CITY_KEY, DISTRICT_KEY, SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG,
+    SHIP_TO_DISTRICT_NAME, SHIP_TO_DISTRICT_NAME_ENG
+QUALIFY ROW_NUMBER() OVER (PARTITION BY CITY_KEY ORDER BY AVG(RMB_DOLLARS) DESC) = 1
+ORDER BY top_avg_sales DESC
+LIMIT 10
+""",
+        merge="""
+SELECT * FROM partials
+ORDER BY top_avg_sales DESC
+LIMIT 10;
+""",
+    ),
+    "AGG_TOTAL_SPEND_PER_HOUR": ShardedQuery(
+        partial="""
+SELECT ORDER_HOUR, SUM(RMB_DOLLARS) AS total_sales
+FROM shard
+WHERE ORDER_HOUR IS NOT NULL
+GROUP BY ORDER_HOUR
+""",
+        merge="""
+SELECT ORDER_HOUR, SUM(total_sales) AS total_sales
+FROM partials
+GROUP BY ORDER_HOUR
+ORDER BY ORDER_HOUR;
+""",
+    ),
+}
+
 
+def _sharded_city_percentiles(metric):
+    return ShardedQuery(
+        partial=f"""
+SELECT
+    SHIP_TO_CITY_CD,
+    SHIP_TO_CITY_CD_ENG,
+    COUNT(*) AS order_count,
+    quantile_disc({metric}, 0.5) AS p50,
+    quantile_disc({metric}, 0.9) AS p90,
+    quantile_disc({metric}, 0.99) AS p99
+FROM shard
+WHERE {metric} IS NOT NULL
+GROUP BY CITY_KEY, SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG
+ORDER BY order_count DESC
+LIMIT 10
+""",
+        merge="""
+SELECT * FROM partials
+ORDER BY order_count DESC
+LIMIT 10;
+""",
+    )
+
+
+# Order-level form of the dashboard queries that read the leaderboards and the quantile
+# sketches, which the pipeline only keeps over all orders. They run while the dashboard's
+# filters are set, on the filtered shards or gold orders, so their percentiles are exact.
+FILTERED_QUERIES = {
+    **SHARDED_QUERIES,
+    "AGG_TOP_10_PROVINCE_SPENDING": ShardedQuery(
+        partial="""
+SELECT PROVINCE, SUM(RMB_DOLLARS) AS province_total_sales
+FROM shard
+WHERE CITY_IS_TRANSLATED
+GROUP BY PROVINCE
+""",
+        merge="""
+SELECT * FROM partials
+ORDER BY province_total_sales DESC
+LIMIT 10;
+""",
+    ),
+    "AGG_TOP_10_CITIES_SPENDING": ShardedQuery(
+        partial="""
+SELECT SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG, SUM(RMB_DOLLARS) AS total_sales
+FROM shard
+GROUP BY CITY_KEY, SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG
+ORDER BY total_sales DESC
+LIMIT 10
+""",
+        merge="""
+SELECT * FROM partials
+ORDER BY total_sales DESC
+LIMIT 10;
+""",
+    ),
+    "ALL_TOP_10_TRANSACTIONS": ShardedQuery(
+        partial="""
+SELECT
+    ORDER_ID,
+    ORDER_TIME_PST,
+    SHIP_TO_CITY_CD,
+    SHIP_TO_DISTRICT_NAME,
+    SHIP_TO_DISTRICT_NAME_ENG,
+    SHIP_TO_CITY_CD_ENG,
+    RMB_DOLLARS,
+    ORDER_QTY,
+    ORDER_TS
+FROM shard
+WHERE RMB_DOLLARS IS NOT NULL
+ORDER BY RMB_DOLLARS DESC
+LIMIT 10
+""",
+        merge="""
+SELECT * FROM partials
+ORDER BY RMB_DOLLARS DESC
+LIMIT 10;
+""",
+    ),
+    "RANKED_TOP_10_CITY_HOUR_PAIR": ShardedQuery(
+        partial="""
+SELECT
+    SHIP_TO_CITY_CD,
+    ORDER_HOUR AS ORDER_HOUR_PST,
+    SUM(RMB_DOLLARS) AS total_sales
+FROM shard
+WHERE ORDER_HOUR IS NOT NULL
+GROUP BY CITY_KEY, SHIP_TO_CITY_CD, ORDER_HOUR
+ORDER BY total_sales DESC
+LIMIT 10
+""",
+        merge="""
+SELECT * FROM partials
+ORDER BY total_sales DESC
+LIMIT 10;
+""",
+    ),
+    # A district is in one city, so its median is complete within a shard
+    "RANKED_TOP_10_CITIES_HIGHEST_DISTRICT_MEDIAN": ShardedQuery(
+        partial="""
+SELECT
+    SHIP_TO_CITY_CD,
+    SHIP_TO_CITY_CD_ENG,
+    SHIP_TO_DISTRICT_NAME,
+    SHIP_TO_DISTRICT_NAME_ENG,
+    quantile_disc(RMB_DOLLARS, 0.5) AS top_median_sales
+FROM shard
+GROUP BY
+    CITY_KEY, DISTRICT_KEY, SHIP_TO_CITY_CD, SHIP_TO_CITY_CD_ENG,
+    SHIP_TO_DISTRICT_NAME, SHIP_TO_DISTRICT_NAME_ENG
+QUALIFY ROW_NUMBER() OVER (PARTITION BY CITY_KEY ORDER BY top_median_sales DESC) = 1
+ORDER BY top_median_sales DESC
+LIMIT 10
+""",
+        merge="""
+SELECT * FROM partials
+ORDER BY top_median_sales DESC
+LIMIT 10;
+""",
+    ),
+    "PERCENTILES_ORDER_VALUE_TOP_10_CITIES": _sharded_city_percentiles("RMB_DOLLARS"),
+    "PERCENTILES_BASKET_SIZE_TOP_10_CITIES": _sharded_city_percentiles("ORDER_QTY"),
+}
+
+# Form of the queries over the city dimension for when the province or city tier filters
+# are set, over the cities they select, read as `cities`. Order dates and windows do not
+# apply to cities.
+CITY_QUERIES = {
+    "ALL_CITY_MAPPING": """
+SELECT * EXCLUDE (CITY_TIER)
+FROM cities
+LIMIT 10;
+""",
+    "ALL_CITY_CLUSTER_RESULTS": """
+SELECT *
+FROM CURATED_CITY_CLUSTER_RESULTS
+WHERE SHIP_TO_CITY_CD IN (SELECT SHIP_TO_CITY_CD FROM cities);
+""",
+}
+
+# The cities with their CITY_TIER, which the city queries read as `cities`
+CITIES_SOURCE = """
+SELECT m.*, t.cluster AS CITY_TIER
+FROM CURATED_TRANSLATIONS_CITY_MAPPING m
+LEFT JOIN CURATED_CITY_CLUSTER_RESULTS t ON m.SHIP_TO_CITY_CD = t.SHIP_TO_CITY_CD
+"""
+
+
+# The gold orders with the columns of a province shard, which the sharded queries read as
+# `shard` when the dashboard's filters are set and the pipeline does not write shards
+ORDERS_SOURCE = """
+SELECT
+    f.ORDER_ID,
+    f.ORDER_TIME_PST,
+    f.CITY_KEY,
+    f.DISTRICT_KEY,
+    c.SHIP_TO_CITY_CD,
+    c.SHIP_TO_CITY_CD_ENG,
+    c.PROVINCE,
+    c.PER_CAPITA_USD,
+    COALESCE(c.IS_TRANSLATED, false) AS CITY_IS_TRANSLATED,
+    d.SHIP_TO_DISTRICT_NAME,
+    d.SHIP_TO_DISTRICT_NAME_ENG,
+    COALESCE(d.IS_TRANSLATED, false) AS DISTRICT_IS_TRANSLATED,
+    f.RMB_DOLLARS,
+    f.ORDER_QTY,
+    f.PARTITION_DATE,
+    f.PARTITION_WINDOW,
+    f.ORDER_TS,
+    f.ORDER_HOUR,
+    t.cluster AS CITY_TIER
+FROM CURATED_FACT_ORDERS f
+LEFT JOIN CURATED_DIM_CITY c ON f.CITY_KEY = c.CITY_KEY
+LEFT JOIN CURATED_DIM_DISTRICT d ON f.DISTRICT_KEY = d.DISTRICT_KEY
+LEFT JOIN CURATED_CITY_CLUSTER_RESULTS t ON c.SHIP_TO_CITY_CD = t.SHIP_TO_CITY_CD
 """
@@ -0,0 +1,609 @@
+import streamlit as st
+import json
+from geo import preprocess_geojson, feature_collection
+from chart_data import get_data_version, chart_data_file
+from data_access import fetch_arrow, to_frame
+from shards import shard_manifest, fan_out
+from filters import (
+    Filters,
+    NO_FILTERS,
+    is_filtered,
+    is_partition_filtered,
+    city_filters,
+    filter_predicate,
+    filtered_query,
+    filtered_city_query,
+)
+from queries import (
+    AGG_PROVINCE_SPENDING,
+    AGG_TOP_10_CITIES_SPENDING,
+    AGG_TOP_10_PROVINCE_SPENDING,
+    ALL_CITY_MAPPING,
+    ALL_TOP_10_TRANSACTIONS,
+    CORR_TOTAL_SPEND_GDP_PER_CAPITA,
+    RANKED_TOP_10_CITIES_HIGHEST_DISTRICT_AVG,
+    RANKED_TOP_10_CITY_HOUR_PAIR,
+    RANKED_TOP_CITY_PER_HOUR,
+    PERCENTAGE_OF_VALID_CITY_TRANSLATIONS,
+    PERCENTAGE_OF_VALID_DISTRICTS_TRANSLATIONS,
+    AGG_TOTAL_SPEND_PER_HOUR,
+    ALL_CITY_CLUSTER_RESULTS,
+    APPROX_PROVINCE_SPENDING,
+    APPROX_TOTAL_SPEND_PER_HOUR,
+    PERCENTILES_ORDER_VALUE_TOP_10_CITIES,
+    PERCENTILES_BASKET_SIZE_TOP_10_CITIES,
+    RANKED_TOP_10_CITIES_HIGHEST_DISTRICT_MEDIAN,
+    FILTER_PARTITIONS,
+    FILTER_PROVINCES,
+    FILTER_CITY_TIERS,
+    DASHBOARD_QUERIES,
+    SHARDED_QUERIES,
+    FILTERED_QUERIES,
+    CITY_QUERIES,
+)
+from constants import (
+    DUCKDB_FILE_PATH,
+    GEOJSON_FILE_PATH,
+    GEOJSON_SIMPLIFY_TOLERANCE,
+    FIGURE_CACHE_MAX_VERSIONS,
+    FILTER_CACHE_MAX_COMBINATIONS,
+    APPROX_SAMPLE_PERCENT,
+    APPROX_CONFIDENCE_Z,
+    SHARD_QUERY_WORKERS,
+)
+
+# Each section runs its own queries and is a fragment, so a section only executes
+# when its page is open and a widget change inside it only reruns that section.
+# duckdb and plotly.express (which pulls in pandas and numpy) are imported on first use,
+# so the app skeleton renders before them on a cold start.
+
+
+# Each warehouse query opens its own short-lived read-only connection. A held handle would
+# block the pipeline's writers, keep reading a file maintenance has replaced, and not see
+# new data. Results are cached by data version, so this only happens on a cache miss.
+def connect_warehouse():
+    import duckdb
+
+    return duckdb.connect(database=DUCKDB_FILE_PATH, read_only=True)
+
+
+# Precomputed chart data is read through an in-memory connection, not the warehouse file
+@st.cache_resource
+def get_chart_data_connection():
+    import duckdb
+
+    return duckdb.connect()
+
+
+# Threads the order aggregates fan out over the province shards on
+@st.cache_resource
+def get_shard_executor():
+    from concurrent.futures import ThreadPoolExecutor
+
+    return ThreadPoolExecutor(SHARD_QUERY_WORKERS, thread_name_prefix="shards")
+
+
+QUERY_NAMES = {query: name for name, query in DASHBOARD_QUERIES.items()}
+
+
+def approximate_mode_toggle():
+    st.sidebar.toggle(
+        "Approximate mode",
+        key="approx_mode",
+        help="Answer from sketches and samples instead of scanning every order.",
+    )
+
+
+def is_approximate():
+    return st.session_state.get("approx_mode", False)
+
+
+def filter_controls():
+    """
+    Shows the global filters in the sidebar and stores the selection for the sections.
+    Leaving a filter at all of its values unsets it, so the unfiltered results keep
+    coming from the precomputed chart data.
+    """
+    data_version = get_data_version()
+    partitions = run_query(FILTER_PARTITIONS, data_version)
+    provinces = run_query(FILTER_PROVINCES, data_version)["PROVINCE"].tolist()
+    city_tiers = run_query(FILTER_CITY_TIERS, data_version)["CITY_TIER"].tolist()
+
+    st.sidebar.header("Filters")
+    start_date = end_date = None
+    if not partitions.empty:
+        dates = partitions["PARTITION_DATE"].dt.date
+        first_date, last_date = dates.min(), dates.max()
+        selected = st.sidebar.date_input(
+            "Order dates",
+            value=(first_date, last_date),
+            min_value=first_date,
+            max_value=last_date,
+            key="filter_dates",
+        )
+        # The range has one date while its end is being picked
+        if selected:
+            start_date, end_date = selected[0], selected[-1]
+        if start_date == first_date:
+            start_date = None
+        if end_date == last_date:
+            end_date = None
+    windows = st.sidebar.multiselect(
+        "Windows",
+        sorted(partitions["PARTITION_WINDOW"].unique().tolist()),
+        key="filter_windows",
+    )
+    selected_provinces = st.sidebar.multiselect(
+        "Provinces", provinces, key="filter_provinces"
+    )
+    selected_tiers = st.sidebar.multiselect(
+        "City tiers",
+        city_tiers,
+        format_func=lambda tier: f"Tier {tier}",
+        key="filter_city_tiers",
+    )
+    st.session_state["filters"] = Filters(
+        start_date,
+        end_date,
+        tuple(windows),
+        tuple(selected_provinces),
+        tuple(selected_tiers),
+    )
+
+
+def current_filters():
+    return st.session_state.get("filters", NO_FILTERS)
+
+
+def unfiltered_note(message):
+    if is_filtered(current_filters()):
+        st.caption(message)
+
+
+def city_filter_note(subject):
+    if is_partition_filtered(current_filters()):
+        st.caption(
+            f"{subject} only follows the province and city tier filters, order dates and "
+            "windows do not apply to cities."
+        )
+
+
+def filtered_approximation_note():
+    st.caption("Approximate mode does not apply while filters are set.")
+
+
+def approximation_note():
+    st.caption(
+        f"Approximate mode: sums are scaled up from a {APPROX_SAMPLE_PERCENT}% sample and "
+        f"distinct counts are HyperLogLog estimates. ± values are {APPROX_CONFIDENCE_Z}σ bounds."
+    )
+
+
+# Query results and figures are shared across sessions and keyed by data version and
+# filters. Unfiltered results come from the precomputed chart data when it is current, then
+# from the province shards for the order aggregates, so the warehouse is only queried
+# between a load finishing and the chart data being refreshed. Filtered order aggregates
+# read only the selected provinces' shards, or the gold orders the filters select, and
+# filtered city queries read the cities the filters select.
+@st.cache_data(
+    max_entries=FIGURE_CACHE_MAX_VERSIONS
+    * (16 + FILTER_CACHE_MAX_COMBINATIONS * (len(FILTERED_QUERIES) + len(CITY_QUERIES)))
+)
+def cached_query(query, data_version, filters=NO_FILTERS):
+    name = QUERY_NAMES.get(query)
+    if is_filtered(filters):
+        return run_filtered_query(name, data_version, filters)
+    chart_file = chart_data_file(name, data_version)
+    if chart_file:
+        with get_chart_data_connection().cursor() as cursor:
+            return to_frame(
+                fetch_arrow(cursor, "SELECT * FROM read_parquet(?)", [chart_file])
+            )
+    manifest = shard_manifest(data_version) if name in SHARDED_QUERIES else None
+    if manifest:
+        return to_frame(
+            fan_out(
+                get_chart_data_connection(),
+                get_shard_executor(),
+                SHARDED_QUERIES[name],
+                manifest,
+            )
+        )
+    with connect_warehouse() as connection:
+        return to_frame(fetch_arrow(connection, query))
+
+
+def run_query(query, data_version, filters=NO_FILTERS):
+    import duckdb
+
+    try:
+        return cached_query(query, data_version, filters)
+    except duckdb.Error:
+        # The pipeline holds the warehouse's write lock while it loads. Failures are not
+        # cached, so the next rerun queries again.
+        st.warning("The warehouse is being updated, retry shortly.")
+        st.stop()
+
+
+def run_filtered_query(name, data_version, filters):
+    if name in CITY_QUERIES:
+        with connect_warehouse() as connection:
+            return to_frame(
+                fetch_arrow(
+                    connection, *filtered_city_query(CITY_QUERIES[name], filters)
+                )
+            )
+    manifest = shard_manifest(data_version)
+    if manifest:
+        predicate, parameters = filter_predicate(filters)
+        return to_frame(
+            fan_out(
+                get_chart_data_connection(),
+                get_shard_executor(),
+                FILTERED_QUERIES[name],
+                manifest,
+                filters.provinces,
+                predicate,
+                parameters,
+            )
+        )
+    with connect_warehouse() as connection:
+        return to_frame(
+            fetch_arrow(connection, *filtered_query(FILTERED_QUERIES[name], filters))
+        )
+
+
+# Province geometry is simplified and indexed by NAME_1 once per server process
+@st.cache_resource
+def load_province_index():
+    with open(GEOJSON_FILE_PATH) as response:
+        return preprocess_geojson(
+            json.loads(response.read()), GEOJSON_SIMPLIFY_TOLERANCE
+        )
+
+
+@st.cache_resource(
+    max_entries=FIGURE_CACHE_MAX_VERSIONS * (2 + FILTER_CACHE_MAX_COMBINATIONS)
+)
+def build_province_spending_figure(data_version, approximate=False, filters=NO_FILTERS):
+    import plotly.express as px
+
+    if approximate:
+        df = run_query(APPROX_PROVINCE_SPENDING, data_version)
+    else:
+        df = run_query(AGG_PROVINCE_SPENDING, data_version, filters)
+    china_geojson, (min_lon, min_lat, max_lon, max_lat) = feature_collection(
+        load_province_index(), df["PROVINCE"]
+    )
+
+    hover_data = {
+        "TOTAL_SPENDING": ":,.2f",
+        "TOTAL_COUNT_OF_CITIES": True,
+        "TOTAL_COUNT_OF_DISTRICTS": True,
+    }
+    labels = {
+        "TOTAL_SPENDING": "Total Spending(RMB)",
+        "TOTAL_COUNT_OF_CITIES": "Total Count of Cities",
+        "TOTAL_COUNT_OF_DISTRICTS": "Total Count of Districts",
+    }
+    if approximate:
+        # Show each estimate's error bound right after it
+        hover_data = {
+            "TOTAL_SPENDING": ":,.2f",
+            "TOTAL_SPENDING_ERROR": ":,.2f",
+            "TOTAL_COUNT_OF_CITIES": True,
+            "TOTAL_COUNT_OF_CITIES_ERROR": True,
+            "TOTAL_COUNT_OF_DISTRICTS": True,
+            "TOTAL_COUNT_OF_DISTRICTS_ERROR": True,
+        }
+        labels.update(
+            {
+                "TOTAL_SPENDING_ERROR": "± Spending",
+                "TOTAL_COUNT_OF_CITIES_ERROR": "± Cities",
+                "TOTAL_COUNT_OF_DISTRICTS_ERROR": "± Districts",
+            }
+        )
+
+    # Create a choropleth map
+    fig = px.choropleth(
+        df,
+        geojson=china_geojson,
+        locations="PROVINCE",
+        color="TOTAL_SPENDING",
+        hover_name="PROVINCE",
+        hover_data=hover_data,
+        color_continuous_scale="Viridis",
+        labels=labels,
+    )
+
+    # Bounds are precomputed from the simplified geometry instead of fitbounds
+    fig.update_geos(
+        lonaxis_range=[min_lon, max_lon],
+        lataxis_range=[min_lat, max_lat],
+        visible=True,
+        showsubunits=True,
+        showcoastlines=True,
+        coastlinecolor="Black",
+        showocean=True,
+        oceancolor="LightBlue",
+    )
+    fig.update_layout(title_text="Total Spending by Province in China")
+    return fig
+
+
+@st.cache_resource(
+    max_entries=FIGURE_CACHE_MAX_VERSIONS * (1 + FILTER_CACHE_MAX_COMBINATIONS)
+)
+def build_correlation_figure(data_version, filters=NO_FILTERS):
+    import plotly.express as px
+
+    # Execute the query and fetch the data
+    df = run_query(CORR_TOTAL_SPEND_GDP_PER_CAPITA, data_version, filters)
+
+    # Calculate the correlation
+    correlation = df["total_spend"].corr(df["PER_CAPITA_USD"])
+
+    # Plot the data using Plotly
+    fig = px.scatter(
+        df,
+        x="PER_CAPITA_USD",
+        y="total_spend",
+        title="Total Spend vs. Per Capita USD",
+        color="PROVINCE",  # Change color according to PROVINCE
+        labels={"PER_CAPITA_USD": "Per Capita USD", "total_spend": "Total Spend"},
+        hover_data={"SHIP_TO_CITY_CD_ENG": True, "PROVINCE": True},
+    )
+    return correlation, fig
+
+
+# Shared by several bar charts, so it keeps a few entries per data version
+@st.cache_resource(
+    max_entries=FIGURE_CACHE_MAX_VERSIONS * (4 + 3 * FILTER_CACHE_MAX_COMBINATIONS)
+)
+def build_bar_figure(
+    query, x, y, title, data_version, error_y=None, filters=NO_FILTERS
+):
+    import plotly.express as px
+
+    return px.bar(
+        run_query(query, data_version, filters),
+        x=x,
+        y=y,
+        error_y=error_y,
+        title=title,
+    )
+
+
+@st.cache_resource(
+    max_entries=FIGURE_CACHE_MAX_VERSIONS * 2 * (1 + FILTER_CACHE_MAX_COMBINATIONS)
+)
+def build_percentile_figure(query, title, data_version, filters=NO_FILTERS):
+    import plotly.express as px
+
+    return px.bar(
+        run_query(query, data_version, filters),
+        x="SHIP_TO_CITY_CD_ENG",
+        y=["p50", "p90", "p99"],
+        barmode="group",
+        title=title,
+    )
+
+
+@st.cache_resource(
+    max_entries=FIGURE_CACHE_MAX_VERSIONS * (1 + FILTER_CACHE_MAX_COMBINATIONS)
+)
+def build_cluster_figure(data_version, filters=NO_FILTERS):
+    import plotly.express as px
+
+    return px.scatter(
+        run_query(ALL_CITY_CLUSTER_RESULTS, data_version, filters),
+        x="SHIP_TO_CITY_CD",
+        y="RMB_DOLLARS",
+        color="cluster",
+        title="City Clusters Based on Sales using K-Means clustering.",
+    )
+
+
+@st.experimental_fragment
+def province_spending_section():
+    # Display the map in Streamlit
+    filters = current_filters()
+    approximate = is_approximate() and not is_filtered(filters)
+    st.plotly_chart(
+        build_province_spending_figure(get_data_version(), approximate, filters)
+    )
+    if approximate:
+        approximation_note()
+    elif is_approximate():
+        filtered_approximation_note()
+
+    # Add explanatory text
+    st.write(
+        "This map shows the total sales in different regions of China. The lighter the color, the higher the total sales."
+    )
+    st.write(
+        "It has been studied that in China, coastal cities have a higher GDP per capita than inner regions."
+    )
+    st.write(
+        "source: https://typeset.io/questions/why-does-coastal-regions-in-china-have-a-higher-gdp-per-5gt586emod"
+    )
+
+
+@st.experimental_fragment
+def correlation_section():
+    correlation, fig = build_correlation_figure(get_data_version(), current_filters())
+
+    # Display the correlation
+    st.header("Correlation between Total Spend and Per Capita USD")
+    st.write(f"Correlation coefficient: {correlation:.2f}")
+
+    # Show the plot in Streamlit
+    st.plotly_chart(fig)
+
+
+@st.experimental_fragment
+def city_metadata_section():
+    st.header("City Level Metadata")
+    city_filter_note("This table")
+    st.write(
+        run_query(ALL_CITY_MAPPING, get_data_version(), city_filters(current_filters()))
+    )
+
+
+@st.experimental_fragment
+def top_provinces_section():
+    st.header("Top 10 Provinces in Sales")
+    fig = build_bar_figure(
+        AGG_TOP_10_PROVINCE_SPENDING,
+        "PROVINCE",
+        "province_total_sales",
+        "Top 10 Provinces in Sales",
+        get_data_version(),
+        filters=current_filters(),
+    )
+    st.plotly_chart(fig)
+
+
+@st.experimental_fragment
+def translation_coverage_section():
+    unfiltered_note(
+        "Translation coverage is measured over every city and district loaded, "
+        "the filters do not apply to it."
+    )
+    st.header("Percentage of Cities with Valid Translation")
+    st.write(run_query(PERCENTAGE_OF_VALID_CITY_TRANSLATIONS, get_data_version()))
+
+    st.header("Percentage of Districts with Valid Translation")
+    st.write(run_query(PERCENTAGE_OF_VALID_DISTRICTS_TRANSLATIONS, get_data_version()))
+
+
+@st.experimental_fragment
+def top_cities_section():
+    st.header("Top 10 Cities In Sales")
+    fig = build_bar_figure(
+        AGG_TOP_10_CITIES_SPENDING,
+        "SHIP_TO_CITY_CD_ENG",
+        "total_sales",
+        "Top 10 Cities in Sales",
+        get_data_version(),
+        filters=current_filters(),
+    )
+    st.plotly_chart(fig)
+
+
+@st.experimental_fragment
+def top_transactions_section():
+    st.header("Top 10 Transactions By Amount")
+    st.write(run_query(ALL_TOP_10_TRANSACTIONS, get_data_version(), current_filters()))
+
+
+@st.experimental_fragment
+def q1_section():
+    st.markdown("## Q1. Find the city with the highest per-hour sales")
+    st.markdown(
+        "Analysis: This question looks like it can be interpreted in 2 ways. Either 1) For each hour, find the city with the highest spending or 2) Find the city-hour pair with the highest spending. Why not both? The interesting analysis is that while Shanghai tops the charts in sales across all times of day, at certain peak periods, other cities can do better in sales than Shanghai at off-peak periods. Refer to the next two figures."
+    )
+    # City with the highest per-hour sales
+    st.markdown("Q1a. City with the Highest Sales Per Hour")
+    st.write(run_query(RANKED_TOP_CITY_PER_HOUR, get_data_version(), current_filters()))
+
+    # City pair with the highest spendings
+    st.markdown("Q1b. Top 10 City-Hour Pair with the Highest Sales")
+    st.write(
+        run_query(RANKED_TOP_10_CITY_HOUR_PAIR, get_data_version(), current_filters())
+    )
+
+
+@st.experimental_fragment
+def q2_section():
+    # City with the highest average sales by district
+    st.markdown("## Q2. Find the city with the highest average sales by district")
+    st.markdown(
+        "For each city, find the district with the highest average sales. Then return top 1 or top n cities."
+    )
+    st.write(
+        run_query(
+            RANKED_TOP_10_CITIES_HIGHEST_DISTRICT_AVG,
+            get_data_version(),
+            current_filters(),
+        )
+    )
+
+    # Medians are not pulled up by the outlier orders that skew the averages above
+    st.markdown("Using each district's median sale instead of its average:")
+    st.write(
+        run_query(
+            RANKED_TOP_10_CITIES_HIGHEST_DISTRICT_MEDIAN,
+            get_data_version(),
+            current_filters(),
+        )
+    )
+
+
+@st.experimental_fragment
+def q3_section():
+    st.header(
+        "Q3. Discuss and show how to cluster cities into n-number of tiers based on sales (e.g. lowest spending to highest spending)."
+    )
+    # The tiers are clustered over all orders, the filters select which cities are shown
+    city_filter_note("This chart")
+    st.plotly_chart(
+        build_cluster_figure(get_data_version(), city_filters(current_filters()))
+    )
+
+
+@st.experimental_fragment
+def percentiles_section():
+    st.header("Order Value and Basket Size Percentiles")
+    filters = current_filters()
+    st.plotly_chart(
+        build_percentile_figure(
+            PERCENTILES_ORDER_VALUE_TOP_10_CITIES,
+            "Order Value (RMB) Percentiles, Top 10 Cities by Order Count",
+            get_data_version(),
+            filters,
+        )
+    )
+    st.plotly_chart(
+        build_percentile_figure(
+            PERCENTILES_BASKET_SIZE_TOP_10_CITIES,
+            "Basket Size Percentiles, Top 10 Cities by Order Count",
+            get_data_version(),
+            filters,
+        )
+    )
+    if is_filtered(filters):
+        st.caption("Percentiles are computed exactly over the filtered orders.")
+    else:
+        st.caption(
+            "Percentiles are merged from per-partition quantile sketches and are within 1% of the exact value."
+        )
+
+
+@st.experimental_fragment
+def hourly_sales_section():
+    # Total Sales by Hour
+    filters = current_filters()
+    if is_approximate() and not is_filtered(filters):
+        fig = build_bar_figure(
+            APPROX_TOTAL_SPEND_PER_HOUR,
+            "ORDER_HOUR",
+            "total_sales",
+            "Total Sales by Hour",
+            get_data_version(),
+            error_y="total_sales_error",
+        )
+        st.plotly_chart(fig)
+        approximation_note()
+    else:
+        fig = build_bar_figure(
+            AGG_TOTAL_SPEND_PER_HOUR,
+            "ORDER_HOUR",
+            "total_sales",
+            "Total Sales by Hour",
+            get_data_version(),
+            filters=filters,
+        )
+        st.plotly_chart(fig)
+        if is_approximate():
+            filtered_approximation_note()
@@ -0,0 +1,93 @@
+import json
+import os
+
+import pyarrow as pa
+
+from constants import PROVINCE_SHARDS_DIR
+from data_access import fetch_arrow
+
+# Fan-out over the pipeline's optional province shards, shared by the dashboard and the
+# metrics API. Each shard's partial aggregate runs on its own cursor on a thread pool, and
+# the partials are merged in memory into the result of the dashboard query.
+
+
+def shard_manifest(data_version):
+    """
+    Reads the pipeline's latest province shards. Returns None when there are none, or when
+    they were written from a different warehouse version than data_version.
+    """
+    try:
+        with open(os.path.join(PROVINCE_SHARDS_DIR, "latest.json")) as latest_file:
+            latest = json.load(latest_file)
+    except FileNotFoundError:
+        return None
+    if not latest["shards"] or latest["warehouse_version"] != data_version:
+        return None
+    return latest
+
+
+def shard_path(manifest, shard):
+    return os.path.join(
+        PROVINCE_SHARDS_DIR, manifest["version"], shard["path"], "*.parquet"
+    )
+
+
+def run_partial(connection, partial, path, where="true", parameters=()):
+    with connection.cursor() as cursor:
+        return fetch_arrow(
+            cursor,
+            f"WITH shard AS (SELECT * FROM read_parquet(?) WHERE {where}) {partial}",
+            [path, *parameters],
+        )
+
+
+def fan_out(
+    connection,
+    executor,
+    sharded_query,
+    manifest,
+    provinces=(),
+    where="true",
+    parameters=(),
+):
+    """
+    Runs a sharded query over every shard, or only over the given provinces' shards.
+
+    Args:
+        connection (duckdb.DuckDBPyConnection): The connection the shards are read through,
+            each shard gets its own cursor.
+        executor (concurrent.futures.Executor): Runs the partial queries.
+        sharded_query (queries.ShardedQuery): The partial and merge queries.
+        manifest (dict): The shards, from shard_manifest.
+        provinces (tuple): Only read these provinces' shards.
+        where (str): A predicate on the shard rows, from filters.filter_predicate.
+        parameters (list): The predicate's parameters.
+
+    Returns:
+        pyarrow.Table: The merged result.
+    """
+    paths = [
+        shard_path(manifest, shard)
+        for shard in manifest["shards"]
+        if not provinces or shard["province"] in provinces
+    ]
+    if paths:
+        partials = pa.concat_tables(
+            executor.map(
+                lambda path: run_partial(
+                    connection, sharded_query.partial, path, where, parameters
+                ),
+                paths,
+            )
+        )
+    else:
+        # A province without orders has no shard, its empty result still needs the columns
+        partials = run_partial(
+            connection,
+            sharded_query.partial,
+            shard_path(manifest, manifest["shards"][0]),
+            where="false",
+        )
+    with connection.cursor() as cursor:
+        cursor.register("partials", partials)
+        return fetch_arrow(cursor, sharded_query.merge)